@@ -0,0 +1,137 @@
+import asyncio
+import concurrent.futures
+
+from adaptation_analyser.publish_buffer import write_events_pipelined
+
+
+class AsyncPublishQueue(object):
+    """Takes the place of the service publish buffer, the events are written by the runner publisher task."""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue()
+        self.published_events = 0
+        self.writes = 0
+
+    def __len__(self):
+        return self.queue.qsize()
+
+    def add(self, stream, event_msg):
+        # called from the analysis thread, the queue belongs to the event loop
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, (stream, event_msg))
+
+    def flush_if_due(self):
+        pass
+
+    def get_pending_nowait(self):
+        pending = []
+        while not self.queue.empty():
+            pending.append(self.queue.get_nowait())
+        return pending
+
+    def __repr__(self):
+        return (
+            f'{self.__class__.__name__}(pending={len(self)}, '
+            f'writes={self.writes}, published_events={self.published_events})'
+        )
+
+
+class AsyncAnalyserRunner(object):
+    def __init__(self, service, cg_sub_group='default', max_pending_batches=4, idle_read_wait=0.01):
+        self.service = service
+        self.cg_sub_group = cg_sub_group
+        self.max_pending_batches = max_pending_batches
+        self.idle_read_wait = idle_read_wait
+        # one thread each, so the stream reads, the analyses and the publishes overlap but keep their own order
+        self.read_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix='analyser-read')
+        self.analysis_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='analyser-analysis')
+        self.publish_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='analyser-publish')
+        self.loop = None
+        self.pending_batches = None
+        self.publish_queue = None
+        self.is_stopping = False
+        self.processed_batches = 0
+        self.processed_events = 0
+
+    async def read_forever(self):
+        while not self.is_stopping:
+            events = await self.loop.run_in_executor(
+                self.read_executor, self.service.read_cmd_batch_events, self.cg_sub_group)
+            if not events:
+                await asyncio.sleep(self.idle_read_wait)
+                continue
+            await self.pending_batches.put(events)
+
+    async def analyse_forever(self):
+        while True:
+            events = await self.pending_batches.get()
+            try:
+                await self.loop.run_in_executor(
+                    self.analysis_executor, self.service.process_cmd_batch_events, self.cg_sub_group, events)
+            except Exception as e:
+                self.service.logger.error('Error processing CMD batch:')
+                self.service.logger.exception(e)
+            self.processed_batches += 1
+            self.processed_events += len(events)
+            self.pending_batches.task_done()
+
+    async def publish_forever(self):
+        while True:
+            pending = [await self.publish_queue.queue.get()]
+            pending.extend(self.publish_queue.get_pending_nowait())
+            try:
+                await self.loop.run_in_executor(self.publish_executor, write_events_pipelined, pending)
+                self.publish_queue.writes += 1
+                self.publish_queue.published_events += len(pending)
+            except Exception as e:
+                self.service.logger.error('Error publishing events:')
+                self.service.logger.exception(e)
+            for _ in pending:
+                self.publish_queue.queue.task_done()
+
+    async def drain(self):
+        # what was already read is analysed, and what the analyses published is written
+        await self.pending_batches.join()
+        await self.publish_queue.queue.join()
+
+    async def run_forever(self):
+        self.loop = asyncio.get_event_loop()
+        self.pending_batches = asyncio.Queue(maxsize=self.max_pending_batches)
+        self.publish_queue = AsyncPublishQueue(self.loop)
+        self.service.publish_buffer = self.publish_queue
+
+        reader = self.loop.create_task(self.read_forever())
+        workers = [self.loop.create_task(self.analyse_forever()), self.loop.create_task(self.publish_forever())]
+        try:
+            await reader
+            await self.drain()
+        finally:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    def stop(self):
+        # the reader stops after its current read, then the already read events are drained
+        self.is_stopping = True
+
+    def run(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            loop.run_until_complete(self.run_forever())
+        finally:
+            loop.close()
+            self.shutdown()
+
+    def shutdown(self):
+        for executor in (self.read_executor, self.analysis_executor, self.publish_executor):
+            executor.shutdown(wait=False)
+
+    def __repr__(self):
+        pending_batches = self.pending_batches.qsize() if self.pending_batches is not None else 0
+        return (
+            f'{self.__class__.__name__}(pending_batches={pending_batches}, '
+            f'processed_batches={self.processed_batches}, publish_queue={self.publish_queue})'
+        )
@@ -0,0 +1,150 @@
+import heapq
+
+from adaptation_analyser.worker_state import WorkerState
+
+
+# <qos policy>:<worker attribute>:<min|max>, latency=min picks the worker with the highest throughput
+DEFAULT_QOS_POLICIES = (
+    'energy_consumption=min:energy_consumption:min',
+    'latency=min:throughput:max',
+    'accuracy=max:accuracy:max',
+)
+
+
+def parse_qos_policies(qos_policy_specs):
+    query_qos_policies = {}
+    for qos_policy_spec in qos_policy_specs:
+        parts = [part.strip() for part in qos_policy_spec.split(':')]
+        if len(parts) != 3 or not all(parts) or parts[2] not in ('min', 'max'):
+            raise ValueError(f'Invalid QoS policy "{qos_policy_spec}", expected <policy>:<worker attribute>:<min|max>')
+        qos_policy, worker_policy_attr, direction = parts
+        query_qos_policies[qos_policy] = {
+            'worker_policy_attr': worker_policy_attr,
+            'worker_sort_sign': 1 if direction == 'min' else -1,
+        }
+    return query_qos_policies
+
+
+class BestWorkerIndex(object):
+    def __init__(self, worker_policy_attr, worker_sort_sign):
+        self.worker_policy_attr = worker_policy_attr
+        # 1 when lower values are better, -1 when higher values are better
+        self.worker_sort_sign = worker_sort_sign
+        self.heap = []
+        self.workers = {}
+        self.workers_order = {}
+
+    def __len__(self):
+        return len(self.workers)
+
+    def update_worker(self, stream_key, worker_data, best_worker=None):
+        # the policy value is read from worker_data, best_worker (worker_data by default) is what best_worker() returns
+        worker_policy_value = worker_data.get(self.worker_policy_attr)
+        if worker_policy_value is None:
+            self.remove_worker(stream_key)
+            return
+
+        sort_value = self.worker_sort_sign * float(worker_policy_value)
+        # ties are won by the worker that was seen first, even after re-announcements
+        order = self.workers_order.setdefault(stream_key, len(self.workers_order))
+        self.workers[stream_key] = (sort_value, worker_data if best_worker is None else best_worker)
+        heapq.heappush(self.heap, (sort_value, order, stream_key))
+        self.compact_if_needed()
+
+    def remove_worker(self, stream_key):
+        self.workers.pop(stream_key, None)
+
+    def is_entry_current(self, entry):
+        sort_value, order, stream_key = entry
+        worker = self.workers.get(stream_key)
+        return worker is not None and worker[0] == sort_value
+
+    def compact_if_needed(self):
+        # stale entries are dropped lazily, rebuild the heap if they pile up
+        if len(self.heap) > 2 * len(self.workers) + 16:
+            self.heap = [
+                (sort_value, self.workers_order[stream_key], stream_key)
+                for stream_key, (sort_value, worker_data) in self.workers.items()
+            ]
+            heapq.heapify(self.heap)
+
+    def best_worker(self):
+        while self.heap:
+            if self.is_entry_current(self.heap[0]):
+                stream_key = self.heap[0][2]
+                return self.workers[stream_key][1]
+            heapq.heappop(self.heap)
+        return None
+
+
+class QoSPolicyIndex(object):
+    """Best worker of every qos policy of a service type.
+
+    Keeps one sorted view per worker attribute and direction, shared by all the policies that use it, so a new
+    policy on an already indexed attribute costs nothing on updates and lookups.
+    """
+
+    def __init__(self, query_qos_policies):
+        self.views = {}
+        self.policy_views = {}
+        self.views_policies = {}
+        for qos_policy, policy_data in query_qos_policies.items():
+            view_key = (policy_data['worker_policy_attr'], policy_data['worker_sort_sign'])
+            view = self.views.get(view_key)
+            if view is None:
+                view = BestWorkerIndex(*view_key)
+                self.views[view_key] = view
+            self.policy_views[qos_policy] = view
+            self.views_policies.setdefault(view_key, []).append(qos_policy)
+        # the parsed fields come from the worker state, any other attribute (e.g. cost) from the announced worker
+        self.views_read_worker_state = {
+            view_key: view_key[0] in WorkerState.__slots__ for view_key in self.views
+        }
+        self.best_worker_per_view = {}
+        self.best_worker_keys = set()
+
+    def __len__(self):
+        return max((len(view) for view in self.views.values()), default=0)
+
+    def update_worker(self, stream_key, worker_data, worker_state=None):
+        for view_key, view in self.views.items():
+            if worker_state is not None and self.views_read_worker_state[view_key]:
+                view.update_worker(stream_key, worker_state)
+            else:
+                view.update_worker(stream_key, worker_data, worker_state)
+        return self.update_best_workers()
+
+    def remove_worker(self, stream_key):
+        for view in self.views.values():
+            view.remove_worker(stream_key)
+        return self.update_best_workers()
+
+    def update_best_workers(self):
+        # returns the new best worker of the policies whose best worker changed
+        changed_best_workers = {}
+        best_worker_per_view = self.best_worker_per_view
+        for view_key, view in self.views.items():
+            best_worker = view.best_worker()
+            if best_worker is not best_worker_per_view.get(view_key):
+                best_worker_per_view[view_key] = best_worker
+                for qos_policy in self.views_policies[view_key]:
+                    changed_best_workers[qos_policy] = best_worker
+        if changed_best_workers:
+            # workers only change on announcements, the monitoring events just read these
+            self.best_worker_keys = {
+                best_worker.get('stream_key') for best_worker in best_worker_per_view.values()
+                if best_worker is not None
+            }
+        return changed_best_workers
+
+    def best_worker(self, qos_policy):
+        return self.policy_views[qos_policy].best_worker()
+
+    def best_workers(self):
+        return {
+            qos_policy: self.best_worker_per_view.get((view.worker_policy_attr, view.worker_sort_sign))
+            for qos_policy, view in self.policy_views.items()
+        }
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(policies={len(self.policy_views)}, views={len(self.views)})'
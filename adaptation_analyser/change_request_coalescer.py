@@ -0,0 +1,51 @@
+class ChangeRequestCoalescer(object):
+    """Merges the change requests triggered within a time window into a single request with all their causes."""
+
+    def __init__(self, window, change_types_priority):
+        self.window = window
+        self.change_types_priority = change_types_priority
+        self.workers_per_change_type = {}
+        self.first_trigger_timestamp = None
+        self.coalesced_requests = 0
+
+    def __len__(self):
+        return len(self.workers_per_change_type)
+
+    def add(self, change_type, workers_per_type, timestamp):
+        if self.first_trigger_timestamp is None:
+            self.first_trigger_timestamp = timestamp
+        change_type_workers = self.workers_per_change_type.setdefault(change_type, {})
+        for service_type, workers in workers_per_type.items():
+            service_type_workers = change_type_workers.setdefault(service_type, [])
+            service_type_workers.extend(w for w in workers if w not in service_type_workers)
+
+    def is_due(self, timestamp):
+        if self.first_trigger_timestamp is None:
+            return False
+        return timestamp - self.first_trigger_timestamp >= self.window
+
+    def get_change_type(self):
+        for change_type in self.change_types_priority:
+            if change_type in self.workers_per_change_type:
+                return change_type
+        return next(iter(self.workers_per_change_type))
+
+    def pop_causes(self):
+        change_type = self.get_change_type()
+        # the request type is the most urgent cause, so the planner can keep handling it as before
+        causes = sorted(
+            self.workers_per_change_type.items(),
+            key=lambda item: item[0] != change_type
+        )
+        causes = [{'type': cause_type, 'workers': workers} for cause_type, workers in causes]
+        if len(causes) > 1:
+            self.coalesced_requests += 1
+        self.workers_per_change_type = {}
+        self.first_trigger_timestamp = None
+        return change_type, causes
+
+    def __repr__(self):
+        return (
+            f'{self.__class__.__name__}(pending={list(self.workers_per_change_type)}, '
+            f'coalesced_requests={self.coalesced_requests})'
+        )
@@ -0,0 +1,61 @@
+class TokenBucket(object):
+    def __init__(self, size, refill_rate, timestamp):
+        self.size = size
+        self.refill_rate = refill_rate
+        self.tokens = float(size)
+        self.last_refill_timestamp = timestamp
+
+    def refill(self, timestamp):
+        elapsed = timestamp - self.last_refill_timestamp
+        if elapsed > 0:
+            self.tokens = min(self.size, self.tokens + elapsed * self.refill_rate)
+            self.last_refill_timestamp = timestamp
+
+    def has_token(self, timestamp):
+        self.refill(timestamp)
+        return self.tokens >= 1
+
+    def consume(self):
+        self.tokens -= 1
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(tokens={self.tokens:.2f}/{self.size})'
+
+
+class ChangeRequestThrottle(object):
+    """Token bucket per change type and service type, a full bucket lets a burst of requests through right away."""
+
+    def __init__(self, bucket_size, refill_rate):
+        self.bucket_size = bucket_size
+        self.refill_rate = refill_rate
+        self.buckets = {}
+        self.allowed = 0
+        self.suppressed = 0
+
+    def get_bucket(self, change_type, service_type, timestamp):
+        key = (change_type, service_type)
+        bucket = self.buckets.get(key)
+        if bucket is None:
+            bucket = TokenBucket(self.bucket_size, self.refill_rate, timestamp)
+            self.buckets[key] = bucket
+        return bucket
+
+    def allow(self, change_type, service_types, timestamp):
+        # the request goes through if any of its service types still has a token, and uses one from each of them
+        buckets_with_tokens = [
+            bucket for bucket in (self.get_bucket(change_type, st, timestamp) for st in service_types)
+            if bucket.has_token(timestamp)
+        ]
+        if not buckets_with_tokens:
+            self.suppressed += 1
+            return False
+        for bucket in buckets_with_tokens:
+            bucket.consume()
+        self.allowed += 1
+        return True
+
+    def __repr__(self):
+        return (
+            f'{self.__class__.__name__}(buckets={len(self.buckets)}, allowed={self.allowed}, '
+            f'suppressed={self.suppressed})'
+        )
@@ -1,6 +1,6 @@
 import os
 
-from decouple import config
+from decouple import Csv, config
 
 SOURCE_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(SOURCE_DIR)
@@ -48,7 +48,47 @@ PUB_EVENT_LIST = [
 MF_LABELS = ['very_low', 'low', 'medium', 'high', 'very_high']
 
 UA_USAGE_ANALYSIS = config('UA_USAGE_ANALYSIS', default=False, cast=bool)
+UA_USAGE_TABLE_RESOLUTION = config('UA_USAGE_TABLE_RESOLUTION', default=33, cast=int)
+UA_NORMALIZED_UNIVERSE_SIZE = config('UA_NORMALIZED_UNIVERSE_SIZE', default=0, cast=int)
+UA_FIS_CACHE_MAX_ENTRIES = config('UA_FIS_CACHE_MAX_ENTRIES', default=32, cast=int)
+UA_FIS_CACHE_MAX_BYTES = config('UA_FIS_CACHE_MAX_BYTES', default=256 * 1024 * 1024, cast=int)
+UA_FIS_SNAPSHOT_DIR = config('UA_FIS_SNAPSHOT_DIR', default='')
+UA_EXECUTOR_WORKERS = config('UA_EXECUTOR_WORKERS', default=0, cast=int)
+UA_EXECUTOR_TIMEOUT = config('UA_EXECUTOR_TIMEOUT', default=0.5, cast=float)
+UA_EXECUTOR_MIN_WORKERS = config('UA_EXECUTOR_MIN_WORKERS', default=64, cast=int)
 
 SERVICE_DETAILS = None
 
+CMD_BATCH_SIZE = config('CMD_BATCH_SIZE', default=1, cast=int)
+PUBLISH_BUFFER_MAX_SIZE = config('PUBLISH_BUFFER_MAX_SIZE', default=0, cast=int)
+PUBLISH_BUFFER_MAX_LATENCY = config('PUBLISH_BUFFER_MAX_LATENCY', default=0.05, cast=float)
+ASYNC_RUNNER = config('ASYNC_RUNNER', default=False, cast=bool)
+WORKER_HISTORY_SIZE = config('WORKER_HISTORY_SIZE', default=0, cast=int)
+WORKER_HISTORY_MIN_SAMPLE_INTERVAL = config('WORKER_HISTORY_MIN_SAMPLE_INTERVAL', default=0.5, cast=float)
+PREDICTIVE_OVERLOAD_MIN_SAMPLES = config('PREDICTIVE_OVERLOAD_MIN_SAMPLES', default=3, cast=int)
+PREDICTIVE_OVERLOAD_DEFAULT_LEAD = config('PREDICTIVE_OVERLOAD_DEFAULT_LEAD', default=2.0, cast=float)
+CHANGE_REQUEST_MIN_INTERVAL = config('CHANGE_REQUEST_MIN_INTERVAL', default=3, cast=float)
+OVERLOADED_ENTER_PERCENTAGE = config('OVERLOADED_ENTER_PERCENTAGE', default=0.7, cast=float)
+OVERLOADED_EXIT_PERCENTAGE = config('OVERLOADED_EXIT_PERCENTAGE', default=0.7, cast=float)
+CHANGE_REQUEST_TOKEN_BUCKET_SIZE = config('CHANGE_REQUEST_TOKEN_BUCKET_SIZE', default=0, cast=int)
+CHANGE_REQUEST_TOKEN_BUCKET_REFILL_RATE = config('CHANGE_REQUEST_TOKEN_BUCKET_REFILL_RATE', default=0.2, cast=float)
+COALESCE_CHANGE_REQUESTS = config('COALESCE_CHANGE_REQUESTS', default=False, cast=bool)
+COALESCE_WINDOW = config('COALESCE_WINDOW', default=0, cast=float)
+QOS_POLICIES = config(
+    'QOS_POLICIES',
+    default='energy_consumption=min:energy_consumption:min,latency=min:throughput:max,accuracy=max:accuracy:max',
+    cast=Csv()
+)
+UNNECESSARY_LOAD_SHEDDING_ANALYSIS = config('UNNECESSARY_LOAD_SHEDDING_ANALYSIS', default=True, cast=bool)
+ANALYSER_SHARDS = config('ANALYSER_SHARDS', default=0, cast=int)
+ANALYSER_SHARD_TIMEOUT = config('ANALYSER_SHARD_TIMEOUT', default=1.0, cast=float)
+
+METRICS_HTTP_SERVER = config('METRICS_HTTP_SERVER', default=False, cast=bool)
+METRICS_DUMP_FILE = config('METRICS_DUMP_FILE', default='')
+METRICS_DUMP_INTERVAL = config('METRICS_DUMP_INTERVAL', default=60, cast=float)
+
+STATE_CHECKPOINT_FILE = config('STATE_CHECKPOINT_FILE', default='')
+STATE_CHECKPOINT_INTERVAL = config('STATE_CHECKPOINT_INTERVAL', default=5, cast=float)
+STATE_CHECKPOINT_MAX_AGE = config('STATE_CHECKPOINT_MAX_AGE', default=300, cast=float)
+
 LOGGING_LEVEL = config('LOGGING_LEVEL', default='DEBUG')
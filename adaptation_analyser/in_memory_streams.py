@@ -0,0 +1,60 @@
+import itertools
+
+from event_service_utils.streams.base import BasicStream, StreamFactory
+
+
+class InMemoryStream(BasicStream):
+    def __init__(self, key, entries, id_counter):
+        BasicStream.__init__(self, key)
+        self.entries = entries
+        self.id_counter = id_counter
+        self.read_index = 0
+
+    def write_events(self, *events):
+        event_ids = []
+        for event in events:
+            event_id = f'{next(self.id_counter)}-0'.encode('utf-8')
+            self.entries.append((event_id, event))
+            event_ids.append(event_id)
+        return event_ids
+
+    def read_events(self, count=1):
+        event_list = self.entries[self.read_index:self.read_index + count]
+        self.read_index += len(event_list)
+        yield from event_list
+
+    def ack(self, event_id, stream_key=None):
+        pass
+
+
+class InMemoryManyKeyConsumerGroup(BasicStream):
+    def __init__(self, streams, cg_id=None):
+        BasicStream.__init__(self, cg_id)
+        self.streams = streams
+
+    def read_stream_events_list(self, count=1):
+        stream_event_list = []
+        for stream in self.streams:
+            event_list = list(stream.read_events(count=count))
+            if event_list:
+                stream_event_list.append([stream.key.encode('utf-8'), event_list])
+        return stream_event_list
+
+
+class InMemoryStreamFactory(StreamFactory):
+    """Stand-in for RedisStreamFactory, every created stream has its own read cursor over the key entries."""
+
+    def __init__(self):
+        self.entries_by_key = {}
+        self.id_counter = itertools.count(1)
+
+    def get_entries(self, key):
+        return self.entries_by_key.setdefault(key, [])
+
+    def create_stream(self, key):
+        return InMemoryStream(key=key, entries=self.get_entries(key), id_counter=self.id_counter)
+
+    def create(self, key, stype='streamAndConsumer', cg_id=None):
+        if stype == 'manyKeyConsumerOnly':
+            return InMemoryManyKeyConsumerGroup([self.create_stream(k) for k in key], cg_id=cg_id)
+        return self.create_stream(key)
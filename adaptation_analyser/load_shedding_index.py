@@ -0,0 +1,85 @@
+def filter_dataflow_choices_with_load_shedding(dataflow_choices):
+    # each choice is [load_shedding, ..., dataflow], where the dataflow is a list of [worker_key, ...] steps
+    filtered = []
+    for choice in dataflow_choices:
+        if len(choice) == 3 and float(choice[0]) > 0:
+            filtered.append(choice)
+    return filtered
+
+
+class LoadSheddingDataflowIndex(object):
+    """Load shedding dataflows of the current plan, indexed by the stream keys of their workers.
+
+    Each dataflow keeps how many of its workers are overloaded, so only the dataflows of the workers whose overload
+    status changed are updated. A dataflow shedding load without any overloaded worker is unnecessary.
+    """
+
+    def __init__(self, is_load_shedding_strategy=False, dataflow_choices=()):
+        self.is_load_shedding_strategy = is_load_shedding_strategy
+        self.dataflows = []
+        self.worker_dataflows = {}
+        for choice in filter_dataflow_choices_with_load_shedding(dataflow_choices):
+            dataflow_index = len(self.dataflows)
+            dataflow_workers = []
+            for worker_key_list in choice[2]:
+                worker_key = worker_key_list[0]
+                if worker_key not in dataflow_workers:
+                    dataflow_workers.append(worker_key)
+                    self.worker_dataflows.setdefault(worker_key, []).append(dataflow_index)
+            self.dataflows.append(dataflow_workers)
+        self.overloaded_counts = [0] * len(self.dataflows)
+        self.unnecessary_dataflows_count = len(self.dataflows)
+        self.overloaded_workers = set()
+
+    @classmethod
+    def from_plan(cls, plan):
+        if plan is None:
+            return cls()
+        execution_plan_strategy = plan.get('execution_plan', {}).get('strategy', {})
+        return cls(
+            is_load_shedding_strategy='load_shedding' in execution_plan_strategy.get('name', ''),
+            dataflow_choices=execution_plan_strategy.get('dataflows', []),
+        )
+
+    def __len__(self):
+        return len(self.dataflows)
+
+    def _add_overloaded_count(self, worker_key, increment):
+        overloaded_counts = self.overloaded_counts
+        for dataflow_index in self.worker_dataflows.get(worker_key, ()):
+            previous_count = overloaded_counts[dataflow_index]
+            overloaded_counts[dataflow_index] = previous_count + increment
+            if previous_count == 0:
+                self.unnecessary_dataflows_count -= 1
+            elif previous_count + increment == 0:
+                self.unnecessary_dataflows_count += 1
+
+    def update_overloaded_workers(self, overloaded_changes):
+        # overloaded_changes maps the stream key of each worker whose verdict changed to whether it is overloaded now
+        overloaded_workers = self.overloaded_workers
+        for worker_key, is_overloaded in overloaded_changes.items():
+            if is_overloaded == (worker_key in overloaded_workers):
+                continue
+            if is_overloaded:
+                overloaded_workers.add(worker_key)
+                self._add_overloaded_count(worker_key, 1)
+            else:
+                overloaded_workers.discard(worker_key)
+                self._add_overloaded_count(worker_key, -1)
+
+    def has_unnecessary_load_shedding(self):
+        if not self.is_load_shedding_strategy:
+            return False
+        # if there are no overloaded workers, than no load shedding should exist
+        if len(self.overloaded_workers) == 0:
+            return True
+        return self.unnecessary_dataflows_count > 0
+
+    def get_unnecessary_dataflows(self):
+        return [self.dataflows[i] for i, count in enumerate(self.overloaded_counts) if count == 0]
+
+    def __repr__(self):
+        return (
+            f'{self.__class__.__name__}(load_shedding={self.is_load_shedding_strategy}, '
+            f'dataflows={len(self.dataflows)}, unnecessary={self.unnecessary_dataflows_count})'
+        )
@@ -0,0 +1,105 @@
+import math
+
+from prometheus_client import Counter, Gauge, Histogram, REGISTRY, write_to_textfile
+
+
+LATENCY_BUCKETS = (
+    .00005, .0001, .00025, .0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1.0, 2.5, 5.0, float('inf')
+)
+
+HANDLER_LATENCY = Histogram(
+    'adaptation_analyser_handler_latency_seconds',
+    'Latency of each event type handler',
+    ['handler'],
+    buckets=LATENCY_BUCKETS,
+)
+ANALYSIS_LATENCY = Histogram(
+    'adaptation_analyser_analysis_latency_seconds',
+    'Latency of each service workers analysis, including the fuzzy inference',
+    ['analysis'],
+    buckets=LATENCY_BUCKETS,
+)
+ANALYSIS_TRIGGERS = Counter(
+    'adaptation_analyser_analysis_triggers_total',
+    'Number of times an analysis asked for a change plan',
+    ['analysis'],
+)
+CHANGE_REQUESTS_SUPPRESSED = Counter(
+    'adaptation_analyser_change_requests_suppressed_total',
+    'Change plan requests dropped by the token bucket throttling',
+    ['change_type'],
+)
+FUZZY_FALLBACKS = Counter(
+    'adaptation_analyser_fuzzy_fallbacks_total',
+    'Service type batches evaluated with the crisp usage ratio because the process pool missed its deadline',
+)
+PREDICTED_OVERLOADS = Counter(
+    'adaptation_analyser_predicted_overloads_total',
+    'Workers reported as overloaded because their queue trend crosses the threshold before a plan could execute',
+)
+STARTUP_LATENCY = Gauge(
+    'adaptation_analyser_startup_seconds',
+    'Seconds from the process start until each startup phase (ready, first_event)',
+    ['phase'],
+)
+
+
+def _bucket_quantile(buckets, count, quantile):
+    # upper bound of the first bucket holding the quantile, good enough for a log summary
+    rank = quantile * count
+    for upper_bound, cumulative_count in buckets:
+        if cumulative_count >= rank:
+            return upper_bound
+    return float('inf')
+
+
+def summarize_histogram(histogram):
+    samples_by_label = {}
+    for metric in histogram.collect():
+        for sample in metric.samples:
+            labels = {k: v for k, v in sample.labels.items() if k != 'le'}
+            label_value = ','.join(labels.values())
+            label_samples = samples_by_label.setdefault(label_value, {'buckets': []})
+            if sample.name.endswith('_bucket'):
+                label_samples['buckets'].append((float(sample.labels['le']), sample.value))
+            elif sample.name.endswith('_count'):
+                label_samples['count'] = sample.value
+            elif sample.name.endswith('_sum'):
+                label_samples['sum'] = sample.value
+
+    summary = {}
+    for label_value, label_samples in samples_by_label.items():
+        count = label_samples.get('count', 0)
+        if count == 0:
+            continue
+        buckets = sorted(label_samples['buckets'])
+        p50 = _bucket_quantile(buckets, count, 0.5)
+        p99 = _bucket_quantile(buckets, count, 0.99)
+        summary[label_value] = {
+            'count': int(count),
+            'mean_ms': round(label_samples['sum'] / count * 1000, 4),
+            'p50_ms<=': p50 * 1000 if not math.isinf(p50) else p50,
+            'p99_ms<=': p99 * 1000 if not math.isinf(p99) else p99,
+        }
+    return summary
+
+
+def summarize_counter(counter):
+    summary = {}
+    for metric in counter.collect():
+        for sample in metric.samples:
+            if sample.name.endswith('_total'):
+                summary[','.join(sample.labels.values())] = int(sample.value)
+    return summary
+
+
+def summarize_gauge(gauge):
+    summary = {}
+    for metric in gauge.collect():
+        for sample in metric.samples:
+            summary[','.join(sample.labels.values())] = sample.value
+    return summary
+
+
+def dump_metrics_to_file(path, registry=REGISTRY):
+    write_to_textfile(path, registry)
@@ -0,0 +1,79 @@
+import logging
+import threading
+import time
+
+
+def write_events_pipelined(pending):
+    # a single pipeline keeps the publishing order, and therefore the per-stream order
+    pipeline = None
+    for stream, event_msg in pending:
+        redis_db = getattr(stream, 'redis_db', None)
+        if redis_db is None:
+            stream.write_events(event_msg)
+            continue
+        if pipeline is None:
+            pipeline = redis_db.pipeline(transaction=False)
+        pipeline.xadd(stream.key, event_msg, **getattr(stream, 'default_write_kwargs', {}))
+    if pipeline is not None:
+        pipeline.execute()
+
+
+class PipelinedPublishBuffer(object):
+    def __init__(self, max_size, max_latency, clock=time.monotonic, logger=None):
+        self.max_size = max_size
+        self.max_latency = max_latency
+        self.clock = clock
+        self.logger = logger if logger is not None else logging.getLogger(self.__class__.__name__)
+        self.pending = []
+        self.first_pending_time = None
+        self.lock = threading.RLock()
+        self.flushed_events = 0
+        self.flushes = 0
+        self.failed_flushes = 0
+
+    def __len__(self):
+        return len(self.pending)
+
+    def add(self, stream, event_msg):
+        with self.lock:
+            if not self.pending:
+                self.first_pending_time = self.clock()
+            self.pending.append((stream, event_msg))
+            if len(self.pending) >= self.max_size:
+                self.flush()
+
+    def is_flush_due(self):
+        if not self.pending:
+            return False
+        return self.clock() - self.first_pending_time >= self.max_latency
+
+    def flush_if_due(self):
+        with self.lock:
+            if self.is_flush_due():
+                self.flush()
+
+    def flush(self):
+        with self.lock:
+            pending = self.pending
+            if not pending:
+                return 0
+
+            try:
+                write_events_pipelined(pending)
+            except Exception as e:
+                # kept for the next flush, so a failed write may publish some of them twice but never loses them
+                self.failed_flushes += 1
+                self.logger.error(f'Error writing {len(pending)} buffered events, keeping them for the next flush:')
+                self.logger.exception(e)
+                return 0
+            self.pending = []
+            self.first_pending_time = None
+            self.flushes += 1
+            self.flushed_events += len(pending)
+            return len(pending)
+
+    def __repr__(self):
+        return (
+            f'{self.__class__.__name__}(pending={len(self.pending)}, '
+            f'flushes={self.flushes}, failed_flushes={self.failed_flushes}, flushed_events={self.flushed_events})'
+        )
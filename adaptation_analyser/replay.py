@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+import argparse
+import json
+import math
+import time
+
+from opentracing import Tracer
+
+from adaptation_analyser.in_memory_streams import InMemoryStreamFactory
+from adaptation_analyser.service import AdaptationAnalyser
+
+from adaptation_analyser.conf import (
+    PUB_EVENT_LIST,
+    SERVICE_STREAM_KEY,
+    SERVICE_CMD_KEY_LIST,
+    SERVICE_DETAILS,
+)
+
+
+class ReplayClock(object):
+    def __init__(self, start_timestamp=0.0):
+        self.now = start_timestamp
+
+    def timestamp(self):
+        return self.now
+
+    def set(self, timestamp):
+        self.now = timestamp
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class ReplayAdaptationAnalyser(AdaptationAnalyser):
+    def __init__(self, clock, **kwargs):
+        self.clock = clock
+        super(ReplayAdaptationAnalyser, self).__init__(**kwargs)
+
+    def current_timestamp(self):
+        return self.clock.timestamp()
+
+
+def load_trace(trace_path):
+    # one {"event_type": ..., "event_data": {...}, "timestamp": <optional secs>} per line
+    trace = []
+    with open(trace_path, 'r') as trace_file:
+        for line in trace_file:
+            line = line.strip()
+            if line:
+                trace.append(json.loads(line))
+    return trace
+
+
+def prepare_replay_service(clock, stream_factory=None, logging_level='ERROR', **service_kwargs):
+    if stream_factory is None:
+        stream_factory = InMemoryStreamFactory()
+    service = ReplayAdaptationAnalyser(
+        clock=clock,
+        service_stream_key=SERVICE_STREAM_KEY,
+        service_cmd_key_list=SERVICE_CMD_KEY_LIST,
+        pub_event_list=PUB_EVENT_LIST,
+        service_details=SERVICE_DETAILS,
+        stream_factory=stream_factory,
+        logging_level=logging_level,
+        tracer_configs={'reporting_host': None, 'reporting_port': None},
+        **service_kwargs
+    )
+    # jaeger only initializes one tracer per process, offline replays use the no-op tracer
+    if service.tracer:
+        service.tracer.close()
+    service.tracer = Tracer()
+    return service
+
+
+def percentile(sorted_values, percent):
+    if not sorted_values:
+        return None
+    rank = max(math.ceil(percent / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[rank]
+
+
+def summarize_latencies(latencies):
+    sorted_latencies = sorted(latencies)
+    return {
+        'count': len(sorted_latencies),
+        'mean_ms': sum(sorted_latencies) / len(sorted_latencies) * 1000,
+        'p50_ms': percentile(sorted_latencies, 50) * 1000,
+        'p99_ms': percentile(sorted_latencies, 99) * 1000,
+        'max_ms': sorted_latencies[-1] * 1000,
+    }
+
+
+def collect_published_events(service):
+    published_events = {}
+    for event_type in service.pub_event_list:
+        entries = service.stream_factory.get_entries(event_type)
+        published_events[event_type] = [service.default_event_deserializer(event_msg) for _, event_msg in entries]
+    return published_events
+
+
+def replay_trace(service, trace, clock, default_step=1.0):
+    latencies_per_event_type = {}
+    start_time = time.perf_counter()
+    for trace_event in trace:
+        timestamp = trace_event.get('timestamp')
+        if timestamp is None:
+            clock.advance(default_step)
+        else:
+            clock.set(timestamp)
+
+        event_type = trace_event['event_type']
+        event_data = trace_event['event_data']
+        event_start_time = time.perf_counter()
+        service.process_event_type(event_type=event_type, event_data=event_data, json_msg=None)
+        latencies_per_event_type.setdefault(event_type, []).append(time.perf_counter() - event_start_time)
+    duration = time.perf_counter() - start_time
+
+    if service.publish_buffer is not None:
+        service.publish_buffer.flush()
+
+    published_events = collect_published_events(service)
+    return {
+        'events': len(trace),
+        'duration_secs': duration,
+        'events_per_sec': len(trace) / duration if duration > 0 else None,
+        'per_event_type': {
+            event_type: summarize_latencies(latencies)
+            for event_type, latencies in latencies_per_event_type.items()
+        },
+        'published': {event_type: len(events) for event_type, events in published_events.items()},
+        'published_events': published_events,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay a recorded JSONL event trace through the AdaptationAnalyser.')
+    parser.add_argument('trace', help='JSONL trace file')
+    parser.add_argument('--output', help='write the full report (including published events) to this json file')
+    parser.add_argument('--step', type=float, default=1.0, help='clock step for trace events without timestamp')
+    args = parser.parse_args()
+
+    trace = load_trace(args.trace)
+    clock = ReplayClock()
+    service = prepare_replay_service(clock)
+    report = replay_trace(service, trace, clock, default_step=args.step)
+
+    summary = {k: v for k, v in report.items() if k != 'published_events'}
+    print(json.dumps(summary, indent=4))
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=4)
+
+
+if __name__ == '__main__':
+    main()
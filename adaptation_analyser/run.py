@@ -1,7 +1,12 @@
 #!/usr/bin/env python
+import time
+# taken before the heavy imports, so the startup metrics include them
+PROCESS_START_TIME = time.monotonic()
+
 from event_service_utils.streams.redis import RedisStreamFactory
 
 from adaptation_analyser.service import AdaptationAnalyser
+from adaptation_analyser.sharding import ShardedAdaptationAnalyser
 
 from adaptation_analyser.conf import (
     REDIS_ADDRESS,
@@ -14,6 +19,34 @@ from adaptation_analyser.conf import (
     TRACER_REPORTING_PORT,
     SERVICE_DETAILS,
     UA_USAGE_ANALYSIS,
+    UA_EXECUTOR_WORKERS,
+    UA_EXECUTOR_TIMEOUT,
+    UA_EXECUTOR_MIN_WORKERS,
+    CMD_BATCH_SIZE,
+    PUBLISH_BUFFER_MAX_SIZE,
+    PUBLISH_BUFFER_MAX_LATENCY,
+    ASYNC_RUNNER,
+    WORKER_HISTORY_SIZE,
+    WORKER_HISTORY_MIN_SAMPLE_INTERVAL,
+    PREDICTIVE_OVERLOAD_MIN_SAMPLES,
+    PREDICTIVE_OVERLOAD_DEFAULT_LEAD,
+    CHANGE_REQUEST_MIN_INTERVAL,
+    OVERLOADED_ENTER_PERCENTAGE,
+    OVERLOADED_EXIT_PERCENTAGE,
+    CHANGE_REQUEST_TOKEN_BUCKET_SIZE,
+    CHANGE_REQUEST_TOKEN_BUCKET_REFILL_RATE,
+    COALESCE_CHANGE_REQUESTS,
+    COALESCE_WINDOW,
+    QOS_POLICIES,
+    UNNECESSARY_LOAD_SHEDDING_ANALYSIS,
+    METRICS_HTTP_SERVER,
+    METRICS_DUMP_FILE,
+    METRICS_DUMP_INTERVAL,
+    STATE_CHECKPOINT_FILE,
+    STATE_CHECKPOINT_INTERVAL,
+    STATE_CHECKPOINT_MAX_AGE,
+    ANALYSER_SHARDS,
+    ANALYSER_SHARD_TIMEOUT,
 )
 
 
@@ -23,14 +56,47 @@ def run_service():
         'reporting_port': TRACER_REPORTING_PORT,
     }
     stream_factory = RedisStreamFactory(host=REDIS_ADDRESS, port=REDIS_PORT)
-    service = AdaptationAnalyser(
+    service_cls = AdaptationAnalyser
+    sharding_kwargs = {}
+    if ANALYSER_SHARDS > 1:
+        service_cls = ShardedAdaptationAnalyser
+        sharding_kwargs = {'number_of_shards': ANALYSER_SHARDS, 'shard_timeout': ANALYSER_SHARD_TIMEOUT}
+    service = service_cls(
         service_stream_key=SERVICE_STREAM_KEY,
         service_cmd_key_list=SERVICE_CMD_KEY_LIST,
         pub_event_list=PUB_EVENT_LIST,
         service_details=SERVICE_DETAILS,
         stream_factory=stream_factory,
         logging_level=LOGGING_LEVEL,
-        tracer_configs=tracer_configs
+        tracer_configs=tracer_configs,
+        cmd_batch_size=CMD_BATCH_SIZE,
+        publish_buffer_max_size=PUBLISH_BUFFER_MAX_SIZE,
+        publish_buffer_max_latency=PUBLISH_BUFFER_MAX_LATENCY,
+        async_runner=ASYNC_RUNNER,
+        worker_history_size=WORKER_HISTORY_SIZE,
+        worker_history_min_sample_interval=WORKER_HISTORY_MIN_SAMPLE_INTERVAL,
+        predictive_overload_min_samples=PREDICTIVE_OVERLOAD_MIN_SAMPLES,
+        predictive_overload_default_lead=PREDICTIVE_OVERLOAD_DEFAULT_LEAD,
+        change_request_min_interval=CHANGE_REQUEST_MIN_INTERVAL,
+        overloaded_enter_percentage=OVERLOADED_ENTER_PERCENTAGE,
+        overloaded_exit_percentage=OVERLOADED_EXIT_PERCENTAGE,
+        change_request_bucket_size=CHANGE_REQUEST_TOKEN_BUCKET_SIZE,
+        change_request_bucket_refill_rate=CHANGE_REQUEST_TOKEN_BUCKET_REFILL_RATE,
+        coalesce_change_requests=COALESCE_CHANGE_REQUESTS,
+        coalesce_window=COALESCE_WINDOW,
+        qos_policies=QOS_POLICIES,
+        unnecessary_load_shedding_analysis=UNNECESSARY_LOAD_SHEDDING_ANALYSIS,
+        metrics_http_server=METRICS_HTTP_SERVER,
+        metrics_dump_file=METRICS_DUMP_FILE,
+        metrics_dump_interval=METRICS_DUMP_INTERVAL,
+        process_start_time=PROCESS_START_TIME,
+        state_checkpoint_file=STATE_CHECKPOINT_FILE,
+        state_checkpoint_interval=STATE_CHECKPOINT_INTERVAL,
+        state_checkpoint_max_age=STATE_CHECKPOINT_MAX_AGE,
+        ua_executor_workers=UA_EXECUTOR_WORKERS,
+        ua_executor_timeout=UA_EXECUTOR_TIMEOUT,
+        ua_executor_min_workers=UA_EXECUTOR_MIN_WORKERS,
+        **sharding_kwargs
     )
     service.run()
 
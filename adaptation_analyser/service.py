@@ -1,12 +1,36 @@
 import datetime
+import logging
 import math
 import threading
+import time
 
 from event_service_utils.logging.decorators import timer_logger
 from event_service_utils.services.event_driven import BaseEventDrivenCMDService
+from event_service_utils.services.tracer import EVENT_ID_TAG, tags
 from event_service_utils.tracing.jaeger import init_tracer
 
-from adaptation_analyser.uncertainty.ua_analysis import UAServiceAnalysis
+from adaptation_analyser.best_worker_index import DEFAULT_QOS_POLICIES, QoSPolicyIndex, parse_qos_policies
+from adaptation_analyser.change_request_coalescer import ChangeRequestCoalescer
+from adaptation_analyser.change_request_throttle import ChangeRequestThrottle
+from adaptation_analyser.load_shedding_index import LoadSheddingDataflowIndex
+from adaptation_analyser.metrics import (
+    ANALYSIS_LATENCY,
+    ANALYSIS_TRIGGERS,
+    CHANGE_REQUESTS_SUPPRESSED,
+    FUZZY_FALLBACKS,
+    HANDLER_LATENCY,
+    PREDICTED_OVERLOADS,
+    STARTUP_LATENCY,
+    dump_metrics_to_file,
+    summarize_counter,
+    summarize_gauge,
+    summarize_histogram,
+)
+from adaptation_analyser.publish_buffer import PipelinedPublishBuffer
+from adaptation_analyser.service_aggregates import ServiceTypeAggregates
+from adaptation_analyser.state_checkpoint import StateCheckpointer
+from adaptation_analyser.worker_history import WorkerHistory
+from adaptation_analyser.worker_state import WorkerState
 
 from adaptation_analyser.conf import (
     LISTEN_EVENT_TYPE_QUERY_CREATED,
@@ -19,13 +43,60 @@ from adaptation_analyser.conf import (
 )
 
 
+# analyser state kept in the checkpoint, best workers are rebuilt from current_service_workers on restore
+STATE_CHECKPOINT_SECTIONS = (
+    'current_service_workers',
+    'last_adaptation_executed_per_type',
+    'current_plan',
+    'last_service_workers_monitoring',
+)
+
+# same order as the service workers size analyses, the most urgent change comes first
+CHANGE_TYPES_PRIORITY = (
+    'ServiceWorkerOverloadedPlanRequested',
+    'ServiceWorkerBestIdlePlanRequested',
+    'UnnecessaryLoadSheddingPlanRequested',
+)
+
+
 class AdaptationAnalyser(BaseEventDrivenCMDService):
     def __init__(self,
                  service_stream_key, service_cmd_key_list,
                  pub_event_list, service_details,
                  stream_factory,
                  logging_level,
-                 tracer_configs):
+                 tracer_configs,
+                 cmd_batch_size=1,
+                 publish_buffer_max_size=0,
+                 publish_buffer_max_latency=0.05,
+                 metrics_http_server=False,
+                 metrics_dump_file=None,
+                 metrics_dump_interval=60,
+                 process_start_time=None,
+                 state_checkpoint_file=None,
+                 state_checkpoint_interval=5,
+                 state_checkpoint_max_age=300,
+                 ua_executor_workers=0,
+                 ua_executor_timeout=0.5,
+                 ua_executor_min_workers=64,
+                 async_runner=False,
+                 worker_history_size=0,
+                 worker_history_min_sample_interval=0.5,
+                 predictive_overload_min_samples=3,
+                 predictive_overload_default_lead=2.0,
+                 change_request_min_interval=3,
+                 overloaded_enter_percentage=0.7,
+                 overloaded_exit_percentage=None,
+                 change_request_bucket_size=0,
+                 change_request_bucket_refill_rate=0.2,
+                 coalesce_change_requests=False,
+                 coalesce_window=0,
+                 qos_policies=None,
+                 unnecessary_load_shedding_analysis=True):
+        if overloaded_exit_percentage is not None and overloaded_exit_percentage > overloaded_enter_percentage:
+            raise ValueError(
+                f'Overloaded exit percentage {overloaded_exit_percentage} is above the enter percentage '
+                f'{overloaded_enter_percentage}')
         tracer = init_tracer(self.__class__.__name__, **tracer_configs)
         super(AdaptationAnalyser, self).__init__(
             name=self.__class__.__name__,
@@ -39,48 +110,104 @@ class AdaptationAnalyser(BaseEventDrivenCMDService):
         )
         self.cmd_validation_fields = ['id']
         self.data_validation_fields = ['id']
-
+        self.cmd_batch_size = cmd_batch_size
+        self.async_runner = async_runner
+        self.publish_buffer = None
+        if publish_buffer_max_size > 1:
+            self.publish_buffer = PipelinedPublishBuffer(
+                max_size=publish_buffer_max_size, max_latency=publish_buffer_max_latency, logger=self.logger)
+        # exposes the default prometheus registry (handler/analysis latencies) on port 8000 when running
+        self.start_prometheus_http_server = metrics_http_server
+        self.metrics_dump_file = metrics_dump_file
+        self.metrics_dump_interval = metrics_dump_interval
+        self.last_metrics_dump_time = None
+        # time.monotonic() from the very start of the process (before the heavy imports), if known
+        self.process_start_time = process_start_time if process_start_time is not None else time.monotonic()
+        self.has_processed_first_event = False
 
         self.current_service_workers = {}
-        self.min_seconds_to_ask_same_change_request_type = 3
+        # parsed numeric state of every known worker, shared by all the analyses
+        self.worker_states_per_type = {}
+        # shared results of the single workers pass of the monitoring event being analysed
+        self.monitored_evaluations_per_type = None
+        self.min_seconds_to_ask_same_change_request_type = change_request_min_interval
         self.adaptation_delta = 10
         self.best_workers_by_service_by_qos_policy = {}
-        self.query_qos_policies = self.prepare_query_qos_policies()
+        self.qos_policy_index_per_type = {}
+        self.query_qos_policies = self.prepare_query_qos_policies(qos_policies)
 
         self.last_service_workers_monitoring = None
         self.number_of_workers = 0
         self.current_plan = None
+        self.unnecessary_load_shedding_analysis = unnecessary_load_shedding_analysis
+        self.load_shedding_index = LoadSheddingDataflowIndex()
         self.overloaded_workers = None
-        self.is_overloaded_percentage = 0.7
+        self.overloaded_workers_per_type = {}
+        self.best_idle_workers_per_type = {}
+        self.unnecessary_load_shedding_workers_per_type = {}
+        # every change request triggered within the window goes into a single request, disabled with None
+        self.change_request_coalescer = None
+        if coalesce_change_requests:
+            self.change_request_coalescer = ChangeRequestCoalescer(
+                window=coalesce_window, change_types_priority=CHANGE_TYPES_PRIORITY)
+        self.is_overloaded_percentage = overloaded_enter_percentage
+        self.overloaded_exit_percentage = self.is_overloaded_percentage
+        if overloaded_exit_percentage is not None:
+            self.overloaded_exit_percentage = overloaded_exit_percentage
+        self.change_request_throttle = None
+        if change_request_bucket_size > 0:
+            self.change_request_throttle = ChangeRequestThrottle(
+                bucket_size=change_request_bucket_size, refill_rate=change_request_bucket_refill_rate)
         self.last_adaptation_executed_per_type = {}
         self.ua_usage_analysis_per_type = {}
+        self.aggregates_per_type = {}
+        # recent samples per worker for the predictive overload detection, disabled with a size of 0
+        self.worker_history_size = worker_history_size
+        self.worker_history_min_sample_interval = worker_history_min_sample_interval
+        self.worker_history_per_type = {}
+        self.predictive_overload_min_samples = predictive_overload_min_samples
+        self.predictive_overload_default_lead = predictive_overload_default_lead
+        self.overloaded_plan_execution_seconds = None
+        self.plan_execution_time_smoothing = 0.3
+        self.ua_executor_min_workers = ua_executor_min_workers
+        self.fuzzy_usage_executor = None
+        if UA_USAGE_ANALYSIS and ua_executor_workers > 0:
+            from adaptation_analyser.uncertainty.usage_executor import FuzzyUsageExecutor
+            self.fuzzy_usage_executor = FuzzyUsageExecutor(
+                max_workers=ua_executor_workers, timeout=ua_executor_timeout, logger=self.logger)
+
+        self.state_checkpointer = None
+        if state_checkpoint_file:
+            self.state_checkpointer = StateCheckpointer(
+                path=state_checkpoint_file,
+                interval=state_checkpoint_interval,
+                max_age=state_checkpoint_max_age,
+                logger=self.logger,
+            )
+            self.restore_state_checkpoint()
+
+    def prepare_query_qos_policies(self, qos_policies=None):
+        if qos_policies is None:
+            qos_policies = DEFAULT_QOS_POLICIES
+        return parse_qos_policies(qos_policies)
+
+    def current_timestamp(self):
+        return datetime.datetime.now().timestamp()
+
+    def allow_change_request(self, change_type, service_types):
+        if self.change_request_throttle is None:
+            return True
+        if self.change_request_throttle.allow(change_type, service_types, self.current_timestamp()):
+            return True
+        CHANGE_REQUESTS_SUPPRESSED.labels(change_type=change_type).inc()
+        self.logger.debug(f'Suppressed "{change_type}" request for service types: {list(service_types)}')
+        return False
 
-    def prepare_query_qos_policies(self):
-        query_qos_policies = {
-            'energy_consumption=min': {
-                'worker_policy_attr': 'energy_consumption',
-            },
-            'latency=min': {
-                'worker_policy_attr': 'throughput',
-            },
-            'accuracy=max': {
-                'worker_policy_attr': 'accuracy',
-            },
-        }
-
-        def comp_lower_than(a_val, b_val):
-            return a_val < b_val
-
-        def comp_higher_than(a_val, b_val):
-            return a_val > b_val
-
-        for qos_policy, policy_data in query_qos_policies.items():
-            if '=min' in qos_policy and 'energy_consumption' in qos_policy:
-                comparison = comp_lower_than
-            else:
-                comparison = comp_higher_than
-            query_qos_policies[qos_policy]['worker_a_b_comparison'] = comparison
-        return query_qos_policies
+    def allow_analysed_change_request(self, change_type, service_types):
+        # a coalesced request is only throttled once, when it is sent
+        if self.change_request_coalescer is not None:
+            return True
+        return self.allow_change_request(change_type, service_types)
 
     def verify_dont_have_similar_recent_plan_in_execution(self, change_type):
         last_executed = self.last_adaptation_executed_per_type.get(change_type)
@@ -91,7 +218,7 @@ class AdaptationAnalyser(BaseEventDrivenCMDService):
         if not last_request_timestamp:
             return True
 
-        ts_now = datetime.datetime.now().timestamp()
+        ts_now = self.current_timestamp()
         seconds_since_last_request = ts_now - last_request_timestamp
         min_time = self.min_seconds_to_ask_same_change_request_type
         if seconds_since_last_request < min_time:
@@ -99,8 +226,94 @@ class AdaptationAnalyser(BaseEventDrivenCMDService):
 
         return True
 
+    def serialize_and_buffer_event_with_trace(self, event_data, destination_stream):
+        event_data = self.inject_current_tracer_into_event_data(event_data)
+        event_msg = self.default_event_serializer(event_data)
+        self.publish_buffer.add(destination_stream, event_msg)
+
+    def publish_event_type_to_stream(self, event_type, new_event_data):
+        if self.publish_buffer is None:
+            return super(AdaptationAnalyser, self).publish_event_type_to_stream(event_type, new_event_data)
+
+        pub_stream = self.pub_event_stream_map.get(event_type)
+        if pub_stream is None:
+            raise RuntimeError(f'No publishing stream defined for event type: {event_type}!')
+
+        self.logger.info(f'Buffering "{event_type}" entity for publishing: {new_event_data}')
+        self.event_trace_for_method_with_event_data(
+            method=self.serialize_and_buffer_event_with_trace,
+            method_args=(),
+            method_kwargs={
+                'event_data': new_event_data,
+                'destination_stream': pub_stream,
+            },
+            get_event_tracer=False,
+            tracer_tags={
+                tags.MESSAGE_BUS_DESTINATION: pub_stream.key,
+                tags.SPAN_KIND: tags.SPAN_KIND_PRODUCER,
+                EVENT_ID_TAG: new_event_data['id'],
+            }
+        )
+
+    def flush_publish_buffer_if_due(self):
+        if self.publish_buffer is None:
+            return
+        try:
+            self.publish_buffer.flush_if_due()
+        except Exception as e:
+            self.logger.error('Error flushing publish buffer:')
+            self.logger.exception(e)
+
+    def run_publish_buffer_flush_forever(self):
+        while True:
+            time.sleep(self.publish_buffer.max_latency)
+            self.flush_publish_buffer_if_due()
+
+    def mark_state_dirty(self, *sections):
+        if self.state_checkpointer is not None:
+            self.state_checkpointer.mark_dirty(*sections)
+
+    def get_state_checkpoint_section(self, section):
+        return getattr(self, section)
+
+    def checkpoint_state_if_due(self):
+        if self.state_checkpointer is None:
+            return
+        try:
+            self.state_checkpointer.checkpoint_if_due(self.get_state_checkpoint_section, self.current_timestamp())
+        except Exception as e:
+            self.logger.error('Error checkpointing state:')
+            self.logger.exception(e)
+
+    def restore_state_checkpoint(self):
+        try:
+            sections = self.state_checkpointer.load(self.current_timestamp())
+        except Exception as e:
+            self.logger.error('Error loading state checkpoint, starting without it:')
+            self.logger.exception(e)
+            return False
+        if sections is None:
+            self.logger.info('No recent state checkpoint to restore')
+            return False
+
+        # re-announcing the workers rebuilds the best workers indexes (and UA analyses) from them
+        for service_type_dict in sections.get('current_service_workers', {}).values():
+            for worker in service_type_dict.get('workers', {}).values():
+                self.process_service_worker_announced({'worker': worker})
+        self.last_adaptation_executed_per_type = sections.get('last_adaptation_executed_per_type', {})
+        self.update_current_plan(sections.get('current_plan'))
+        self.last_service_workers_monitoring = sections.get('last_service_workers_monitoring')
+        self.mark_state_dirty(*STATE_CHECKPOINT_SECTIONS)
+        self.logger.info(f'Restored state checkpoint from {self.state_checkpointer.path}')
+        return True
+
     def update_current_plan(self, plan):
         self.current_plan = plan
+        self.load_shedding_index = LoadSheddingDataflowIndex.from_plan(plan)
+        # a new index starts from all the current verdicts, afterwards it only gets their changes
+        self.pop_overloaded_changes()
+        self.load_shedding_index.update_overloaded_workers(dict.fromkeys(self.get_current_overloaded_workers(), True))
+        self.mark_state_dirty('current_plan')
 
     def build_change_plan_request_data(self, event_type, change_cause):
         event_change_plan_data = {
@@ -108,7 +321,7 @@ class AdaptationAnalyser(BaseEventDrivenCMDService):
             'change': {
                 'type': event_type,
                 'cause': change_cause,
-                'timestamp': datetime.datetime.now().timestamp(),
+                'timestamp': self.current_timestamp(),
             }
         }
         return event_change_plan_data
@@ -120,34 +333,41 @@ class AdaptationAnalyser(BaseEventDrivenCMDService):
         )
         self.publish_event_type_to_stream(event_type=event_type, new_event_data=event_change_plan_data)
 
-    def update_best_worker_by_service_by_qos_policy(self, service_workers):
-        for qos_policy, policy_data in self.query_qos_policies.items():
-            for service_type, service_type_dict in service_workers.items():
-                for worker, worker_data in service_type_dict['workers'].items():
-
-                    worker_policy_attr = policy_data['worker_policy_attr']
-                    worker_policy_value = worker_data.get(worker_policy_attr)
-                    if worker_policy_value is None:
-                        continue
-
-                    worker_policy_value = float(worker_policy_value)
-
-                    qos_policy_best_workers = self.best_workers_by_service_by_qos_policy.setdefault(qos_policy, {})
-
-                    best_worker_for_service_type = qos_policy_best_workers.get(service_type, None)
-                    worker_policy_comparison = policy_data['worker_a_b_comparison']
-                    has_best_worker = best_worker_for_service_type is not None
-                    if has_best_worker:
-                        best_worker_policy_value = best_worker_for_service_type[worker_policy_attr]
-                        is_better_than = worker_policy_comparison(worker_policy_value, best_worker_policy_value)
-                        if not is_better_than:
-                            continue
-                    qos_policy_best_workers[service_type] = worker_data
-                    self.best_workers_by_service_by_qos_policy[qos_policy] = qos_policy_best_workers
+    def get_qos_policy_index(self, service_type):
+        qos_policy_index = self.qos_policy_index_per_type.get(service_type)
+        if qos_policy_index is None:
+            qos_policy_index = QoSPolicyIndex(self.query_qos_policies)
+            self.qos_policy_index_per_type[service_type] = qos_policy_index
+        return qos_policy_index
+
+    def update_best_worker_by_service_by_qos_policy(self, service_type, worker_data, worker_state=None):
+        qos_policy_index = self.get_qos_policy_index(service_type)
+        changed_best_workers = qos_policy_index.update_worker(worker_data.get('stream_key'), worker_data, worker_state)
+        return self.set_changed_best_workers(service_type, changed_best_workers)
+
+    def set_changed_best_workers(self, service_type, changed_best_workers):
+        for qos_policy, best_worker_for_service_type in changed_best_workers.items():
+            qos_policy_best_workers = self.best_workers_by_service_by_qos_policy.setdefault(qos_policy, {})
+            if best_worker_for_service_type is None:
+                qos_policy_best_workers.pop(service_type, None)
+            else:
+                qos_policy_best_workers[service_type] = best_worker_for_service_type
         return self.best_workers_by_service_by_qos_policy
 
+    def remove_service_worker(self, service_type, stream_key):
+        # a worker missing from the monitoring is gone, it is announced again when it comes back
+        workers_dict = self.current_service_workers.get(service_type, {}).get('workers', {})
+        if workers_dict.pop(stream_key, None) is not None:
+            self.mark_state_dirty('current_service_workers')
+        self.worker_states_per_type.get(service_type, {}).pop(stream_key, None)
+        qos_policy_index = self.qos_policy_index_per_type.get(service_type)
+        if qos_policy_index is not None:
+            self.set_changed_best_workers(service_type, qos_policy_index.remove_worker(stream_key))
+
     def update_ua_service_analysis(self, service_workers, service_type):
         if service_type not in self.ua_usage_analysis_per_type:
+            # numpy/skfuzzy are only loaded once the uncertainty analysis is actually used
+            from adaptation_analyser.uncertainty.ua_analysis import UAServiceAnalysis
             self.ua_usage_analysis_per_type[service_type] = UAServiceAnalysis(self, service_type)
         self.ua_usage_analysis_per_type[service_type].setup_from_workers(service_workers[service_type]['workers'])
 
@@ -158,9 +378,15 @@ class AdaptationAnalyser(BaseEventDrivenCMDService):
         service_type_dict = self.current_service_workers.setdefault(service_type, {})
         workers_dict = service_type_dict.setdefault('workers', {})
         workers_dict[stream_key] = worker
-        self.update_best_worker_by_service_by_qos_policy(self.current_service_workers)
+        self.mark_state_dirty('current_service_workers')
+        worker_state = self.update_announced_worker_state(service_type, stream_key, worker)
+        self.update_best_worker_by_service_by_qos_policy(service_type, worker, worker_state)
         if UA_USAGE_ANALYSIS:
             self.update_ua_service_analysis(self.current_service_workers, service_type)
+            # fuzzy overload verdicts depend on the service type usage model
+            aggregates = self.aggregates_per_type.get(service_type)
+            if aggregates is not None:
+                aggregates.overloaded_verdicts.clear()
 
     def process_service_worker_slr_profiles_ranked(self, event_data):
         event_type = PUB_EVENT_TYPE_SERVICE_WORKER_SLR_PROFILE_CHANGE_PLAN_REQUESTED
@@ -169,175 +395,581 @@ class AdaptationAnalyser(BaseEventDrivenCMDService):
         )
         self.publish_event_type_to_stream(event_type=event_type, new_event_data=event_change_plan_data)
 
+    def update_announced_worker_state(self, service_type, stream_key, worker):
+        worker_states = self.worker_states_per_type.setdefault(service_type, {})
+        worker_state = worker_states.get(stream_key)
+        if worker_state is None:
+            worker_state = WorkerState.from_dict(worker, stream_key=stream_key, service_type=service_type)
+            worker_states[stream_key] = worker_state
+        else:
+            worker_state.update_from_dict(worker)
+        return worker_state
+
+    def get_service_type_aggregates(self, service_type):
+        aggregates = self.aggregates_per_type.get(service_type)
+        if aggregates is None:
+            aggregates = ServiceTypeAggregates()
+            self.aggregates_per_type[service_type] = aggregates
+        return aggregates
+
+    def get_best_worker_keys(self, service_type):
+        qos_policy_index = self.qos_policy_index_per_type.get(service_type)
+        if qos_policy_index is None:
+            return ()
+        return qos_policy_index.best_worker_keys
+
+    def evaluate_monitored_workers(self, service_type, workers):
+        known_worker_states = self.worker_states_per_type.setdefault(service_type, {})
+        evaluation = self.get_service_type_aggregates(service_type).evaluate_workers(
+            known_worker_states, workers, service_type, self.adaptation_delta, self.get_best_worker_keys(service_type))
+        for stream_key in evaluation.removed_workers:
+            self.remove_service_worker(service_type, stream_key)
+        return evaluation
+
+    def get_monitored_evaluation(self, service_type, workers):
+        # during a monitoring event analysis its workers were already evaluated, once for all analyses
+        if self.monitored_evaluations_per_type is not None:
+            return self.monitored_evaluations_per_type[service_type]
+        return self.evaluate_monitored_workers(service_type, workers)
+
+    def get_monitored_worker_states(self, service_type, workers):
+        return self.get_monitored_evaluation(service_type, workers).worker_states
+
     def _is_service_worker_overloaded(self, service_worker):
-        queue_size = int(service_worker.get('queue_size', 0))
-        throughput = float(service_worker.get('throughput', 0.0))
-        max_capacity = math.floor(throughput * self.adaptation_delta)
+        queue_size = service_worker.queue_size
+        max_capacity = math.floor(service_worker.throughput * self.adaptation_delta)
         if max_capacity == 0:
             return True
         if queue_size == 0:
             return False
 
         if UA_USAGE_ANALYSIS:
-            service_type = service_worker['service_type']
-            ua_analysis = self.ua_usage_analysis_per_type[service_type]
-            usage_percentage = ua_analysis.calculate_worker_usage(queue_size, max_capacity) / 100
+            ua_analysis = self.ua_usage_analysis_per_type[service_worker.service_type]
+            with ANALYSIS_LATENCY.labels(analysis='fuzzy_inference').time():
+                usage_percentage = ua_analysis.calculate_worker_usage(queue_size, max_capacity) / 100
             self.logger.debug(f">>>>\n\n\n fuzzy percentage ({queue_size} / {max_capacity}): {usage_percentage} vs crisp {queue_size/max_capacity} \n")
         else:
             usage_percentage = queue_size / max_capacity
 
-        return usage_percentage >= self.is_overloaded_percentage
+        return usage_percentage >= self.get_overloaded_threshold(service_worker.service_type, service_worker.stream_key)
+
+    def get_overloaded_threshold(self, service_type, stream_key):
+        # hysteresis: an overloaded worker only stops being overloaded below the (lower) exit threshold
+        aggregates = self.aggregates_per_type.get(service_type)
+        if aggregates is not None and stream_key in aggregates.overloaded_verdicts.positive_workers:
+            return self.overloaded_exit_percentage
+        return self.is_overloaded_percentage
+
+    def _get_overloaded_thresholds(self, service_type, workers, needs_inference):
+        if self.overloaded_exit_percentage == self.is_overloaded_percentage:
+            return self.is_overloaded_percentage
+        import numpy as np
+
+        thresholds = np.fromiter(
+            (self.get_overloaded_threshold(service_type, stream_key) for stream_key in workers),
+            dtype=np.float64, count=len(workers))
+        return thresholds[needs_inference]
+
+    def _prepare_fuzzy_usage_inputs(self, workers):
+        # only reachable with UA_USAGE_ANALYSIS, keeps numpy out of the crisp service startup
+        import numpy as np
+
+        queue_sizes = np.fromiter((w.queue_size for w in workers.values()), dtype=np.float64, count=len(workers))
+        throughputs = np.fromiter((w.throughput for w in workers.values()), dtype=np.float64, count=len(workers))
+        max_capacities = np.floor(throughputs * self.adaptation_delta)
+
+        overloaded = max_capacities == 0
+        needs_inference = ~overloaded & (queue_sizes != 0)
+        return queue_sizes, max_capacities, overloaded, needs_inference
+
+    def _get_overloaded_worker_keys(self, workers, overloaded):
+        worker_keys = list(workers.keys())
+        return [worker_keys[i] for i in overloaded.nonzero()[0]]
+
+    def _get_service_workers_overloaded_by_fuzzy_usage(self, service_type, workers):
+        queue_sizes, max_capacities, overloaded, needs_inference = self._prepare_fuzzy_usage_inputs(workers)
+        if needs_inference.any():
+            ua_analysis = self.ua_usage_analysis_per_type[service_type]
+            with ANALYSIS_LATENCY.labels(analysis='fuzzy_inference').time():
+                usage_percentages = ua_analysis.calculate_workers_usage(
+                    queue_sizes[needs_inference], max_capacities[needs_inference]) / 100
+            overloaded[needs_inference] = usage_percentages >= self._get_overloaded_thresholds(
+                service_type, workers, needs_inference)
+
+        return self._get_overloaded_worker_keys(workers, overloaded)
+
+    def _get_service_workers_overloaded(self, service_type, workers):
+        if UA_USAGE_ANALYSIS:
+            return self._get_service_workers_overloaded_by_fuzzy_usage(service_type, workers)
+        return [worker for worker, worker_data in workers.items() if self._is_service_worker_overloaded(worker_data)]
+
+    def _get_service_workers_overloaded_in_process_pool(self, changed_workers_per_type):
+        overloaded_per_type = {}
+        fallback_service_types = set()
+        pending = {}
+        for service_type, workers in changed_workers_per_type.items():
+            if len(workers) < self.ua_executor_min_workers:
+                continue
+            queue_sizes, max_capacities, overloaded, needs_inference = self._prepare_fuzzy_usage_inputs(workers)
+            if not needs_inference.any():
+                overloaded_per_type[service_type] = self._get_overloaded_worker_keys(workers, overloaded)
+                continue
+            future = self.fuzzy_usage_executor.submit(
+                service_type, self.adaptation_delta, self.ua_usage_analysis_per_type[service_type].sw_max_throughput,
+                queue_sizes[needs_inference], max_capacities[needs_inference]
+            )
+            pending[future] = (service_type, queue_sizes, max_capacities, overloaded, needs_inference)
+
+        # the small batches are evaluated here while the pool works on the big ones
+        for service_type, workers in changed_workers_per_type.items():
+            if len(workers) < self.ua_executor_min_workers:
+                overloaded_per_type[service_type] = self._get_service_workers_overloaded(service_type, workers)
+
+        with ANALYSIS_LATENCY.labels(analysis='fuzzy_inference_process_pool').time():
+            usages = self.fuzzy_usage_executor.gather(pending.keys())
+        for future, (service_type, queue_sizes, max_capacities, overloaded, needs_inference) in pending.items():
+            usage = usages.get(future)
+            if usage is None:
+                # crisp ratio until the fuzzy verdict is available again
+                FUZZY_FALLBACKS.inc()
+                fallback_service_types.add(service_type)
+                usage_percentages = queue_sizes[needs_inference] / max_capacities[needs_inference]
+            else:
+                usage_percentages = usage / 100
+            workers = changed_workers_per_type[service_type]
+            overloaded[needs_inference] = usage_percentages >= self._get_overloaded_thresholds(
+                service_type, workers, needs_inference)
+            overloaded_per_type[service_type] = self._get_overloaded_worker_keys(workers, overloaded)
+        return overloaded_per_type, fallback_service_types
+
+    def _get_service_workers_overloaded_per_type(self, changed_workers_per_type):
+        if UA_USAGE_ANALYSIS and self.fuzzy_usage_executor is not None:
+            return self._get_service_workers_overloaded_in_process_pool(changed_workers_per_type)
+        overloaded_per_type = {
+            service_type: self._get_service_workers_overloaded(service_type, workers)
+            for service_type, workers in changed_workers_per_type.items()
+        }
+        return overloaded_per_type, set()
 
     def verify_service_workers_overloaded(self, event_data):
         overloaded_workers = []
-        service_workers = event_data.get('service_workers', {})
-        for service_type_dict in service_workers.values():
-            service_overloaded_workers = []
-            for worker, worker_data in service_type_dict['workers'].items():
-                if self._is_service_worker_overloaded(worker_data):
-                    service_overloaded_workers.append(worker)
-
-            overloaded_workers.extend(service_overloaded_workers)
+        for service_type_overloaded_workers in self.get_overloaded_workers_per_type(event_data).values():
+            overloaded_workers.extend(service_type_overloaded_workers)
         return overloaded_workers
 
+    def update_overloaded_verdicts(self, event_data):
+        changed_workers_per_type = {}
+        for service_type, service_type_dict in event_data.get('service_workers', {}).items():
+            evaluation = self.get_monitored_evaluation(service_type, service_type_dict['workers'])
+            verdict_cache = self.aggregates_per_type[service_type].overloaded_verdicts
+            changed_workers = evaluation.overload_changed_workers
+            # evaluated only once per event, even when several analyses need the verdicts
+            evaluation.overload_changed_workers = {}
+            verdict_cache.set_workers_inputs(changed_workers)
+            if changed_workers:
+                changed_workers_per_type[service_type] = changed_workers
+
+        overloaded_per_type, fallback_service_types = self._get_service_workers_overloaded_per_type(
+            changed_workers_per_type)
+
+        for service_type, changed_workers in changed_workers_per_type.items():
+            verdict_cache = self.aggregates_per_type[service_type].overloaded_verdicts
+            verdict_cache.set_verdicts(changed_workers.keys(), overloaded_per_type[service_type])
+            if service_type in fallback_service_types:
+                verdict_cache.forget_workers(changed_workers.keys())
+
+    def get_overloaded_workers_per_type(self, event_data):
+        self.update_overloaded_verdicts(event_data)
+        overloaded_workers_per_type = {}
+        for service_type, service_type_dict in event_data.get('service_workers', {}).items():
+            verdict_cache = self.aggregates_per_type[service_type].overloaded_verdicts
+            service_type_overloaded_workers = verdict_cache.get_positive_workers()
+            service_type_overloaded_workers.extend(self._get_service_workers_predicted_overloaded(
+                service_type, service_type_overloaded_workers))
+            if service_type_overloaded_workers:
+                overloaded_workers_per_type[service_type] = service_type_overloaded_workers
+        return overloaded_workers_per_type
+
+    def record_worker_history(self, event_data):
+        if self.worker_history_size <= 0:
+            return
+        timestamp = self.current_timestamp()
+        for service_type, service_type_dict in event_data.get('service_workers', {}).items():
+            worker_history = self.worker_history_per_type.get(service_type)
+            if worker_history is None:
+                worker_history = WorkerHistory(
+                    self.worker_history_size, min_samples=self.predictive_overload_min_samples,
+                    min_sample_interval=self.worker_history_min_sample_interval)
+                self.worker_history_per_type[service_type] = worker_history
+            workers = self.get_monitored_worker_states(service_type, service_type_dict['workers'])
+            worker_history.remove_missing_workers(workers)
+            worker_history.add_samples(workers, timestamp)
+
+    def get_predictive_overload_lead_time(self):
+        if self.overloaded_plan_execution_seconds is None:
+            return self.predictive_overload_default_lead
+        return self.overloaded_plan_execution_seconds
+
+    def _get_service_workers_predicted_overloaded(self, service_type, overloaded_workers):
+        worker_history = self.worker_history_per_type.get(service_type)
+        if worker_history is None:
+            return []
+        # the plan has to be requested before the queue trend crosses the threshold, by at least its execution time
+        lead_time = self.get_predictive_overload_lead_time()
+        # only a new different sample can predict a worker overload, the predicted ones are re-checked every sample
+        predicted_workers = worker_history.predicted_workers
+        for stream_key in worker_history.get_forecast_workers():
+            seconds_to_overload = worker_history.forecast_seconds_to_overload(
+                stream_key, self.adaptation_delta, self.is_overloaded_percentage)
+            # already crossed (0) is left to the current samples verdict
+            if seconds_to_overload is not None and 0 < seconds_to_overload <= lead_time:
+                predicted_workers[stream_key] = True
+            else:
+                predicted_workers.pop(stream_key, None)
+        if not predicted_workers:
+            return []
+        overloaded_workers = set(overloaded_workers)
+        predicted_overloaded_workers = [k for k in predicted_workers if k not in overloaded_workers]
+        if predicted_overloaded_workers:
+            PREDICTED_OVERLOADS.inc(len(predicted_overloaded_workers))
+            self.logger.debug(
+                f'Workers predicted to overload within {lead_time:.2f} seconds: {predicted_overloaded_workers}')
+        return predicted_overloaded_workers
+
     def analyse_service_worker_overloaded(self, event_data):
         event_type = 'ServiceWorkerOverloadedPlanRequested'
         event_change_plan_data = None
         if self.verify_dont_have_similar_recent_plan_in_execution(event_type):
-            self.overloaded_workers = self.verify_service_workers_overloaded(event_data)
+            self.overloaded_workers_per_type = self.get_overloaded_workers_per_type(event_data)
+            self.overloaded_workers = [w for workers in self.overloaded_workers_per_type.values() for w in workers]
 
-            if len(self.overloaded_workers) != 0:
+            if len(self.overloaded_workers) != 0 and self.allow_analysed_change_request(
+                    event_type, self.overloaded_workers_per_type):
                 event_change_plan_data = self.build_change_plan_request_data(
                     event_type=event_type, change_cause=event_data
                 )
         return event_change_plan_data
 
-    def _is_worker_idle(self, service_worker):
-        queue_size = int(service_worker['queue_size'])
-        return queue_size == 0
-
     def verify_service_worker_best_idle(self, service_workers):
+        return len(self.get_best_idle_workers_per_type(service_workers)) != 0
+
+    def get_best_idle_workers_per_type(self, service_workers):
+        best_idle_workers_per_type = {}
         for service_type, service_type_dict in service_workers.items():
-            idle_workers_keys = []
-            for worker, worker_data in service_type_dict['workers'].items():
-                if self._is_worker_idle(worker_data):
-                    idle_workers_keys.append(worker)
+            evaluation = self.get_monitored_evaluation(service_type, service_type_dict['workers'])
+            aggregates = self.aggregates_per_type[service_type]
 
             # if all workers of that type are idle than it doesn't matter
-            if len(idle_workers_keys) != service_type_dict['total_number_workers']:
-                for qos_policy in self.query_qos_policies.keys():
-                    best_worker = self.best_workers_by_service_by_qos_policy.get(qos_policy, {}).get(service_type)
-                    if best_worker and best_worker.get('stream_key') in idle_workers_keys:
-                        return True
-        return False
+            if evaluation.best_idle_workers and aggregates.idle_count != service_type_dict['total_number_workers']:
+                best_idle_workers_per_type[service_type] = evaluation.best_idle_workers
+        return best_idle_workers_per_type
 
     def analyse_service_worker_best_idle(self, event_data):
         event_type = 'ServiceWorkerBestIdlePlanRequested'
         event_change_plan_data = None
         if self.verify_dont_have_similar_recent_plan_in_execution(event_type):
             service_workers = event_data['service_workers']
-            has_idle_best_worker = self.verify_service_worker_best_idle(service_workers)
-            if has_idle_best_worker:
+            self.best_idle_workers_per_type = self.get_best_idle_workers_per_type(service_workers)
+            if self.best_idle_workers_per_type and self.allow_analysed_change_request(
+                    event_type, self.best_idle_workers_per_type):
                 event_change_plan_data = self.build_change_plan_request_data(
                     event_type=event_type, change_cause=event_data
                 )
         return event_change_plan_data
 
-    def verify_unnecessary_load_shedding_for_dataflow(self, overloaded_workers_keys, dataflow):
-        for worker_key_list in dataflow:
-            worker_key = worker_key_list[0]
-            if worker_key in overloaded_workers_keys:
-                return False
+    def get_current_overloaded_workers(self):
+        for aggregates in self.aggregates_per_type.values():
+            yield from aggregates.overloaded_verdicts.positive_workers
 
-        return True
-
-    def filter_dataflow_choices_with_load_shedding(self, dataflow_choices):
-        filtered = []
-        if len(dataflow_choices) > 0 and len(dataflow_choices[0]) == 3:
-            for choice in dataflow_choices:
-                load_shedding = float(choice[0])
-                if load_shedding > 0:
-                    filtered.append[choice]
-
-        return filtered
+    def pop_overloaded_changes(self):
+        overloaded_changes = {}
+        for aggregates in self.aggregates_per_type.values():
+            overloaded_changes.update(aggregates.overloaded_verdicts.pop_positive_changes())
+        return overloaded_changes
 
     def verify_unnecessary_load_shedding(self, event_data):
-        if self.current_plan is not None:
-            execution_plan_strategy = self.current_plan.get('execution_plan', {}).get('strategy', {})
-            strategy_name = execution_plan_strategy.get('name', '')
-            is_load_shedding_strategy = 'load_shedding' in strategy_name
-            if is_load_shedding_strategy:
-                # if there are no overloaded_workers, than no load shedding should exist
-                if len(self.overloaded_workers) == 0:
-                    return True
-
-                dataflow_choices = execution_plan_strategy.get('dataflows', [])
-                dataflow_choices_with_load_shedding = self.filter_dataflow_choices_with_load_shedding(dataflow_choices)
-                overloaded_workers_keys = set([
-                    w['stream_key'] for w in self.overloaded_workers])
-
-                for choice in dataflow_choices_with_load_shedding:
-                    dataflow = choice[2]
-                    has_unnecessary_load_shedding = self.verify_unnecessary_load_shedding_for_dataflow(
-                        overloaded_workers_keys, dataflow)
-                    if has_unnecessary_load_shedding:
-                        return True
-        return False
+        if not self.load_shedding_index.is_load_shedding_strategy:
+            return False
+        # the overloaded analysis may have been skipped for this event (e.g. a recent overloaded plan)
+        self.update_overloaded_verdicts(event_data)
+        # only the dataflows of the workers whose overload verdict changed are updated
+        self.load_shedding_index.update_overloaded_workers(self.pop_overloaded_changes())
+        return self.load_shedding_index.has_unnecessary_load_shedding()
+
+    def get_unnecessary_load_shedding_workers_per_type(self):
+        service_type_per_worker = {
+            stream_key: service_type
+            for service_type, worker_states in self.worker_states_per_type.items() for stream_key in worker_states
+        }
+        workers_per_type = {}
+        for dataflow_workers in self.load_shedding_index.get_unnecessary_dataflows():
+            for stream_key in dataflow_workers:
+                service_type = service_type_per_worker.get(stream_key)
+                if service_type is not None:
+                    workers_per_type.setdefault(service_type, {})[stream_key] = None
+        return {service_type: list(workers) for service_type, workers in workers_per_type.items()}
 
     def analyse_unnecessary_load_shedding(self, event_data):
         event_type = 'UnnecessaryLoadSheddingPlanRequested'
         event_change_plan_data = None
+        self.unnecessary_load_shedding_workers_per_type = {}
         if self.verify_dont_have_similar_recent_plan_in_execution(event_type):
-            has_unnecessary_load_shedding = self.verify_unnecessary_load_shedding(event_data)
-            if has_unnecessary_load_shedding:
-                event_change_plan_data = self.build_change_plan_request_data(
-                    event_type=event_type, change_cause=event_data
-                )
+            if self.verify_unnecessary_load_shedding(event_data):
+                # the workers of the dataflows shedding load without any overloaded worker
+                self.unnecessary_load_shedding_workers_per_type = self.get_unnecessary_load_shedding_workers_per_type()
+                if self.allow_analysed_change_request(event_type, self.unnecessary_load_shedding_workers_per_type):
+                    event_change_plan_data = self.build_change_plan_request_data(
+                        event_type=event_type, change_cause=event_data
+                    )
         return event_change_plan_data
 
-    def process_service_workers_stream_monitored(self, event_data):
+    def analyse_service_workers_stream_monitored(self, event_data):
         service_worker_size_analysis = [
             self.analyse_service_worker_overloaded,
             self.analyse_service_worker_best_idle,
-            # self.analyse_unnecessary_load_shedding,
         ]
+        if self.unnecessary_load_shedding_analysis:
+            service_worker_size_analysis.append(self.analyse_unnecessary_load_shedding)
 
+        self.monitored_evaluations_per_type = {
+            service_type: self.evaluate_monitored_workers(service_type, service_type_dict['workers'])
+            for service_type, service_type_dict in event_data.get('service_workers', {}).items()
+        }
+        try:
+            self.record_worker_history(event_data)
+            if self.change_request_coalescer is not None:
+                return self.analyse_service_workers_coalesced(event_data, service_worker_size_analysis)
+            for analysis in service_worker_size_analysis:
+                with ANALYSIS_LATENCY.labels(analysis=analysis.__name__).time():
+                    result = analysis(event_data=event_data)
+                if result is not None:
+                    ANALYSIS_TRIGGERS.labels(analysis=analysis.__name__).inc()
+                    return result
+            return None
+        finally:
+            self.monitored_evaluations_per_type = None
+
+    def get_change_request_affected_workers(self, change_type):
+        affected_workers_per_change_type = {
+            'ServiceWorkerOverloadedPlanRequested': self.overloaded_workers_per_type,
+            'ServiceWorkerBestIdlePlanRequested': self.best_idle_workers_per_type,
+            'UnnecessaryLoadSheddingPlanRequested': self.unnecessary_load_shedding_workers_per_type,
+        }
+        return affected_workers_per_change_type.get(change_type, {})
+
+    def analyse_service_workers_coalesced(self, event_data, service_worker_size_analysis):
+        timestamp = self.current_timestamp()
         for analysis in service_worker_size_analysis:
-            result = analysis(event_data=event_data)
+            with ANALYSIS_LATENCY.labels(analysis=analysis.__name__).time():
+                result = analysis(event_data=event_data)
             if result is not None:
-                event_type = result['change']['type']
-                self.publish_event_type_to_stream(event_type=event_type, new_event_data=result)
-                break
+                ANALYSIS_TRIGGERS.labels(analysis=analysis.__name__).inc()
+                change_type = result['change']['type']
+                self.change_request_coalescer.add(
+                    change_type, self.get_change_request_affected_workers(change_type), timestamp)
+
+        if not self.change_request_coalescer.is_due(timestamp):
+            return None
+        change_type, causes = self.change_request_coalescer.pop_causes()
+        service_types = {service_type: None for cause in causes for service_type in cause['workers']}
+        if not self.allow_change_request(change_type, service_types):
+            return None
+        event_change_plan_data = self.build_change_plan_request_data(event_type=change_type, change_cause=event_data)
+        event_change_plan_data['change']['causes'] = causes
+        return event_change_plan_data
+
+    def process_service_workers_stream_monitored(self, event_data):
+        result = self.analyse_service_workers_stream_monitored(event_data)
+        if result is not None:
+            event_type = result['change']['type']
+            self.publish_event_type_to_stream(event_type=event_type, new_event_data=result)
         self.last_service_workers_monitoring = event_data
+        self.mark_state_dirty('last_service_workers_monitoring')
+
+    def update_overloaded_plan_execution_time(self, change_request):
+        requested_at = change_request.get('timestamp')
+        if change_request.get('type') != 'ServiceWorkerOverloadedPlanRequested' or requested_at is None:
+            return
+        seconds = self.current_timestamp() - requested_at
+        if seconds < 0:
+            return
+        if self.overloaded_plan_execution_seconds is None:
+            self.overloaded_plan_execution_seconds = seconds
+            return
+        smoothing = self.plan_execution_time_smoothing
+        self.overloaded_plan_execution_seconds = (
+            smoothing * seconds + (1 - smoothing) * self.overloaded_plan_execution_seconds)
 
     def process_scheduling_plan_executed(self, event_data):
-        last_executed_type = event_data.get('plan', {}).get('change_request', {}).get('type')
+        change_request = event_data.get('plan', {}).get('change_request', {})
+        last_executed_type = change_request.get('type')
         self.last_adaptation_executed_per_type[last_executed_type] = event_data
+        self.mark_state_dirty('last_adaptation_executed_per_type')
+        self.update_overloaded_plan_execution_time(change_request)
+        plan = event_data.get('plan')
+        if plan is not None:
+            self.update_current_plan(plan)
 
     def process_event_type(self, event_type, event_data, json_msg):
         if not super(AdaptationAnalyser, self).process_event_type(event_type, event_data, json_msg):
             return False
 
+        if not self.has_processed_first_event:
+            self.has_processed_first_event = True
+            self.record_startup_phase('first_event')
+
+        handler = None
         if event_type == LISTEN_EVENT_TYPE_QUERY_CREATED:
-            self.process_query_created(event_data)
+            handler = self.process_query_created
         elif event_type == LISTEN_EVENT_TYPE_SERVICE_WORKER_ANNOUNCED:
-            self.process_service_worker_announced(event_data)
+            handler = self.process_service_worker_announced
         elif event_type == LISTEN_EVENT_TYPE_SERVICE_SLR_PROFILES_RANKED:
-            self.process_service_worker_slr_profiles_ranked(event_data)
+            handler = self.process_service_worker_slr_profiles_ranked
         elif event_type == LISTEN_EVENT_TYPE_SERVICE_WORKERS_STREAM_MONITORED:
-            self.process_service_workers_stream_monitored(event_data)
+            handler = self.process_service_workers_stream_monitored
         elif event_type == LISTEN_EVENT_TYPE_SCHEDULING_PLAN_EXECUTED:
-            self.process_scheduling_plan_executed(event_data)
+            handler = self.process_scheduling_plan_executed
+
+        if handler is not None:
+            with HANDLER_LATENCY.labels(handler=handler.__name__).time():
+                handler(event_data)
+
+    def _stream_event_id_sort_key(self, event_id):
+        if isinstance(event_id, bytes):
+            event_id = event_id.decode('utf-8')
+        return tuple(int(part) for part in event_id.split('-'))
+
+    def sort_stream_events_by_id(self, stream_events):
+        # streams are read one after the other, redis entry ids ('<ms>-<seq>') give back the global order
+        try:
+            return sorted(stream_events, key=lambda e: self._stream_event_id_sort_key(e[0]))
+        except (ValueError, AttributeError):
+            return stream_events
+
+    def coalesce_service_workers_stream_monitored_events(self, events):
+        monitored_indexes = [
+            i for i, (event_type, event_data, json_msg) in enumerate(events)
+            if event_type == LISTEN_EVENT_TYPE_SERVICE_WORKERS_STREAM_MONITORED
+        ]
+        if len(monitored_indexes) < 2:
+            return events
+
+        # each event has the full snapshot of its service types, so only the latest one of each is kept
+        coalesced_service_workers = {}
+        for i in monitored_indexes:
+            coalesced_service_workers.update(events[i][1].get('service_workers', {}))
+
+        last_index = monitored_indexes[-1]
+        event_type, last_event_data, json_msg = events[last_index]
+        coalesced_event_data = dict(last_event_data, service_workers=coalesced_service_workers)
+        self.logger.debug(f'Coalesced {len(monitored_indexes)} "{event_type}" events into one')
+
+        skip_indexes = set(monitored_indexes[:-1])
+        coalesced_events = []
+        for i, event in enumerate(events):
+            if i in skip_indexes:
+                continue
+            if i == last_index:
+                event = (event_type, coalesced_event_data, json_msg)
+            coalesced_events.append(event)
+        return coalesced_events
+
+    def read_cmd_batch_events(self, cg_sub_group='default'):
+        cmd_stream = self.service_cmd_cg_stream_map[cg_sub_group]
+        stream_events = []
+        stream_event_list = cmd_stream.read_stream_events_list(count=self.cmd_batch_size)
+        for stream_key, event_tuple_list in stream_event_list:
+            event_type = stream_key.decode('utf-8')
+            for event_id, json_msg in event_tuple_list:
+                stream_events.append((event_id, event_type, json_msg))
+
+        events = []
+        for event_id, event_type, json_msg in self.sort_stream_events_by_id(stream_events):
+            try:
+                events.append((event_type, self.default_event_deserializer(json_msg), json_msg))
+            except Exception as e:
+                self.logger.error(f'Error processing {json_msg}:')
+                self.logger.exception(e)
+        return events
+
+    def process_cmd_batch_events(self, cg_sub_group, events):
+        for event_type, event_data, json_msg in self.coalesce_service_workers_stream_monitored_events(events):
+            try:
+                self.process_event_type_wrapper(cg_sub_group, event_type, event_data, json_msg)
+            except Exception as e:
+                self.logger.error(f'Error processing {json_msg}:')
+                self.logger.exception(e)
+        if events:
+            self.log_state()
+        self.flush_publish_buffer_if_due()
+        self.checkpoint_state_if_due()
+
+    def process_cmd_batch(self, cg_sub_group=None):
+        if cg_sub_group is None:
+            cg_sub_group = 'default'
+
+        event_types = self.service_cmd_cg_keys_map[cg_sub_group]
+        self.logger.debug(f'Processing CMD-[{cg_sub_group}] batch from event types: {event_types}')
+        self.process_cmd_batch_events(cg_sub_group, self.read_cmd_batch_events(cg_sub_group))
+
+    def process_cmd(self, cg_sub_group=None):
+        super(AdaptationAnalyser, self).process_cmd(cg_sub_group=cg_sub_group)
+        self.flush_publish_buffer_if_due()
+        self.checkpoint_state_if_due()
 
     def log_state(self):
         super(AdaptationAnalyser, self).log_state()
         self._log_dict('Latest Executed Plans', self.last_adaptation_executed_per_type)
         self._log_dict('Best Workers by service by QOS policy', self.best_workers_by_service_by_qos_policy)
+        self._log_dict('Aggregates per service type', self.aggregates_per_type)
         if UA_USAGE_ANALYSIS:
             self._log_dict('UA analysis per service type', self.ua_usage_analysis_per_type)
+        self.log_metrics()
+        self.dump_metrics_if_due()
+
+    def log_metrics(self):
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            return
+        self._log_dict('Handler latencies', summarize_histogram(HANDLER_LATENCY))
+        self._log_dict('Analysis latencies', summarize_histogram(ANALYSIS_LATENCY))
+        self._log_dict('Analysis triggers', summarize_counter(ANALYSIS_TRIGGERS))
+        self._log_dict('Startup seconds', summarize_gauge(STARTUP_LATENCY))
+
+    def dump_metrics_if_due(self):
+        if not self.metrics_dump_file:
+            return
+        now = time.monotonic()
+        if self.last_metrics_dump_time is not None and now - self.last_metrics_dump_time < self.metrics_dump_interval:
+            return
+        self.last_metrics_dump_time = now
+        try:
+            dump_metrics_to_file(self.metrics_dump_file)
+        except Exception as e:
+            self.logger.error('Error dumping metrics to file:')
+            self.logger.exception(e)
+
+    def record_startup_phase(self, phase):
+        seconds = time.monotonic() - self.process_start_time
+        STARTUP_LATENCY.labels(phase=phase).set(seconds)
+        self.logger.info(f'Startup phase "{phase}" reached after {seconds:.3f} seconds')
+        return seconds
 
     def run(self):
         super(AdaptationAnalyser, self).run()
-        self.cmd_thread = threading.Thread(target=self.run_forever, args=(self.process_cmd,))
+        self.record_startup_phase('ready')
+        if self.state_checkpointer is not None:
+            self.state_checkpointer.start_writer_thread()
+        if self.async_runner:
+            from adaptation_analyser.async_runner import AsyncAnalyserRunner
+            # the runner publishes the events itself, the publish buffer is replaced and needs no flush thread
+            AsyncAnalyserRunner(self).run()
+            return
+        process_cmd = self.process_cmd
+        if self.cmd_batch_size > 1:
+            process_cmd = self.process_cmd_batch
+        if self.publish_buffer is not None:
+            self.publish_flush_thread = threading.Thread(target=self.run_publish_buffer_flush_forever, daemon=True)
+            self.publish_flush_thread.start()
+        self.cmd_thread = threading.Thread(target=self.run_forever, args=(process_cmd,))
         self.cmd_thread.start()
         self.cmd_thread.join()
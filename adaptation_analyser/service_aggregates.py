@@ -0,0 +1,116 @@
+import math
+
+from adaptation_analyser.worker_state import WorkerState
+from adaptation_analyser.worker_verdict_cache import WorkerVerdictCache
+
+_MISSING = object()
+
+
+class ServiceTypeEvaluation(object):
+    """Per monitoring event results of a service type workers pass, read by all the analyses."""
+    __slots__ = ('service_type', 'worker_states', 'overload_changed_workers', 'best_idle_workers', 'removed_workers')
+
+    def __init__(self, service_type, worker_states, overload_changed_workers, best_idle_workers, removed_workers=()):
+        self.service_type = service_type
+        self.worker_states = worker_states
+        # workers whose overload verdict inputs changed since they were last evaluated
+        self.overload_changed_workers = overload_changed_workers
+        self.best_idle_workers = best_idle_workers
+        # previously monitored workers missing from this event
+        self.removed_workers = removed_workers
+
+    def __repr__(self):
+        return (
+            f'{self.__class__.__name__}(service_type={self.service_type}, workers={len(self.worker_states)}, '
+            f'overload_changed={len(self.overload_changed_workers)}, best_idle={self.best_idle_workers})'
+        )
+
+
+class ServiceTypeAggregates(object):
+    """Idle/overloaded workers and capacity of a service type, updated from each monitoring event workers."""
+
+    def __init__(self):
+        self.workers_capacity = {}
+        self.total_capacity = 0
+        self.idle_workers = set()
+        # fuzzy overload verdicts are expensive, they are only re-evaluated for workers whose stats changed
+        self.overloaded_verdicts = WorkerVerdictCache(input_fields=('queue_size', 'throughput'))
+
+    def __len__(self):
+        return len(self.workers_capacity)
+
+    def remove_missing_workers(self, worker_states):
+        if len(self.workers_capacity) == len(worker_states) and all(k in self.workers_capacity for k in worker_states):
+            return []
+        removed_workers = [stream_key for stream_key in self.workers_capacity if stream_key not in worker_states]
+        for stream_key in removed_workers:
+            self.total_capacity -= self.workers_capacity.pop(stream_key)
+            self.idle_workers.discard(stream_key)
+        return removed_workers
+
+    def evaluate_workers(self, known_worker_states, workers, service_type, adaptation_delta, best_worker_keys=()):
+        # single pass over the monitored workers: parses their states, updates the capacity and idle workers,
+        # and finds the idle best workers and the workers whose overload verdict must be re-evaluated
+        verdicts_inputs = self.overloaded_verdicts.workers_inputs
+        workers_capacity = self.workers_capacity
+        idle_workers = self.idle_workers
+
+        worker_states = {}
+        overload_changed_workers = {}
+        best_idle_workers = []
+        known_verdict_workers = 0
+        for stream_key, worker_data in workers.items():
+            worker_state = known_worker_states.get(stream_key)
+            if worker_state is None:
+                worker_state = WorkerState.from_dict(worker_data, stream_key=stream_key, service_type=service_type)
+                known_worker_states[stream_key] = worker_state
+            # same as WorkerState.update_monitored_fields, without a call per worker
+            worker_state.queue_size = int(worker_data.get('queue_size', 0))
+            worker_state.throughput = float(worker_data.get('throughput', 0.0))
+            worker_states[stream_key] = worker_state
+            queue_size = worker_state.queue_size
+            throughput = worker_state.throughput
+
+            capacity = math.floor(throughput * adaptation_delta)
+            previous_capacity = workers_capacity.get(stream_key)
+            if capacity != previous_capacity:
+                workers_capacity[stream_key] = capacity
+                self.total_capacity += capacity - (previous_capacity or 0)
+            if queue_size == 0:
+                idle_workers.add(stream_key)
+                if stream_key in best_worker_keys:
+                    best_idle_workers.append(stream_key)
+            else:
+                idle_workers.discard(stream_key)
+
+            # the overloaded verdicts inputs are (queue_size, throughput)
+            verdict_inputs = verdicts_inputs.get(stream_key, _MISSING)
+            if verdict_inputs is not _MISSING:
+                known_verdict_workers += 1
+            if verdict_inputs != (queue_size, throughput):
+                overload_changed_workers[stream_key] = worker_state
+
+        # every monitored worker is known by now, so there are missing workers only if there are more known ones
+        removed_workers = ()
+        if len(workers_capacity) > len(worker_states):
+            removed_workers = self.remove_missing_workers(worker_states)
+        if len(verdicts_inputs) > known_verdict_workers:
+            self.overloaded_verdicts.remove_missing_workers(worker_states)
+        return ServiceTypeEvaluation(
+            service_type, worker_states, overload_changed_workers, best_idle_workers, removed_workers)
+
+    @property
+    def idle_count(self):
+        return len(self.idle_workers)
+
+    def is_idle(self, stream_key):
+        return stream_key in self.idle_workers
+
+    def get_overloaded_workers(self):
+        return self.overloaded_verdicts.get_positive_workers()
+
+    def __repr__(self):
+        return (
+            f'{self.__class__.__name__}(workers={len(self)}, idle={self.idle_count}, '
+            f'overloaded={len(self.overloaded_verdicts.positive_workers)}, total_capacity={self.total_capacity})'
+        )
@@ -0,0 +1,259 @@
+import atexit
+import bisect
+import hashlib
+import itertools
+import multiprocessing
+import time
+
+from opentracing import Tracer
+
+from adaptation_analyser.in_memory_streams import InMemoryStreamFactory
+from adaptation_analyser.service import CHANGE_TYPES_PRIORITY, AdaptationAnalyser
+
+from adaptation_analyser.conf import (
+    PUB_EVENT_LIST,
+    SERVICE_STREAM_KEY,
+    SERVICE_CMD_KEY_LIST,
+)
+
+
+SHARD_ANNOUNCE = 'announce'
+SHARD_PLAN_EXECUTED = 'plan_executed'
+SHARD_MONITORED = 'monitored'
+
+# the most urgent change type triggered in any shard is the type of the merged request
+SHARD_CHANGE_TYPES_PRIORITY = CHANGE_TYPES_PRIORITY
+
+# analysis settings of the router kwargs that every shard is built with, the FIS settings come from the same env
+SHARD_SERVICE_KWARGS = (
+    'ua_executor_workers',
+    'ua_executor_timeout',
+    'ua_executor_min_workers',
+    'worker_history_size',
+    'worker_history_min_sample_interval',
+    'predictive_overload_min_samples',
+    'predictive_overload_default_lead',
+    'change_request_min_interval',
+    'overloaded_enter_percentage',
+    'overloaded_exit_percentage',
+    'change_request_bucket_size',
+    'change_request_bucket_refill_rate',
+    'coalesce_change_requests',
+    'coalesce_window',
+    'qos_policies',
+)
+
+
+class ConsistentHashRing(object):
+    def __init__(self, nodes, replicas=64):
+        self.replicas = replicas
+        self.hashes = []
+        self.nodes = []
+        for node in nodes:
+            self.add_node(node)
+
+    def _hash(self, key):
+        return int(hashlib.md5(str(key).encode('utf-8')).hexdigest()[:16], 16)
+
+    def add_node(self, node):
+        for i in range(self.replicas):
+            node_hash = self._hash(f'{node}-{i}')
+            position = bisect.bisect(self.hashes, node_hash)
+            self.hashes.insert(position, node_hash)
+            self.nodes.insert(position, node)
+
+    def remove_node(self, node):
+        kept = [(h, n) for h, n in zip(self.hashes, self.nodes) if n != node]
+        self.hashes = [h for h, _ in kept]
+        self.nodes = [n for _, n in kept]
+
+    def get_node(self, key):
+        position = bisect.bisect(self.hashes, self._hash(key)) % len(self.hashes)
+        return self.nodes[position]
+
+
+def build_shard_analyser(logging_level, **service_kwargs):
+    # the shard only analyses, its streams are in-memory and never read by anyone
+    service = AdaptationAnalyser(
+        service_stream_key=SERVICE_STREAM_KEY,
+        service_cmd_key_list=SERVICE_CMD_KEY_LIST,
+        pub_event_list=PUB_EVENT_LIST,
+        service_details=None,
+        stream_factory=InMemoryStreamFactory(),
+        logging_level=logging_level,
+        tracer_configs={'reporting_host': None, 'reporting_port': None},
+        # a shard only knows the overloaded workers of its own service types
+        unnecessary_load_shedding_analysis=False,
+        **service_kwargs
+    )
+    if service.tracer:
+        service.tracer.close()
+    service.tracer = Tracer()
+    return service
+
+
+def get_shard_change(service, change_request):
+    # what the router needs to merge the shards requests, the cause is the whole event again in the merged one
+    change = change_request['change']
+    causes = change.get('causes')
+    if causes is None:
+        causes = [{'type': change['type'], 'workers': service.get_change_request_affected_workers(change['type'])}]
+    return {'type': change['type'], 'causes': causes}
+
+
+def merge_shard_changes(changes):
+    # shards have disjoint service types, so the workers of a cause type are merged by service type
+    workers_per_change_type = {}
+    for change in changes:
+        for cause in change['causes']:
+            workers_per_change_type.setdefault(cause['type'], {}).update(cause['workers'])
+    change_types = [ct for ct in SHARD_CHANGE_TYPES_PRIORITY if ct in workers_per_change_type]
+    change_types.extend(ct for ct in workers_per_change_type if ct not in change_types)
+    causes = [
+        {'type': change_type, 'workers': workers_per_change_type[change_type]} for change_type in change_types
+    ]
+    return change_types[0], causes
+
+
+def run_shard(connection, logging_level, service_kwargs):
+    service = build_shard_analyser(logging_level, **service_kwargs)
+    handlers = {
+        SHARD_ANNOUNCE: service.process_service_worker_announced,
+        SHARD_PLAN_EXECUTED: service.process_scheduling_plan_executed,
+    }
+    while True:
+        message = connection.recv()
+        if message is None:
+            break
+        request_id, command, event_data = message
+        if command == SHARD_MONITORED:
+            change = None
+            try:
+                result = service.analyse_service_workers_stream_monitored(event_data)
+                if result is not None:
+                    change = get_shard_change(service, result)
+            except Exception as e:
+                service.logger.error(f'Error analysing {event_data}:')
+                service.logger.exception(e)
+            # the router is waiting for this reply, even if the analysis failed
+            connection.send((request_id, change))
+            continue
+        try:
+            handlers[command](event_data)
+        except Exception as e:
+            service.logger.error(f'Error processing "{command}" {event_data}:')
+            service.logger.exception(e)
+    connection.close()
+
+
+class ShardedAdaptationAnalyser(AdaptationAnalyser):
+    def __init__(self, number_of_shards, shard_timeout=1.0, **kwargs):
+        self.number_of_shards = number_of_shards
+        self.shard_timeout = shard_timeout
+        self.shard_ring = ConsistentHashRing(range(number_of_shards))
+        self.shard_request_ids = itertools.count()
+        self.shard_connections = []
+        self.shard_processes = []
+        # shards are started first, restoring a state checkpoint already routes the workers to them
+        shard_service_kwargs = {key: kwargs[key] for key in SHARD_SERVICE_KWARGS if key in kwargs}
+        self.start_shards(kwargs['logging_level'], shard_service_kwargs)
+        # the fuzzy usage is only calculated in the shards
+        super(ShardedAdaptationAnalyser, self).__init__(**dict(kwargs, ua_executor_workers=0))
+
+    def start_shards(self, logging_level, service_kwargs=None):
+        # spawn: the router may already have tracer/metrics threads running, which don't survive a fork
+        context = multiprocessing.get_context('spawn')
+        for shard_id in range(self.number_of_shards):
+            router_connection, shard_connection = context.Pipe()
+            # not a daemon, so the shard can start its own fuzzy usage process pool
+            process = context.Process(
+                target=run_shard, args=(shard_connection, logging_level, service_kwargs or {}),
+                name=f'{self.__class__.__name__}-shard-{shard_id}', daemon=False
+            )
+            process.start()
+            shard_connection.close()
+            self.shard_connections.append(router_connection)
+            self.shard_processes.append(process)
+        # stopped before multiprocessing joins the non daemon processes at exit
+        atexit.register(self.stop_shards)
+
+    def stop_shards(self):
+        for connection in self.shard_connections:
+            try:
+                connection.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self.shard_processes:
+            process.join(timeout=self.shard_timeout)
+            if process.is_alive():
+                process.terminate()
+        for connection in self.shard_connections:
+            connection.close()
+        self.shard_connections = []
+        self.shard_processes = []
+
+    def get_service_type_shard(self, service_type):
+        return self.shard_ring.get_node(service_type)
+
+    def send_to_shard(self, shard_id, command, event_data, request_id=None):
+        self.shard_connections[shard_id].send((request_id, command, event_data))
+
+    def process_service_worker_announced(self, event_data):
+        worker = event_data.get('worker')
+        service_type = worker.get('service_type')
+        # the router only keeps the workers for the state checkpoint/logs, the analysis state lives in the shard
+        service_type_dict = self.current_service_workers.setdefault(service_type, {})
+        service_type_dict.setdefault('workers', {})[worker.get('stream_key')] = worker
+        self.mark_state_dirty('current_service_workers')
+        self.send_to_shard(self.get_service_type_shard(service_type), SHARD_ANNOUNCE, event_data)
+
+    def process_scheduling_plan_executed(self, event_data):
+        super(ShardedAdaptationAnalyser, self).process_scheduling_plan_executed(event_data)
+        for shard_id in range(self.number_of_shards):
+            self.send_to_shard(shard_id, SHARD_PLAN_EXECUTED, event_data)
+
+    def slice_service_workers_by_shard(self, event_data):
+        service_workers_by_shard = {}
+        for service_type, service_type_dict in event_data.get('service_workers', {}).items():
+            shard_service_workers = service_workers_by_shard.setdefault(self.get_service_type_shard(service_type), {})
+            shard_service_workers[service_type] = service_type_dict
+        return {
+            shard_id: dict(event_data, service_workers=service_workers)
+            for shard_id, service_workers in service_workers_by_shard.items()
+        }
+
+    def collect_shard_changes(self, request_id, shard_ids):
+        changes = []
+        deadline = time.monotonic() + self.shard_timeout
+        for shard_id in shard_ids:
+            connection = self.shard_connections[shard_id]
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not connection.poll(remaining):
+                    self.logger.error(f'Shard {shard_id} timed out analysing monitoring event (request {request_id})')
+                    break
+                reply_request_id, change = connection.recv()
+                # older replies belong to requests that already timed out
+                if reply_request_id == request_id:
+                    if change is not None:
+                        changes.append(change)
+                    break
+        return changes
+
+    def analyse_service_workers_stream_monitored(self, event_data):
+        request_id = next(self.shard_request_ids)
+        event_data_by_shard = self.slice_service_workers_by_shard(event_data)
+        for shard_id, shard_event_data in event_data_by_shard.items():
+            self.send_to_shard(shard_id, SHARD_MONITORED, shard_event_data, request_id=request_id)
+
+        changes = self.collect_shard_changes(request_id, event_data_by_shard.keys())
+        if not changes:
+            return None
+        change_type, causes = merge_shard_changes(changes)
+        event_change_plan_data = self.build_change_plan_request_data(event_type=change_type, change_cause=event_data)
+        event_change_plan_data['change']['causes'] = causes
+        return event_change_plan_data
+
+    def log_state(self):
+        super(ShardedAdaptationAnalyser, self).log_state()
+        self.logger.debug(f'Shards alive: {sum(p.is_alive() for p in self.shard_processes)}/{self.number_of_shards}')
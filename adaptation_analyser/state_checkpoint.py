@@ -0,0 +1,97 @@
+import gzip
+import json
+import os
+import threading
+import time
+
+
+class StateCheckpointer(object):
+    def __init__(self, path, interval, max_age, logger, clock=time.monotonic):
+        self.path = path
+        self.logger = logger
+        self.interval = interval
+        self.max_age = max_age
+        self.clock = clock
+        # each section is serialized only when it changed, the file is the join of the latest serializations
+        self.serialized_sections = {}
+        self.dirty_sections = set()
+        self.last_checkpoint_time = None
+        self.pending_payload = None
+        self.condition = threading.Condition()
+        self.writer_thread = None
+        self.writes = 0
+
+    def mark_dirty(self, *sections):
+        self.dirty_sections.update(sections)
+
+    def is_checkpoint_due(self):
+        if not self.dirty_sections:
+            return False
+        if self.last_checkpoint_time is None:
+            return True
+        return self.clock() - self.last_checkpoint_time >= self.interval
+
+    def checkpoint_if_due(self, get_section, timestamp):
+        if not self.is_checkpoint_due():
+            return False
+        self.checkpoint(get_section, timestamp)
+        return True
+
+    def checkpoint(self, get_section, timestamp):
+        dirty_sections = self.dirty_sections
+        self.dirty_sections = set()
+        for section in dirty_sections:
+            self.serialized_sections[section] = json.dumps(get_section(section))
+        self.last_checkpoint_time = self.clock()
+
+        sections = ', '.join(f'"{section}": {data}' for section, data in self.serialized_sections.items())
+        payload = f'{{"saved_at": {json.dumps(timestamp)}, "sections": {{{sections}}}}}'
+        self.submit(payload)
+
+    def submit(self, payload):
+        if self.writer_thread is None:
+            self.write(payload)
+            return
+        with self.condition:
+            # only the latest state matters, an unwritten older payload is replaced
+            self.pending_payload = payload
+            self.condition.notify()
+
+    def write(self, payload):
+        tmp_path = f'{self.path}.tmp'
+        with gzip.open(tmp_path, 'wt', encoding='utf-8') as checkpoint_file:
+            checkpoint_file.write(payload)
+        os.replace(tmp_path, self.path)
+        self.writes += 1
+
+    def run_writer_forever(self):
+        while True:
+            with self.condition:
+                while self.pending_payload is None:
+                    self.condition.wait()
+                payload = self.pending_payload
+                self.pending_payload = None
+            try:
+                self.write(payload)
+            except Exception as e:
+                self.logger.error('Error writing state checkpoint:')
+                self.logger.exception(e)
+
+    def start_writer_thread(self):
+        self.writer_thread = threading.Thread(target=self.run_writer_forever, daemon=True)
+        self.writer_thread.start()
+
+    def load(self, timestamp):
+        if not os.path.exists(self.path):
+            return None
+        with gzip.open(self.path, 'rt', encoding='utf-8') as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+        if timestamp - checkpoint['saved_at'] > self.max_age:
+            return None
+        return checkpoint['sections']
+
+    def __repr__(self):
+        return (
+            f'{self.__class__.__name__}(path={self.path}, sections={len(self.serialized_sections)}, '
+            f'dirty={len(self.dirty_sections)}, writes={self.writes})'
+        )
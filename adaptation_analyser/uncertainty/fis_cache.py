@@ -0,0 +1,68 @@
+from collections import OrderedDict
+
+from adaptation_analyser.conf import UA_FIS_CACHE_MAX_BYTES, UA_FIS_CACHE_MAX_ENTRIES
+
+
+class FISCache(object):
+    def __init__(self, max_entries=UA_FIS_CACHE_MAX_ENTRIES, max_bytes=UA_FIS_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.entries_bytes = {}
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __contains__(self, key):
+        return key in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, key, entry, entry_bytes=0):
+        if key in self.entries:
+            self.remove(key)
+        self.entries[key] = entry
+        self.entries_bytes[key] = entry_bytes
+        self.total_bytes += entry_bytes
+        self.evict()
+
+    def remove(self, key):
+        self.entries.pop(key)
+        self.total_bytes -= self.entries_bytes.pop(key)
+
+    def is_over_limit(self):
+        over_entries = self.max_entries is not None and len(self.entries) > self.max_entries
+        over_bytes = self.max_bytes is not None and self.total_bytes > self.max_bytes
+        return over_entries or over_bytes
+
+    def evict(self):
+        # always keeps the most recent entry, even if it alone is over the memory cap
+        while len(self.entries) > 1 and self.is_over_limit():
+            oldest_key = next(iter(self.entries))
+            self.remove(oldest_key)
+            self.evictions += 1
+
+    def clear(self):
+        self.entries.clear()
+        self.entries_bytes.clear()
+        self.total_bytes = 0
+
+    def __repr__(self):
+        return (
+            f'{self.__class__.__name__}(entries={len(self.entries)}, total_bytes={self.total_bytes}, '
+            f'hits={self.hits}, misses={self.misses}, evictions={self.evictions})'
+        )
+
+
+FIS_CACHE = FISCache()
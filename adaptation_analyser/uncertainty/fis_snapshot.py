@@ -0,0 +1,97 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from adaptation_analyser.conf import UA_FIS_SNAPSHOT_DIR
+
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_META_FILE = 'meta.json'
+
+
+def get_rule_base_hash(mf_labels, usage_rules, usage_universe, inference_usage_universe):
+    rule_base = {
+        'version': SNAPSHOT_VERSION,
+        'mf_labels': list(mf_labels),
+        'usage_rules': usage_rules,
+        'usage_universe': [float(usage_universe[0]), float(usage_universe[-1]), len(usage_universe)],
+        'inference_usage_universe': [
+            float(inference_usage_universe[0]), float(inference_usage_universe[-1]), len(inference_usage_universe)
+        ],
+    }
+    return hashlib.sha1(json.dumps(rule_base, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+
+class FISSnapshotStore(object):
+    # numeric part of a built FIS (universe, membership functions and usage table) as .npy files, one directory
+    # per snapshot key, so a restarted (or another) process can memory-map it instead of rebuilding it
+    def __init__(self, snapshot_dir, mmap_mode='r'):
+        self.snapshot_dir = snapshot_dir
+        self.mmap_mode = mmap_mode
+        self.hits = 0
+        self.misses = 0
+        self.saves = 0
+
+    def get_snapshot_path(self, key):
+        return os.path.join(self.snapshot_dir, '-'.join(str(k) for k in key))
+
+    def load(self, key, mf_labels):
+        snapshot_path = self.get_snapshot_path(key)
+        meta_path = os.path.join(snapshot_path, SNAPSHOT_META_FILE)
+        if not os.path.exists(meta_path):
+            self.misses += 1
+            return None
+
+        with open(meta_path, 'r') as meta_file:
+            state = json.load(meta_file)
+        for attr in state.pop('arrays'):
+            state[attr] = np.load(os.path.join(snapshot_path, f'{attr}.npy'), mmap_mode=self.mmap_mode)
+        for attr in state.pop('mfs'):
+            mfs = np.load(os.path.join(snapshot_path, f'{attr}.npy'), mmap_mode=self.mmap_mode)
+            state[attr] = {label: mfs[i] for i, label in enumerate(mf_labels)}
+        self.hits += 1
+        return state
+
+    def save(self, key, state, mf_labels):
+        snapshot_path = self.get_snapshot_path(key)
+        if os.path.exists(snapshot_path):
+            return False
+
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        tmp_path = tempfile.mkdtemp(prefix='.tmp-', dir=self.snapshot_dir)
+        meta = {'arrays': [], 'mfs': []}
+        try:
+            for attr, value in state.items():
+                if value is None or isinstance(value, (int, float)):
+                    meta[attr] = value
+                elif isinstance(value, dict):
+                    np.save(os.path.join(tmp_path, f'{attr}.npy'), np.stack([value[label] for label in mf_labels]))
+                    meta['mfs'].append(attr)
+                else:
+                    np.save(os.path.join(tmp_path, f'{attr}.npy'), np.asarray(value))
+                    meta['arrays'].append(attr)
+            with open(os.path.join(tmp_path, SNAPSHOT_META_FILE), 'w') as meta_file:
+                json.dump(meta, meta_file)
+            # the rename makes the snapshot visible to other processes only once it is complete
+            os.rename(tmp_path, snapshot_path)
+        except OSError:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            if os.path.exists(snapshot_path):
+                # another process saved the same snapshot first
+                return False
+            raise
+        self.saves += 1
+        return True
+
+    def __repr__(self):
+        return (
+            f'{self.__class__.__name__}(snapshot_dir={self.snapshot_dir}, '
+            f'hits={self.hits}, misses={self.misses}, saves={self.saves})'
+        )
+
+
+FIS_SNAPSHOT_STORE = FISSnapshotStore(UA_FIS_SNAPSHOT_DIR) if UA_FIS_SNAPSHOT_DIR else None
@@ -3,19 +3,96 @@ import math
 import numpy as np
 from skfuzzy import control as ctrl
 
-from adaptation_analyser.conf import MF_LABELS
+from adaptation_analyser.conf import (
+    MF_LABELS,
+    UA_NORMALIZED_UNIVERSE_SIZE,
+    UA_USAGE_TABLE_RESOLUTION,
+)
+from adaptation_analyser.uncertainty.fis_cache import FIS_CACHE
+from adaptation_analyser.uncertainty.fis_snapshot import FIS_SNAPSHOT_STORE, get_rule_base_hash
+
+# usage label for each queue_size label (outer) and max_capacity label (inner)
+USAGE_RULES = {
+    'very_low': {
+        'very_low': 'very_high',
+        'low': 'medium',
+        'medium': 'very_low',
+        'high': 'very_low',
+        'very_high': 'very_low',
+    },
+    'low': {
+        'very_low': 'very_high',
+        'low': 'high',
+        'medium': 'high',
+        'high': 'low',
+        'very_high': 'very_low',
+    },
+    'medium': {
+        'very_low': 'very_high',
+        'low': 'very_high',
+        'medium': 'very_high',
+        'high': 'high',
+        'very_high': 'high',
+    },
+    'high': {
+        'very_low': 'very_high',
+        'low': 'very_high',
+        'medium': 'very_high',
+        'high': 'very_high',
+        'very_high': 'high',
+    },
+    'very_high': {
+        'very_low': 'very_high',
+        'low': 'very_high',
+        'medium': 'very_high',
+        'high': 'very_high',
+        'very_high': 'very_high',
+    },
+}
+
+# everything built from fis_max_cap, shared between analyses through the FIS cache
+FIS_STATE_ATTRS = (
+    'service_universe',
+    'rules',
+    'fis',
+    'sim',
+    'max_capacity_mfs',
+    'queue_size_mfs',
+    'usage_mfs',
+    'usage_table',
+    'usage_table_step',
+)
+# the skfuzzy objects can't be stored as arrays, they are rebuilt only if the simulation is needed
+FIS_SNAPSHOT_ATTRS = tuple(attr for attr in FIS_STATE_ATTRS if attr not in ('rules', 'fis', 'sim'))
 
 
 class UAServiceAnalysis(object):
-    def __init__(self, parent_service, service_type):
+    def __init__(self, parent_service, service_type,
+                 usage_table_resolution=UA_USAGE_TABLE_RESOLUTION,
+                 normalized_universe_size=UA_NORMALIZED_UNIVERSE_SIZE,
+                 fis_cache=None,
+                 fis_snapshot_store=FIS_SNAPSHOT_STORE):
         self.parent_service = parent_service
         self.service_type = service_type
         self.fis = None
         self.sim = None
+        self.rules = None
+        self.fis_cache = fis_cache if fis_cache is not None else FIS_CACHE
+        self.fis_snapshot_store = fis_snapshot_store
+        self.fis_max_cap = None
+        self.normalized_universe_size = normalized_universe_size
+        self.service_universe_scale = 1
+        self.usage_table_resolution = usage_table_resolution
+        self.usage_table = None
+        self.usage_table_step = None
         self.sw_max_throughput = 0.0
         self.sw_max_cap = 0
         self.service_universe = None
         self.usage_universe = np.arange(0, 100 + 1, 1)
+        self.inference_usage_universe = np.linspace(0, 100, 100 * 10 + 1)
+        self.max_capacity_mfs = None
+        self.queue_size_mfs = None
+        self.usage_mfs = None
         self.has_changed = False
 
     def setup_from_workers(self, workers):
@@ -28,13 +105,86 @@ class UAServiceAnalysis(object):
 
         if self.has_changed:
             self.sw_max_cap = math.floor(self.sw_max_throughput * self.parent_service.adaptation_delta)
-            self.service_universe = np.arange(0, self.sw_max_cap + 1, 1)
-            del self.fis
-            del self.sim
-            self.build_fis()
-            self.build_sim()
+            fis_max_cap = self.get_fis_max_cap(self.sw_max_cap)
+            self.service_universe_scale = fis_max_cap / self.sw_max_cap if self.sw_max_cap > 0 else 1
+            if fis_max_cap != self.fis_max_cap or self.usage_mfs is None:
+                self.fis_max_cap = fis_max_cap
+                self.load_or_build_fis()
             self.has_changed = False
 
+    def uses_normalized_universe(self):
+        return self.normalized_universe_size is not None and self.normalized_universe_size > 1
+
+    def get_fis_max_cap(self, sw_max_cap):
+        # a normalized FIS doesn't depend on the capacity, so a single model is shared by every service type
+        if self.uses_normalized_universe() and sw_max_cap > 0:
+            return 1
+        return sw_max_cap
+
+    def get_fis_cache_key(self):
+        return (self.fis_max_cap, self.normalized_universe_size, self.usage_table_resolution)
+
+    def get_fis_snapshot_key(self):
+        rule_base_hash = get_rule_base_hash(MF_LABELS, USAGE_RULES, self.usage_universe, self.inference_usage_universe)
+        return self.get_fis_cache_key() + (self.parent_service.adaptation_delta, rule_base_hash)
+
+    def load_fis_snapshot(self):
+        if self.fis_snapshot_store is None:
+            return None
+        try:
+            return self.fis_snapshot_store.load(self.get_fis_snapshot_key(), MF_LABELS)
+        except (OSError, ValueError) as e:
+            self.parent_service.logger.warning(f'Ignoring unreadable FIS snapshot: {e}')
+            return None
+
+    def save_fis_snapshot(self):
+        if self.fis_snapshot_store is None:
+            return
+        fis_state = {attr: getattr(self, attr) for attr in FIS_SNAPSHOT_ATTRS}
+        try:
+            self.fis_snapshot_store.save(self.get_fis_snapshot_key(), fis_state, MF_LABELS)
+        except OSError as e:
+            self.parent_service.logger.warning(f'Could not save FIS snapshot: {e}')
+
+    def estimate_fis_state_bytes(self):
+        state_bytes = self.service_universe.nbytes * (1 + 2 * len(MF_LABELS))
+        state_bytes += sum(mf.nbytes for mf in self.usage_mfs.values())
+        if self.usage_table is not None:
+            state_bytes += self.usage_table.nbytes
+        return state_bytes
+
+    def load_or_build_fis(self):
+        fis_cache_key = self.get_fis_cache_key()
+        fis_state = self.fis_cache.get(fis_cache_key)
+        if fis_state is None:
+            fis_state = self.load_fis_snapshot()
+            if fis_state is not None:
+                fis_state.update(rules=None, fis=None, sim=None)
+                self.set_fis_state(fis_state)
+            else:
+                del self.fis
+                del self.sim
+                self.build_service_universe()
+                self.build_fis()
+                self.build_sim()
+                self.build_usage_table()
+                self.save_fis_snapshot()
+                fis_state = {attr: getattr(self, attr) for attr in FIS_STATE_ATTRS}
+            self.fis_cache.put(fis_cache_key, fis_state, self.estimate_fis_state_bytes())
+        else:
+            self.set_fis_state(fis_state)
+
+    def set_fis_state(self, fis_state):
+        for attr, value in fis_state.items():
+            setattr(self, attr, value)
+
+    def build_service_universe(self):
+        # normalized universe keeps the FIS size constant, inputs are scaled by 1 / sw_max_cap
+        if self.uses_normalized_universe() and self.fis_max_cap > 0:
+            self.service_universe = np.linspace(0, self.fis_max_cap, self.normalized_universe_size)
+        else:
+            self.service_universe = np.arange(0, self.fis_max_cap + 1, 1)
+
     def build_fis(self):
         adp_max_cap = ctrl.Antecedent(self.service_universe, 'max_capacity')
         adp_max_cap.automf(names=MF_LABELS)
@@ -52,123 +202,115 @@ class UAServiceAnalysis(object):
         # plt.savefig('usage.png')
         self.rules = []
 
-        # rules for queue_size very_low
-        # self.rules.append(
-        #     ctrl.Rule(queue_size['very_low'], usage['very_low'])
-        # )
-        # alg_and = lambda a, b : a * b
-        # alg_or = lambda a, b: a + b - (a * b)
+        for queue_size_label, usage_by_max_cap_label in USAGE_RULES.items():
+            for max_cap_label, usage_label in usage_by_max_cap_label.items():
+                self.rules.append(
+                    ctrl.Rule(adp_max_cap[max_cap_label] & queue_size[queue_size_label], usage[usage_label])
+                )
 
-        # rules for queue_size very_low
-        self.rules.append(
-            ctrl.Rule(adp_max_cap['very_low'] & queue_size['very_low'], usage['very_high'])
-        )
-        self.rules.append(
-            ctrl.Rule(adp_max_cap['low'] & queue_size['very_low'], usage['medium'])
-        )
-        self.rules.append(
-            ctrl.Rule(adp_max_cap['medium'] & queue_size['very_low'], usage['very_low'])
-        )
-        self.rules.append(
-            ctrl.Rule(adp_max_cap['high'] & queue_size['very_low'], usage['very_low'])
-        )
-        self.rules.append(
-            ctrl.Rule(adp_max_cap['very_high'] & queue_size['very_low'], usage['very_low'])
-        )
+        self.fis = ctrl.ControlSystem(self.rules)
+        self.max_capacity_mfs = {label: adp_max_cap[label].mf for label in MF_LABELS}
+        self.queue_size_mfs = {label: queue_size[label].mf for label in MF_LABELS}
+        self.usage_mfs = {
+            label: np.interp(self.inference_usage_universe, self.usage_universe, usage[label].mf)
+            for label in MF_LABELS
+        }
 
+    def build_sim(self):
+        self.sim = ctrl.ControlSystemSimulation(self.fis)
 
+    def build_usage_table(self):
+        # precomputed (queue_size x max_capacity) usage surface, a resolution lower than 2 disables it
+        self.usage_table = None
+        self.usage_table_step = None
+        if self.usage_table_resolution is None or self.usage_table_resolution < 2 or self.fis_max_cap == 0:
+            return
 
-        # rules for queue_size low
-        self.rules.append(
-            ctrl.Rule(adp_max_cap['very_low'] & queue_size['low'], usage['very_high'])
-        )
-        self.rules.append(
-            ctrl.Rule(adp_max_cap['low'] & queue_size['low'], usage['high'])
-        )
-        self.rules.append(
-            ctrl.Rule(adp_max_cap['medium'] & queue_size['low'], usage['high'])
-        )
-        self.rules.append(
-            ctrl.Rule(adp_max_cap['high'] & queue_size['low'], usage['low'])
-        )
-        self.rules.append(
-            ctrl.Rule(adp_max_cap['very_high'] & queue_size['low'], usage['very_low'])
-        )
-        # self.rules.append(
-        #     ctrl.Rule(adp_max_cap['very_low'] & queue_size['low'], usage['very_high'])
-        # )
-        # self.rules.append(
-        #     ctrl.Rule(adp_max_cap['low'] & queue_size['low'], usage['high'])
-        # )
-        # self.rules.append(
-        #     ctrl.Rule((adp_max_cap['medium'] | adp_max_cap['high']) & queue_size['low'], usage['low'])
-        # )
-        # self.rules.append(
-        #     ctrl.Rule(adp_max_cap['very_high'] & queue_size['low'], usage['very_low'])
-        # )
-
-        # rules for queue_size medium
-        self.rules.append(
-            ctrl.Rule(adp_max_cap['very_low'] & queue_size['medium'], usage['very_high'])
-        )
-        self.rules.append(
-            ctrl.Rule(adp_max_cap['low'] & queue_size['medium'], usage['very_high'])
-        )
-        self.rules.append(
-            ctrl.Rule(adp_max_cap['medium'] & queue_size['medium'], usage['very_high'])
-        )
-        self.rules.append(
-            ctrl.Rule(adp_max_cap['high'] & queue_size['medium'], usage['high'])
-                    #   , and_func=alg_and, or_func=np.fmax)
-        )
-        self.rules.append(
-            ctrl.Rule(adp_max_cap['very_high'] & queue_size['medium'], usage['high'])
-        )
+        grid = np.linspace(0, self.fis_max_cap, self.usage_table_resolution)
+        queue_sizes, max_capacities = np.meshgrid(grid, grid, indexing='ij')
+        self.usage_table_step = grid[1]
+        self.usage_table = self.infer_workers_usage(queue_sizes, max_capacities)
 
-        # rules for queue_size high
-        self.rules.append(
-            ctrl.Rule(adp_max_cap['very_low'] & queue_size['high'], usage['very_high'])
-        )
-        self.rules.append(
-            ctrl.Rule(adp_max_cap['low'] & queue_size['high'], usage['very_high'])
-        )
-        self.rules.append(
-            # ctrl.Rule(adp_max_cap['medium'] & queue_size['high'], usage['very_high'])
-            ctrl.Rule(adp_max_cap['medium'] & queue_size['high'], usage['very_high'])
-                    #   , and_func=np.fmin, or_func=lambda a, b: np.minimum(1, a + b))
-        )
-        self.rules.append(
-            ctrl.Rule(adp_max_cap['high'] & queue_size['high'], usage['very_high'])
-        )
-        self.rules.append(
-            ctrl.Rule(adp_max_cap['very_high'] & queue_size['high'], usage['high'])
-        )
+    def _usage_table_positions(self, values):
+        positions = np.clip(values, 0, self.fis_max_cap) / self.usage_table_step
+        indexes = np.minimum(positions.astype(int), self.usage_table_resolution - 2)
+        return indexes, positions - indexes
 
-        # rules for queue_size very_high
-        self.rules.append(
-            ctrl.Rule(adp_max_cap['very_low'] & queue_size['very_high'], usage['very_high'])
-        )
-        self.rules.append(
-            ctrl.Rule(adp_max_cap['low'] & queue_size['very_high'], usage['very_high'])
-        )
-        self.rules.append(
-            ctrl.Rule(adp_max_cap['medium'] & queue_size['very_high'], usage['very_high'])
-        )
-        self.rules.append(
-            ctrl.Rule(adp_max_cap['high'] & queue_size['very_high'], usage['very_high'])
-        )
-        self.rules.append(
-            ctrl.Rule(adp_max_cap['very_high'] & queue_size['very_high'], usage['very_high'])
+    def lookup_workers_usage(self, queue_sizes, max_capacities):
+        q_indexes, q_fracs = self._usage_table_positions(np.asarray(queue_sizes, dtype=np.float64))
+        c_indexes, c_fracs = self._usage_table_positions(np.asarray(max_capacities, dtype=np.float64))
+        table = self.usage_table
+        return (
+            table[q_indexes, c_indexes] * (1 - q_fracs) * (1 - c_fracs) +
+            table[q_indexes + 1, c_indexes] * q_fracs * (1 - c_fracs) +
+            table[q_indexes, c_indexes + 1] * (1 - q_fracs) * c_fracs +
+            table[q_indexes + 1, c_indexes + 1] * q_fracs * c_fracs
         )
 
-        self.fis = ctrl.ControlSystem(self.rules)
+    def lookup_worker_usage(self, queue_size, max_capacity):
+        return float(self.lookup_workers_usage(queue_size, max_capacity))
 
-    def build_sim(self):
-        self.sim = ctrl.ControlSystemSimulation(self.fis)
+    def _centroid(self, universe, memberships):
+        # exact centroid of the piecewise linear aggregated output, as done by skfuzzy
+        x1, x2 = universe[:-1], universe[1:]
+        y1, y2 = memberships[:, :-1], memberships[:, 1:]
+        width = x2 - x1
+        area = width * (y1 + y2) / 2
+        moment = width * (x1 * (2 * y1 + y2) + x2 * (y1 + 2 * y2)) / 6
+        return moment.sum(axis=1) / area.sum(axis=1)
 
-    def calculate_worker_usage(self, queue_size, max_capacity):
+    def infer_workers_usage(self, queue_sizes, max_capacities):
+        # inputs in service universe units, as given by calculate_workers_usage
+        queue_sizes = np.clip(np.asarray(queue_sizes, dtype=np.float64), 0, self.fis_max_cap)
+        max_capacities = np.clip(np.asarray(max_capacities, dtype=np.float64), 0, self.fis_max_cap)
+        shape = queue_sizes.shape
+        queue_sizes = queue_sizes.ravel()
+        max_capacities = max_capacities.ravel()
+
+        queue_size_memberships = {
+            label: np.interp(queue_sizes, self.service_universe, mf) for label, mf in self.queue_size_mfs.items()
+        }
+        max_capacity_memberships = {
+            label: np.interp(max_capacities, self.service_universe, mf) for label, mf in self.max_capacity_mfs.items()
+        }
+
+        usage_activations = {}
+        for queue_size_label, usage_by_max_cap_label in USAGE_RULES.items():
+            for max_cap_label, usage_label in usage_by_max_cap_label.items():
+                activation = np.fmin(queue_size_memberships[queue_size_label], max_capacity_memberships[max_cap_label])
+                if usage_label in usage_activations:
+                    activation = np.fmax(usage_activations[usage_label], activation)
+                usage_activations[usage_label] = activation
+
+        aggregated = np.zeros((queue_sizes.size, self.inference_usage_universe.size))
+        for usage_label, activation in usage_activations.items():
+            np.fmax(aggregated, np.fmin(activation[:, None], self.usage_mfs[usage_label]), out=aggregated)
+
+        return self._centroid(self.inference_usage_universe, aggregated).reshape(shape)
+
+    def calculate_workers_usage(self, queue_sizes, max_capacities):
+        scale = self.service_universe_scale
+        queue_sizes = np.clip(np.asarray(queue_sizes, dtype=np.float64), 0, self.sw_max_cap) * scale
+        max_capacities = np.clip(np.asarray(max_capacities, dtype=np.float64), 0, self.sw_max_cap) * scale
+        if self.usage_table is None:
+            return self.infer_workers_usage(queue_sizes, max_capacities)
+        return self.lookup_workers_usage(queue_sizes, max_capacities)
+
+    def simulate_worker_usage(self, queue_size, max_capacity):
+        if self.sim is None:
+            # loaded from a snapshot, which only holds the arrays
+            self.build_fis()
+            self.build_sim()
         queue_size_ceil = min(queue_size, self.sw_max_cap)
-        self.sim.input['max_capacity'] = max_capacity
-        self.sim.input['queue_size'] = queue_size_ceil
+        max_capacity_ceil = min(max_capacity, self.sw_max_cap)
+        self.sim.input['max_capacity'] = max_capacity_ceil * self.service_universe_scale
+        self.sim.input['queue_size'] = queue_size_ceil * self.service_universe_scale
         self.sim.compute()
         return self.sim.output['usage']
+
+    def calculate_worker_usage(self, queue_size, max_capacity):
+        if self.usage_table is None:
+            return self.simulate_worker_usage(queue_size, max_capacity)
+        queue_size = min(max(queue_size, 0), self.sw_max_cap) * self.service_universe_scale
+        max_capacity = min(max(max_capacity, 0), self.sw_max_cap) * self.service_universe_scale
+        return self.lookup_worker_usage(queue_size, max_capacity)
@@ -0,0 +1,75 @@
+import concurrent.futures
+import logging
+import multiprocessing
+import sys
+
+
+# per pool process, the fuzzy models stay warm between the submitted batches
+WARM_UA_ANALYSIS_PER_TYPE = {}
+
+
+class PoolUAAnalysisParent(object):
+    # what UAServiceAnalysis needs from the service, inside a pool process
+    def __init__(self, adaptation_delta):
+        self.adaptation_delta = adaptation_delta
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+
+def calculate_service_type_workers_usage(service_type, adaptation_delta, sw_max_throughput,
+                                         queue_sizes, max_capacities):
+    from adaptation_analyser.uncertainty.ua_analysis import UAServiceAnalysis
+
+    ua_analysis = WARM_UA_ANALYSIS_PER_TYPE.get(service_type)
+    if ua_analysis is None or ua_analysis.parent_service.adaptation_delta != adaptation_delta:
+        ua_analysis = UAServiceAnalysis(PoolUAAnalysisParent(adaptation_delta), service_type)
+        WARM_UA_ANALYSIS_PER_TYPE[service_type] = ua_analysis
+    ua_analysis.setup_from_workers({'max_throughput_worker': {'throughput': sw_max_throughput}})
+    return ua_analysis.calculate_workers_usage(queue_sizes, max_capacities)
+
+
+class FuzzyUsageExecutor(object):
+    def __init__(self, max_workers, timeout, logger):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.logger = logger
+        self.executor = self.build_executor(max_workers)
+        self.timeouts = 0
+        self.failures = 0
+
+    def build_executor(self, max_workers):
+        # mp_context is only available from python 3.7, before that the pool uses the platform default (fork)
+        if sys.version_info < (3, 7):
+            return concurrent.futures.ProcessPoolExecutor(max_workers=max_workers)
+        return concurrent.futures.ProcessPoolExecutor(
+            max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+
+    def submit(self, service_type, adaptation_delta, sw_max_throughput, queue_sizes, max_capacities):
+        return self.executor.submit(
+            calculate_service_type_workers_usage,
+            service_type, adaptation_delta, sw_max_throughput, queue_sizes, max_capacities
+        )
+
+    def gather(self, futures):
+        # a single deadline for the whole batch, missing results are left for the caller fallback
+        done, not_done = concurrent.futures.wait(futures, timeout=self.timeout)
+        results = {}
+        for future in done:
+            try:
+                results[future] = future.result()
+            except Exception as e:
+                self.failures += 1
+                self.logger.error('Error calculating workers usage in the process pool:')
+                self.logger.exception(e)
+        for future in not_done:
+            future.cancel()
+            self.timeouts += 1
+        return results
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+    def __repr__(self):
+        return (
+            f'{self.__class__.__name__}(max_workers={self.max_workers}, timeouts={self.timeouts}, '
+            f'failures={self.failures})'
+        )
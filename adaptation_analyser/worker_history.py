@@ -0,0 +1,120 @@
+from array import array
+
+
+class WorkerSampleRing(object):
+    # fixed size arrays of the latest samples, the oldest sample is overwritten once it's full
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.timestamps = array('d', bytes(8 * capacity))
+        self.queue_sizes = array('d', bytes(8 * capacity))
+        self.throughputs = array('d', bytes(8 * capacity))
+        self.next_index = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, timestamp, queue_size, throughput):
+        i = self.next_index
+        self.timestamps[i] = timestamp
+        self.queue_sizes[i] = queue_size
+        self.throughputs[i] = throughput
+        self.next_index = (i + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def latest_queue_size(self):
+        return self.queue_sizes[self.next_index - 1]
+
+    def latest_timestamp(self):
+        return self.timestamps[self.next_index - 1]
+
+    def latest_throughput(self):
+        return self.throughputs[self.next_index - 1]
+
+    def mean_throughput(self):
+        return sum(self.throughputs[i] for i in range(self.count)) / self.count
+
+    def get_queue_size_trend(self):
+        # least squares slope of queue_size over time (queue units per second), order doesn't matter for it
+        if self.count < 2:
+            return None
+        n = self.count
+        mean_t = sum(self.timestamps[i] for i in range(n)) / n
+        mean_q = sum(self.queue_sizes[i] for i in range(n)) / n
+        var_t = 0.0
+        cov_tq = 0.0
+        for i in range(n):
+            dt = self.timestamps[i] - mean_t
+            var_t += dt * dt
+            cov_tq += dt * (self.queue_sizes[i] - mean_q)
+        if var_t == 0:
+            return None
+        return cov_tq / var_t
+
+    def forecast_seconds_to_reach(self, queue_size_threshold):
+        if self.latest_queue_size() >= queue_size_threshold:
+            return 0.0
+        trend = self.get_queue_size_trend()
+        if trend is None or trend <= 0:
+            return None
+        return (queue_size_threshold - self.latest_queue_size()) / trend
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(samples={self.count}/{self.capacity})'
+
+
+class WorkerHistory(object):
+    def __init__(self, capacity, min_samples=3, min_sample_interval=0):
+        self.capacity = capacity
+        self.min_samples = min_samples
+        # samples this close to the latest one (e.g. a backlog of monitoring events) would make up a steep trend
+        self.min_sample_interval = min_sample_interval
+        self.rings = {}
+        # workers whose latest added sample has a different queue size or throughput than the one before
+        self.changed_workers = []
+        # workers last forecasted to overload, as an insertion ordered set
+        self.predicted_workers = {}
+
+    def __len__(self):
+        return len(self.rings)
+
+    def add_samples(self, workers, timestamp):
+        changed_workers = []
+        for stream_key, worker_state in workers.items():
+            queue_size = worker_state.queue_size
+            throughput = worker_state.throughput
+            ring = self.rings.get(stream_key)
+            if ring is None:
+                ring = WorkerSampleRing(self.capacity)
+                self.rings[stream_key] = ring
+            elif timestamp - ring.latest_timestamp() <= self.min_sample_interval:
+                continue
+            elif ring.latest_queue_size() == queue_size and ring.latest_throughput() == throughput:
+                ring.append(timestamp, queue_size, throughput)
+                continue
+            ring.append(timestamp, queue_size, throughput)
+            changed_workers.append(stream_key)
+        self.changed_workers = changed_workers
+        return changed_workers
+
+    def remove_missing_workers(self, workers):
+        for stream_key in set(self.rings).difference(workers):
+            del self.rings[stream_key]
+            self.predicted_workers.pop(stream_key, None)
+
+    def get_forecast_workers(self):
+        forecast_workers = list(self.predicted_workers)
+        forecast_workers.extend(k for k in self.changed_workers if k not in self.predicted_workers)
+        return forecast_workers
+
+    def forecast_seconds_to_overload(self, stream_key, adaptation_delta, overloaded_percentage):
+        ring = self.rings.get(stream_key)
+        if ring is None or len(ring) < self.min_samples:
+            return None
+        max_capacity = ring.mean_throughput() * adaptation_delta
+        if max_capacity == 0:
+            return None
+        return ring.forecast_seconds_to_reach(max_capacity * overloaded_percentage)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(workers={len(self.rings)}, capacity={self.capacity})'
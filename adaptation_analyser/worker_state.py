@@ -0,0 +1,78 @@
+def _parse_optional_float(value):
+    if value is None:
+        return None
+    return float(value)
+
+
+class WorkerState(object):
+    """Parsed numeric fields of a service worker, updated in place by every announcement/monitoring event.
+
+    Keeps a read-only dict-like access (get/[]) so it can be used where the raw worker dicts were.
+    """
+    __slots__ = ('stream_key', 'service_type', 'queue_size', 'throughput', 'accuracy', 'energy_consumption')
+
+    def __init__(self, stream_key, service_type, queue_size=0, throughput=None, accuracy=None, energy_consumption=None):
+        self.stream_key = stream_key
+        self.service_type = service_type
+        self.queue_size = queue_size
+        self.throughput = throughput
+        self.accuracy = accuracy
+        self.energy_consumption = energy_consumption
+
+    @classmethod
+    def from_dict(cls, worker_data, stream_key=None, service_type=None):
+        worker_state = cls(
+            stream_key=worker_data.get('stream_key', stream_key),
+            service_type=worker_data.get('service_type', service_type),
+        )
+        worker_state.update_from_dict(worker_data)
+        return worker_state
+
+    def update_from_dict(self, worker_data):
+        # announcements have no queue_size, and monitoring events may not repeat the announced qos fields
+        if 'queue_size' in worker_data:
+            self.queue_size = int(worker_data['queue_size'])
+        if 'throughput' in worker_data:
+            self.throughput = float(worker_data['throughput'])
+        if 'accuracy' in worker_data:
+            self.accuracy = _parse_optional_float(worker_data['accuracy'])
+        if 'energy_consumption' in worker_data:
+            self.energy_consumption = _parse_optional_float(worker_data['energy_consumption'])
+
+    def update_monitored_fields(self, worker_data):
+        # the monitoring analyses only need these, the qos fields are taken from the announcements
+        self.queue_size = int(worker_data.get('queue_size', 0))
+        self.throughput = float(worker_data.get('throughput', 0.0))
+
+    def get(self, field, default=None):
+        value = getattr(self, field, None)
+        return default if value is None else value
+
+    def __getitem__(self, field):
+        if field not in self.__slots__:
+            raise KeyError(field)
+        return getattr(self, field)
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in self.__slots__ if getattr(self, field) is not None}
+
+    def __eq__(self, other):
+        if not isinstance(other, WorkerState):
+            return NotImplemented
+        return all(getattr(self, field) == getattr(other, field) for field in self.__slots__)
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.to_dict()})'
+
+
+def update_worker_states(worker_states, workers, service_type):
+    # returns the states of the monitored workers, in their order, parsing each worker dict only once
+    updated_worker_states = {}
+    for stream_key, worker_data in workers.items():
+        worker_state = worker_states.get(stream_key)
+        if worker_state is None:
+            worker_state = WorkerState.from_dict(worker_data, stream_key=stream_key, service_type=service_type)
+            worker_states[stream_key] = worker_state
+        worker_state.update_monitored_fields(worker_data)
+        updated_worker_states[stream_key] = worker_state
+    return updated_worker_states
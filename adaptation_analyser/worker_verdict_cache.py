@@ -0,0 +1,76 @@
+import operator
+
+
+class WorkerVerdictCache(object):
+    def __init__(self, input_fields):
+        self.input_fields = input_fields
+        # reads the inputs of a WorkerState
+        self.get_worker_inputs = operator.attrgetter(*input_fields)
+        self.workers_inputs = {}
+        # ordered set, the workers stay in the order they got a positive verdict
+        self.positive_workers = {}
+        # latest verdict of the workers whose positive verdict was set or removed, until they are popped
+        self.positive_changes = {}
+
+    def __len__(self):
+        return len(self.workers_inputs)
+
+    def remove_missing_workers(self, workers):
+        if len(self.workers_inputs) == len(workers) and all(k in self.workers_inputs for k in workers):
+            return
+        for stream_key in set(self.workers_inputs).difference(workers):
+            del self.workers_inputs[stream_key]
+            if stream_key in self.positive_workers:
+                del self.positive_workers[stream_key]
+                self.positive_changes[stream_key] = False
+
+    def get_changed_workers(self, workers):
+        self.remove_missing_workers(workers)
+        changed_workers = {}
+        get_worker_inputs = self.get_worker_inputs
+        for stream_key, worker_state in workers.items():
+            worker_inputs = get_worker_inputs(worker_state)
+            if self.workers_inputs.get(stream_key) != worker_inputs:
+                self.workers_inputs[stream_key] = worker_inputs
+                changed_workers[stream_key] = worker_state
+        return changed_workers
+
+    def set_workers_inputs(self, changed_workers):
+        # for changed workers found elsewhere, their inputs are only kept once their verdicts are evaluated
+        get_worker_inputs = self.get_worker_inputs
+        for stream_key, worker_state in changed_workers.items():
+            self.workers_inputs[stream_key] = get_worker_inputs(worker_state)
+
+    def set_verdicts(self, changed_workers_keys, positive_workers_keys):
+        positive_workers = self.positive_workers
+        positive_changes = self.positive_changes
+        for stream_key in changed_workers_keys:
+            if stream_key in positive_workers:
+                del positive_workers[stream_key]
+                positive_changes[stream_key] = False
+        for stream_key in positive_workers_keys:
+            positive_workers[stream_key] = None
+            positive_changes[stream_key] = True
+
+    def forget_workers(self, workers_keys):
+        # keeps the current verdicts, but the workers are evaluated again on their next event
+        for stream_key in workers_keys:
+            if stream_key in self.workers_inputs:
+                self.workers_inputs[stream_key] = None
+
+    def get_positive_workers(self):
+        # the missing workers were already removed before evaluating the changed ones, no need to go through all of them
+        return list(self.positive_workers)
+
+    def pop_positive_changes(self):
+        positive_changes = self.positive_changes
+        self.positive_changes = {}
+        return positive_changes
+
+    def clear(self):
+        self.workers_inputs.clear()
+        self.positive_changes.update(dict.fromkeys(self.positive_workers, False))
+        self.positive_workers.clear()
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}(workers={len(self.workers_inputs)}, positive={len(self.positive_workers)})'
@@ -0,0 +1,163 @@
+from contextlib import contextmanager
+from unittest.mock import patch
+
+from adaptation_analyser.replay import ReplayClock, prepare_replay_service
+from adaptation_analyser.uncertainty.fis_cache import FISCache
+from adaptation_analyser.uncertainty.ua_analysis import UAServiceAnalysis
+from adaptation_analyser.worker_state import WorkerState
+
+
+WORKER_COUNTS = (10, 100, 1000)
+CAPACITIES = (100, 1000, 10000)
+SERVICE_TYPE = 'ObjectDetection'
+
+
+def build_service():
+    return prepare_replay_service(ReplayClock())
+
+
+def build_workers(number_of_workers, max_capacity, adaptation_delta=10):
+    max_throughput = max_capacity / adaptation_delta
+    workers = {}
+    for i in range(number_of_workers):
+        stream_key = f'worker-{i}'
+        workers[stream_key] = {
+            'stream_key': stream_key,
+            'service_type': SERVICE_TYPE,
+            'queue_size': (i * 7) % max_capacity,
+            'throughput': max_throughput * (i + 1) / number_of_workers,
+            'accuracy': (i * 13 % 100) / 100,
+            'energy_consumption': (i * 17 % 100) + 1,
+        }
+    return workers
+
+
+def build_ua_analysis(service, max_capacity):
+    ua_analysis = UAServiceAnalysis(service, SERVICE_TYPE, fis_cache=FISCache())
+    ua_analysis.setup_from_workers(build_workers(1, max_capacity, service.adaptation_delta))
+    return ua_analysis
+
+
+@contextmanager
+def bench_build_fis(max_capacity):
+    service = build_service()
+    ua_analysis = UAServiceAnalysis(service, SERVICE_TYPE, fis_cache=FISCache())
+    ua_analysis.fis_max_cap = max_capacity
+    ua_analysis.build_service_universe()
+    yield ua_analysis.build_fis
+
+
+@contextmanager
+def bench_setup_from_workers(max_capacity, number_of_workers=100):
+    # cold setup: rebuilds the universe, FIS, simulation and usage table every call
+    service = build_service()
+    workers = build_workers(number_of_workers, max_capacity, service.adaptation_delta)
+
+    def setup_from_workers():
+        UAServiceAnalysis(service, SERVICE_TYPE, fis_cache=FISCache()).setup_from_workers(workers)
+    yield setup_from_workers
+
+
+@contextmanager
+def bench_calculate_worker_usage(max_capacity):
+    service = build_service()
+    ua_analysis = build_ua_analysis(service, max_capacity)
+    queue_size = max_capacity // 3
+    max_capacity = max_capacity // 2
+    yield lambda: ua_analysis.calculate_worker_usage(queue_size, max_capacity)
+
+
+@contextmanager
+def bench_is_service_worker_overloaded_crisp(max_capacity):
+    service = build_service()
+    worker = WorkerState.from_dict(build_workers(2, max_capacity, service.adaptation_delta)['worker-1'])
+    worker.queue_size = max_capacity // 3
+    with patch('adaptation_analyser.service.UA_USAGE_ANALYSIS', False):
+        yield lambda: service._is_service_worker_overloaded(worker)
+
+
+@contextmanager
+def bench_is_service_worker_overloaded_fuzzy(max_capacity):
+    service = build_service()
+    service.ua_usage_analysis_per_type[SERVICE_TYPE] = build_ua_analysis(service, max_capacity)
+    worker = WorkerState.from_dict(build_workers(2, max_capacity, service.adaptation_delta)['worker-1'])
+    worker.queue_size = max_capacity // 3
+    with patch('adaptation_analyser.service.UA_USAGE_ANALYSIS', True):
+        yield lambda: service._is_service_worker_overloaded(worker)
+
+
+@contextmanager
+def bench_verify_service_worker_best_idle(number_of_workers):
+    # steady state monitoring: a single worker changes its queue between two calls, including parsing the
+    # monitored workers into their states (done once per monitoring event)
+    service = build_service()
+    workers = build_workers(number_of_workers, 1000, service.adaptation_delta)
+    for worker in workers.values():
+        service.process_service_worker_announced({'worker': worker})
+    service_workers = {
+        SERVICE_TYPE: {'workers': workers, 'total_number_workers': number_of_workers}
+    }
+    changing_worker = workers['worker-0']
+
+    def verify_service_worker_best_idle():
+        changing_worker['queue_size'] = 1 - changing_worker['queue_size']
+        service.verify_service_worker_best_idle(service_workers)
+    yield verify_service_worker_best_idle
+
+
+@contextmanager
+def bench_analyse_service_workers_stream_monitored(number_of_workers):
+    # whole monitoring event analysis (parsing, overloaded and best idle analyses) with one changed worker
+    service = build_service()
+    workers = build_workers(number_of_workers, 1000, service.adaptation_delta)
+    for i, worker in enumerate(workers.values()):
+        service.process_service_worker_announced({'worker': worker})
+        worker['queue_size'] = i % 2
+    event_data = {
+        'id': 'monitoring',
+        'service_workers': {SERVICE_TYPE: {'workers': workers, 'total_number_workers': number_of_workers}}
+    }
+    changing_worker = workers['worker-0']
+
+    def analyse_service_workers_stream_monitored():
+        changing_worker['queue_size'] = 1 - changing_worker['queue_size']
+        service.analyse_service_workers_stream_monitored(event_data)
+    yield analyse_service_workers_stream_monitored
+
+
+@contextmanager
+def bench_update_best_worker_by_service_by_qos_policy(number_of_workers):
+    service = build_service()
+    workers = build_workers(number_of_workers, 1000, service.adaptation_delta)
+    for worker in workers.values():
+        service.update_best_worker_by_service_by_qos_policy(SERVICE_TYPE, worker)
+    updated_worker = dict(workers[f'worker-{number_of_workers // 2}'])
+    throughputs = [1.0, 100.0]
+
+    def update_best_worker_by_service_by_qos_policy():
+        throughputs.reverse()
+        updated_worker['throughput'] = throughputs[0]
+        service.update_best_worker_by_service_by_qos_policy(SERVICE_TYPE, updated_worker)
+    yield update_best_worker_by_service_by_qos_policy
+
+
+def get_benchmark_cases():
+    cases = {}
+    for max_capacity in CAPACITIES:
+        cases[f'build_fis[capacity={max_capacity}]'] = (bench_build_fis, {'max_capacity': max_capacity})
+        cases[f'setup_from_workers[capacity={max_capacity}]'] = (
+            bench_setup_from_workers, {'max_capacity': max_capacity})
+        cases[f'calculate_worker_usage[capacity={max_capacity}]'] = (
+            bench_calculate_worker_usage, {'max_capacity': max_capacity})
+        cases[f'is_service_worker_overloaded_crisp[capacity={max_capacity}]'] = (
+            bench_is_service_worker_overloaded_crisp, {'max_capacity': max_capacity})
+        cases[f'is_service_worker_overloaded_fuzzy[capacity={max_capacity}]'] = (
+            bench_is_service_worker_overloaded_fuzzy, {'max_capacity': max_capacity})
+    for number_of_workers in WORKER_COUNTS:
+        cases[f'verify_service_worker_best_idle[workers={number_of_workers}]'] = (
+            bench_verify_service_worker_best_idle, {'number_of_workers': number_of_workers})
+        cases[f'analyse_service_workers_stream_monitored[workers={number_of_workers}]'] = (
+            bench_analyse_service_workers_stream_monitored, {'number_of_workers': number_of_workers})
+        cases[f'update_best_worker_by_service_by_qos_policy[workers={number_of_workers}]'] = (
+            bench_update_best_worker_by_service_by_qos_policy, {'number_of_workers': number_of_workers})
+    return cases
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+import argparse
+import json
+import os
+import platform
+import sys
+import timeit
+
+from benchmarks.cases import get_benchmark_cases
+
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines.json')
+DEFAULT_TOLERANCE = 0.5
+MIN_RUN_TIME = 0.2
+REPEAT = 5
+
+
+def get_machine_info():
+    return {
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+    }
+
+
+def time_call(func, min_run_time=MIN_RUN_TIME, repeat=REPEAT):
+    # best of `repeat` runs, each long enough (min_run_time) to make the timer resolution irrelevant
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_run_time / 0.2))
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def run_benchmarks(name_filter=None, min_run_time=MIN_RUN_TIME, repeat=REPEAT):
+    results = {}
+    for name, (benchmark, kwargs) in get_benchmark_cases().items():
+        if name_filter and name_filter not in name:
+            continue
+        with benchmark(**kwargs) as func:
+            results[name] = time_call(func, min_run_time=min_run_time, repeat=repeat)
+    return results
+
+
+def load_baseline(baseline_path):
+    if not os.path.exists(baseline_path):
+        return None
+    with open(baseline_path, 'r') as baseline_file:
+        return json.load(baseline_file)
+
+
+def save_baseline(baseline_path, results):
+    baseline = {
+        'machine': get_machine_info(),
+        'seconds_per_call': results,
+    }
+    with open(baseline_path, 'w') as baseline_file:
+        json.dump(baseline, baseline_file, indent=4, sort_keys=True)
+        baseline_file.write('\n')
+
+
+def compare_with_baseline(results, baseline_results, tolerance):
+    comparison = {}
+    for name, seconds in results.items():
+        baseline_seconds = baseline_results.get(name)
+        ratio = seconds / baseline_seconds if baseline_seconds else None
+        comparison[name] = {
+            'seconds': seconds,
+            'baseline_seconds': baseline_seconds,
+            'ratio': ratio,
+            'regression': ratio is not None and ratio > 1 + tolerance,
+        }
+    return comparison
+
+
+def format_seconds(seconds):
+    if seconds is None:
+        return '-'
+    if seconds < 1e-3:
+        return f'{seconds * 1e6:.2f}us'
+    return f'{seconds * 1e3:.2f}ms'
+
+
+def print_comparison(comparison):
+    name_width = max(len(name) for name in comparison)
+    print(f'{"benchmark":<{name_width}}  {"current":>12}  {"baseline":>12}  {"ratio":>6}')
+    for name, result in comparison.items():
+        ratio = '-' if result['ratio'] is None else f'{result["ratio"]:.2f}'
+        flag = '  REGRESSION' if result['regression'] else ''
+        print(
+            f'{name:<{name_width}}  {format_seconds(result["seconds"]):>12}  '
+            f'{format_seconds(result["baseline_seconds"]):>12}  {ratio:>6}{flag}'
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the analyser microbenchmarks and compare them to the baseline.')
+    parser.add_argument('--baseline', default=BASELINE_FILE, help='baseline json file')
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help='allowed slowdown over the baseline before flagging a regression (0.5 = 50%%)')
+    parser.add_argument('--update-baseline', action='store_true', help='store the current results as the baseline')
+    parser.add_argument('--filter', help='only run benchmarks with this substring in their name')
+    parser.add_argument('--min-run-time', type=float, default=MIN_RUN_TIME, help='seconds per timing run')
+    args = parser.parse_args()
+
+    results = run_benchmarks(name_filter=args.filter, min_run_time=args.min_run_time)
+    baseline = load_baseline(args.baseline)
+    if args.update_baseline:
+        if baseline is not None and args.filter:
+            results = dict(baseline['seconds_per_call'], **results)
+        save_baseline(args.baseline, results)
+        print(f'Baseline saved to {args.baseline}')
+        return 0
+
+    if baseline is None:
+        print(f'No baseline at {args.baseline}, run with --update-baseline first')
+        baseline = {'machine': None, 'seconds_per_call': {}}
+    elif baseline['machine'] != get_machine_info():
+        print(f'Warning: baseline recorded on {baseline["machine"]}, timings are only comparable on the same machine')
+
+    comparison = compare_with_baseline(results, baseline['seconds_per_call'], args.tolerance)
+    print_comparison(comparison)
+    regressions = [name for name, result in comparison.items() if result['regression']]
+    if regressions:
+        print(f'{len(regressions)} benchmark(s) slower than the baseline by more than {args.tolerance:.0%}')
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -6,6 +6,12 @@ setup(
     description='Service responsible for analysing alerts in the MAPE-K architecture for self-adaptivity',
     author='Felipe Arruda Pontes',
     author_email='felipe.arruda.pontes@insight-centre.org',
-    packages=['adaptation_analyser'],
+    packages=['adaptation_analyser', 'adaptation_analyser.uncertainty'],
+    extras_require={
+        # skfuzzy.control imports matplotlib.pyplot, so the fuzzy analysis still needs it at runtime
+        'fuzzy': ['scikit-fuzzy==0.4.2', 'matplotlib==3.3.4'],
+        # plotting for the uncertainty/exploring_* scripts
+        'plots': ['matplotlib==3.3.4'],
+    },
     zip_safe=False
 )
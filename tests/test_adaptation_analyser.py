@@ -1,8 +1,13 @@
+import subprocess
+import sys
 from unittest.mock import patch, MagicMock
 
+from prometheus_client import REGISTRY
+
 from event_service_utils.tests.base_test_case import MockedEventDrivenServiceStreamTestCase
 from event_service_utils.tests.json_msg_helper import prepare_event_msg_tuple
 
+from adaptation_analyser.publish_buffer import PipelinedPublishBuffer
 from adaptation_analyser.service import AdaptationAnalyser
 
 from adaptation_analyser.conf import (
@@ -10,6 +15,8 @@ from adaptation_analyser.conf import (
     SERVICE_CMD_KEY_LIST,
     SERVICE_DETAILS,
     PUB_EVENT_LIST,
+    LISTEN_EVENT_TYPE_QUERY_CREATED,
+    LISTEN_EVENT_TYPE_SERVICE_WORKERS_STREAM_MONITORED,
 )
 
 
@@ -31,6 +38,10 @@ class TestAdaptationAnalyser(MockedEventDrivenServiceStreamTestCase):
         'cg-AdaptationAnalyser': MOCKED_CG_STREAM_DICT,
     }
 
+    def get_metric_value(self, name, labels):
+        # metrics live in the process wide registry, tests compare deltas
+        return REGISTRY.get_sample_value(name, labels) or 0
+
     @patch('adaptation_analyser.service.AdaptationAnalyser.process_event_type')
     def test_process_cmd_should_call_process_event_type(self, mocked_process_event_type):
         event_type = 'SomeEventType'
@@ -49,3 +60,319 @@ class TestAdaptationAnalyser(MockedEventDrivenServiceStreamTestCase):
         self.service.process_cmd()
         self.assertTrue(mocked_process_event_type.called)
         self.service.process_event_type.assert_called_once_with(event_type=event_type, event_data=event_data, json_msg=msg_tuple[1])
+
+    @patch('adaptation_analyser.service.UA_USAGE_ANALYSIS', True)
+    def test_verify_service_workers_overloaded_evaluates_fuzzy_usage_for_all_workers_of_a_service(self):
+        workers = {
+            'worker-1': {'stream_key': 'worker-1', 'service_type': 'ObjectDetection', 'throughput': 10, 'queue_size': 300},
+            'worker-2': {'stream_key': 'worker-2', 'service_type': 'ObjectDetection', 'throughput': 100, 'queue_size': 5},
+            'worker-3': {'stream_key': 'worker-3', 'service_type': 'ObjectDetection', 'throughput': 100, 'queue_size': 0},
+            'worker-4': {'stream_key': 'worker-4', 'service_type': 'ObjectDetection', 'throughput': 0, 'queue_size': 0},
+        }
+        self.service.update_ua_service_analysis({'ObjectDetection': {'workers': workers}}, 'ObjectDetection')
+        event_data = {
+            'service_workers': {
+                'ObjectDetection': {'workers': workers, 'total_number_workers': 4}
+            }
+        }
+
+        overloaded_workers = self.service.verify_service_workers_overloaded(event_data)
+        self.assertListEqual(overloaded_workers, ['worker-1', 'worker-4'])
+
+    def prepare_fuzzy_usage_executor_workers(self):
+        workers = {
+            'worker-1': {'stream_key': 'worker-1', 'service_type': 'ObjectDetection', 'throughput': 10, 'queue_size': 300},
+            'worker-2': {'stream_key': 'worker-2', 'service_type': 'ObjectDetection', 'throughput': 100, 'queue_size': 5},
+            'worker-3': {'stream_key': 'worker-3', 'service_type': 'ObjectDetection', 'throughput': 0, 'queue_size': 0},
+        }
+        self.service.update_ua_service_analysis({'ObjectDetection': {'workers': workers}}, 'ObjectDetection')
+        self.service.ua_executor_min_workers = 1
+        self.service.fuzzy_usage_executor = MagicMock()
+        return {'service_workers': {'ObjectDetection': {'workers': workers, 'total_number_workers': 3}}}
+
+    @patch('adaptation_analyser.service.UA_USAGE_ANALYSIS', True)
+    def test_verify_service_workers_overloaded_uses_process_pool_usage(self):
+        event_data = self.prepare_fuzzy_usage_executor_workers()
+        ua_analysis = self.service.ua_usage_analysis_per_type['ObjectDetection']
+        future = MagicMock()
+        self.service.fuzzy_usage_executor.submit.return_value = future
+
+        def gather(futures):
+            submit_args = self.service.fuzzy_usage_executor.submit.call_args[0]
+            return {future: ua_analysis.calculate_workers_usage(submit_args[3], submit_args[4])}
+        self.service.fuzzy_usage_executor.gather.side_effect = gather
+
+        overloaded_workers = self.service.verify_service_workers_overloaded(event_data)
+
+        self.assertListEqual(overloaded_workers, ['worker-1', 'worker-3'])
+        submit_args = self.service.fuzzy_usage_executor.submit.call_args[0]
+        self.assertEqual(submit_args[:3], ('ObjectDetection', 10, 100.0))
+        self.assertListEqual(list(submit_args[3]), [300, 5])
+
+    @patch('adaptation_analyser.service.UA_USAGE_ANALYSIS', True)
+    def test_verify_service_workers_overloaded_falls_back_to_crisp_usage_when_process_pool_times_out(self):
+        event_data = self.prepare_fuzzy_usage_executor_workers()
+        self.service.fuzzy_usage_executor.gather.return_value = {}
+
+        overloaded_workers = self.service.verify_service_workers_overloaded(event_data)
+
+        # crisp 300 / 100 for worker-1
+        self.assertListEqual(overloaded_workers, ['worker-1', 'worker-3'])
+        # the crisp verdicts are not kept, the next event tries the pool again
+        self.service.verify_service_workers_overloaded(event_data)
+        self.assertEqual(self.service.fuzzy_usage_executor.submit.call_count, 2)
+
+    def test_process_service_worker_announced_updates_best_worker_by_qos_policy(self):
+        worker_1 = {'stream_key': 'worker-1', 'service_type': 'ObjectDetection', 'throughput': 10, 'accuracy': 0.9, 'energy_consumption': 5}
+        worker_2 = {'stream_key': 'worker-2', 'service_type': 'ObjectDetection', 'throughput': 20, 'accuracy': 0.5, 'energy_consumption': 10}
+        self.service.process_service_worker_announced({'id': 1, 'worker': worker_1})
+        self.service.process_service_worker_announced({'id': 2, 'worker': worker_2})
+
+        best_workers = self.service.best_workers_by_service_by_qos_policy
+        self.assertEqual(best_workers['latency=min']['ObjectDetection']['stream_key'], 'worker-2')
+        self.assertEqual(best_workers['accuracy=max']['ObjectDetection']['stream_key'], 'worker-1')
+        self.assertEqual(best_workers['energy_consumption=min']['ObjectDetection']['stream_key'], 'worker-1')
+
+    def test_qos_policies_are_configurable(self):
+        self.service.query_qos_policies = self.service.prepare_query_qos_policies(['cost=min:cost:min'])
+        worker_1 = {'stream_key': 'worker-1', 'service_type': 'ObjectDetection', 'throughput': 10, 'cost': 3}
+        worker_2 = {'stream_key': 'worker-2', 'service_type': 'ObjectDetection', 'throughput': 20, 'cost': 1}
+        self.service.process_service_worker_announced({'id': 1, 'worker': worker_1})
+        self.service.process_service_worker_announced({'id': 2, 'worker': worker_2})
+
+        best_workers = self.service.best_workers_by_service_by_qos_policy
+        self.assertListEqual(list(best_workers.keys()), ['cost=min'])
+        self.assertEqual(best_workers['cost=min']['ObjectDetection']['stream_key'], 'worker-2')
+
+    def test_process_service_worker_announced_demotes_best_worker_when_reannounced_worse(self):
+        worker_1 = {'stream_key': 'worker-1', 'service_type': 'ObjectDetection', 'throughput': 10}
+        worker_2 = {'stream_key': 'worker-2', 'service_type': 'ObjectDetection', 'throughput': 20}
+        self.service.process_service_worker_announced({'id': 1, 'worker': worker_1})
+        self.service.process_service_worker_announced({'id': 2, 'worker': worker_2})
+        worker_2_slower = {'stream_key': 'worker-2', 'service_type': 'ObjectDetection', 'throughput': 5}
+        self.service.process_service_worker_announced({'id': 3, 'worker': worker_2_slower})
+
+        best_workers = self.service.best_workers_by_service_by_qos_policy
+        self.assertEqual(best_workers['latency=min']['ObjectDetection']['stream_key'], 'worker-1')
+
+    def test_process_service_worker_announced_skips_worker_without_qos_policy_attribute(self):
+        worker_1 = {'stream_key': 'worker-1', 'service_type': 'ObjectDetection', 'accuracy': 0.9}
+        self.service.process_service_worker_announced({'id': 1, 'worker': worker_1})
+
+        best_workers = self.service.best_workers_by_service_by_qos_policy
+        self.assertNotIn('ObjectDetection', best_workers.get('latency=min', {}))
+        self.assertEqual(best_workers['accuracy=max']['ObjectDetection']['stream_key'], 'worker-1')
+
+    def test_workers_missing_from_monitoring_are_removed_from_best_workers(self):
+        for stream_key, throughput in [('worker-1', 10), ('worker-2', 20)]:
+            self.service.process_service_worker_announced({'worker': {
+                'stream_key': stream_key, 'service_type': 'ObjectDetection', 'throughput': throughput}})
+        service_workers = {
+            'ObjectDetection': {
+                'workers': {
+                    'worker-1': {'stream_key': 'worker-1', 'throughput': 10, 'queue_size': 3},
+                    'worker-2': {'stream_key': 'worker-2', 'throughput': 20, 'queue_size': 5},
+                },
+                'total_number_workers': 2
+            }
+        }
+        self.service.verify_service_worker_best_idle(service_workers)
+        best_workers = self.service.best_workers_by_service_by_qos_policy
+        self.assertEqual(best_workers['latency=min']['ObjectDetection']['stream_key'], 'worker-2')
+
+        del service_workers['ObjectDetection']['workers']['worker-2']
+        self.service.verify_service_worker_best_idle(service_workers)
+
+        self.assertEqual(best_workers['latency=min']['ObjectDetection']['stream_key'], 'worker-1')
+        self.assertNotIn('worker-2', self.service.current_service_workers['ObjectDetection']['workers'])
+        self.assertSetEqual(self.service.get_best_worker_keys('ObjectDetection'), {'worker-1'})
+
+    def test_verify_service_workers_overloaded_only_reevaluates_changed_workers(self):
+        workers = {
+            'worker-1': {'stream_key': 'worker-1', 'service_type': 'ObjectDetection', 'throughput': 10, 'queue_size': 90},
+            'worker-2': {'stream_key': 'worker-2', 'service_type': 'ObjectDetection', 'throughput': 10, 'queue_size': 5},
+        }
+        event_data = {
+            'service_workers': {
+                'ObjectDetection': {'workers': workers, 'total_number_workers': 2}
+            }
+        }
+        self.assertListEqual(self.service.verify_service_workers_overloaded(event_data), ['worker-1'])
+
+        workers['worker-2'] = dict(workers['worker-2'], queue_size=95)
+        with patch.object(
+                self.service, '_is_service_worker_overloaded',
+                wraps=self.service._is_service_worker_overloaded) as mocked_is_overloaded:
+            overloaded_workers = self.service.verify_service_workers_overloaded(event_data)
+
+        worker_2_state = self.service.worker_states_per_type['ObjectDetection']['worker-2']
+        mocked_is_overloaded.assert_called_once_with(worker_2_state)
+        self.assertListEqual(overloaded_workers, ['worker-1', 'worker-2'])
+
+    def test_verify_service_workers_overloaded_forgets_workers_missing_from_event(self):
+        workers = {
+            'worker-1': {'stream_key': 'worker-1', 'service_type': 'ObjectDetection', 'throughput': 10, 'queue_size': 90},
+        }
+        event_data = {
+            'service_workers': {
+                'ObjectDetection': {'workers': workers, 'total_number_workers': 1}
+            }
+        }
+        self.assertListEqual(self.service.verify_service_workers_overloaded(event_data), ['worker-1'])
+
+        event_data['service_workers']['ObjectDetection'] = {'workers': {}, 'total_number_workers': 0}
+        self.assertListEqual(self.service.verify_service_workers_overloaded(event_data), [])
+
+    def test_verify_service_worker_best_idle_uses_updated_idle_workers(self):
+        for stream_key, throughput in [('worker-1', 20), ('worker-2', 10)]:
+            self.service.process_service_worker_announced({'worker': {
+                'stream_key': stream_key, 'service_type': 'ObjectDetection', 'throughput': throughput}})
+        service_workers = {
+            'ObjectDetection': {
+                'workers': {
+                    'worker-1': {'stream_key': 'worker-1', 'queue_size': 3},
+                    'worker-2': {'stream_key': 'worker-2', 'queue_size': 5},
+                },
+                'total_number_workers': 2
+            }
+        }
+        self.assertFalse(self.service.verify_service_worker_best_idle(service_workers))
+
+        service_workers['ObjectDetection']['workers']['worker-1'] = {'stream_key': 'worker-1', 'queue_size': 0}
+        self.assertTrue(self.service.verify_service_worker_best_idle(service_workers))
+
+    def test_coalesce_service_workers_stream_monitored_events_keeps_latest_snapshot_per_service_type(self):
+        monitored_type = 'ServiceWorkersStreamMonitored'
+        announced_type = 'ServiceWorkerAnnounced'
+        events = [
+            (monitored_type, {'id': 1, 'service_workers': {
+                'OD': {'workers': {'w1': {'queue_size': 1}, 'w2': {'queue_size': 2}}, 'total_number_workers': 2},
+                'CD': {'workers': {'w4': {'queue_size': 4}}, 'total_number_workers': 1},
+            }}, 'm1'),
+            (announced_type, {'id': 2, 'worker': {'stream_key': 'w3'}}, 'a1'),
+            (monitored_type, {'id': 3, 'service_workers': {'OD': {
+                'workers': {'w1': {'queue_size': 10}}, 'total_number_workers': 1}}}, 'm2'),
+        ]
+
+        coalesced_events = self.service.coalesce_service_workers_stream_monitored_events(events)
+
+        self.assertEqual(len(coalesced_events), 2)
+        self.assertEqual(coalesced_events[0][0], announced_type)
+        event_type, event_data, json_msg = coalesced_events[1]
+        self.assertEqual(event_type, monitored_type)
+        self.assertEqual(event_data['id'], 3)
+        self.assertEqual(json_msg, 'm2')
+        self.assertDictEqual(event_data['service_workers'], {
+            'OD': {'workers': {'w1': {'queue_size': 10}}, 'total_number_workers': 1},
+            'CD': {'workers': {'w4': {'queue_size': 4}}, 'total_number_workers': 1},
+        })
+
+    @patch('adaptation_analyser.service.AdaptationAnalyser.process_event_type')
+    def test_process_cmd_batch_processes_events_in_stream_id_order_with_coalesced_monitoring(self, mocked_process_event_type):
+        mocked_process_event_type.__name__ = 'process_event_type'
+        monitored_type = 'ServiceWorkersStreamMonitored'
+        announced_type = 'ServiceWorkerAnnounced'
+        monitored_1 = {'id': 1, 'service_workers': {'OD': {'workers': {'w1': {'queue_size': 1}}}}}
+        announced = {'id': 2, 'worker': {'stream_key': 'w2'}}
+        monitored_2 = {'id': 3, 'service_workers': {'OD': {'workers': {'w2': {'queue_size': 2}}}}}
+        announced_2 = {'id': 4, 'worker': {'stream_key': 'w3'}}
+        self.service.cmd_batch_size = 2
+        self.service.service_cmd.mocked_values_dict = {
+            monitored_type.encode('utf-8'): [
+                ('1-0', prepare_event_msg_tuple(monitored_1)[1]),
+                ('3-0', prepare_event_msg_tuple(monitored_2)[1]),
+            ],
+            announced_type.encode('utf-8'): [
+                ('2-0', prepare_event_msg_tuple(announced)[1]),
+                ('4-0', prepare_event_msg_tuple(announced_2)[1]),
+            ],
+        }
+
+        self.service.process_cmd_batch()
+
+        called = [
+            (c[1]['event_type'], c[1]['event_data']['id']) for c in mocked_process_event_type.call_args_list
+        ]
+        self.assertListEqual(called, [(announced_type, 2), (monitored_type, 3), (announced_type, 4)])
+        coalesced_event_data = mocked_process_event_type.call_args_list[1][1]['event_data']
+        self.assertListEqual(list(coalesced_event_data['service_workers']['OD']['workers'].keys()), ['w2'])
+
+    def test_publish_event_type_to_stream_buffers_events_when_publish_buffer_is_enabled(self):
+        self.service.publish_buffer = PipelinedPublishBuffer(max_size=2, max_latency=10)
+        event_type = 'NewQuerySchedulingPlanRequested'
+        pub_stream = self.service.pub_event_stream_map[event_type]
+        pub_stream.write_events = MagicMock()
+
+        self.service.process_query_created({'id': 1})
+        self.assertFalse(pub_stream.write_events.called)
+        self.assertEqual(len(self.service.publish_buffer), 1)
+
+        self.service.process_query_created({'id': 2})
+        self.assertEqual(pub_stream.write_events.call_count, 2)
+        self.assertEqual(len(self.service.publish_buffer), 0)
+
+    def test_process_event_type_records_handler_latency(self):
+        handler_labels = {'handler': 'process_query_created'}
+        count_before = self.get_metric_value('adaptation_analyser_handler_latency_seconds_count', handler_labels)
+
+        self.service.process_event_type(LISTEN_EVENT_TYPE_QUERY_CREATED, {'id': 1}, json_msg=None)
+
+        self.assertEqual(
+            self.get_metric_value('adaptation_analyser_handler_latency_seconds_count', handler_labels),
+            count_before + 1
+        )
+
+    def test_process_service_workers_stream_monitored_records_analysis_latency_and_triggers(self):
+        latency_name = 'adaptation_analyser_analysis_latency_seconds_count'
+        triggers_name = 'adaptation_analyser_analysis_triggers_total'
+        overloaded_labels = {'analysis': 'analyse_service_worker_overloaded'}
+        idle_labels = {'analysis': 'analyse_service_worker_best_idle'}
+        overloaded_count_before = self.get_metric_value(latency_name, overloaded_labels)
+        idle_count_before = self.get_metric_value(latency_name, idle_labels)
+        triggers_before = self.get_metric_value(triggers_name, overloaded_labels)
+        event_data = {
+            'id': 1,
+            'service_workers': {
+                'OD': {'workers': {'w1': {'stream_key': 'w1', 'service_type': 'OD', 'throughput': 1, 'queue_size': 100}}}
+            }
+        }
+
+        self.service.process_event_type(LISTEN_EVENT_TYPE_SERVICE_WORKERS_STREAM_MONITORED, event_data, json_msg=None)
+
+        self.assertEqual(self.get_metric_value(latency_name, overloaded_labels), overloaded_count_before + 1)
+        self.assertEqual(self.get_metric_value(triggers_name, overloaded_labels), triggers_before + 1)
+        # the overloaded plan request short-circuits the remaining analyses
+        self.assertEqual(self.get_metric_value(latency_name, idle_labels), idle_count_before)
+
+    @patch('adaptation_analyser.service.dump_metrics_to_file')
+    def test_log_state_dumps_metrics_file_once_per_interval(self, mocked_dump):
+        self.service.metrics_dump_file = 'metrics.prom'
+        self.service.metrics_dump_interval = 60
+
+        self.service.log_state()
+        self.service.log_state()
+
+        mocked_dump.assert_called_once_with('metrics.prom')
+
+    def test_process_event_type_records_first_event_startup_phase_once(self):
+        self.service.process_start_time = 0
+        with patch.object(self.service, 'record_startup_phase') as mocked_record_startup_phase:
+            self.service.process_event_type(LISTEN_EVENT_TYPE_QUERY_CREATED, {'id': 1}, json_msg=None)
+            self.service.process_event_type(LISTEN_EVENT_TYPE_QUERY_CREATED, {'id': 2}, json_msg=None)
+
+        mocked_record_startup_phase.assert_called_once_with('first_event')
+
+    def test_record_startup_phase_sets_startup_gauge(self):
+        seconds = self.service.record_startup_phase('some_phase')
+
+        self.assertGreaterEqual(seconds, 0)
+        self.assertEqual(self.get_metric_value('adaptation_analyser_startup_seconds', {'phase': 'some_phase'}), seconds)
+
+    def test_importing_service_doesnt_load_the_uncertainty_subsystem(self):
+        code = (
+            'import sys, adaptation_analyser.service; '
+            'print(",".join(m for m in ("numpy", "skfuzzy", "matplotlib") if m in sys.modules))'
+        )
+        output = subprocess.check_output([sys.executable, '-c', code]).decode('utf-8').strip()
+
+        self.assertEqual(output, '')
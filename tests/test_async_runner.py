@@ -0,0 +1,80 @@
+import asyncio
+import time
+from unittest import TestCase
+from unittest.mock import patch
+
+from adaptation_analyser.async_runner import AsyncAnalyserRunner, AsyncPublishQueue
+from adaptation_analyser.conf import (
+    LISTEN_EVENT_TYPE_SERVICE_WORKER_ANNOUNCED,
+    LISTEN_EVENT_TYPE_SERVICE_WORKERS_STREAM_MONITORED,
+    PUB_EVENT_TYPE_SERVICE_WORKER_OVERLOADED_PLAN_REQUESTED,
+)
+from adaptation_analyser.replay import ReplayClock, collect_published_events, prepare_replay_service
+
+
+class TestAsyncAnalyserRunner(TestCase):
+
+    def setUp(self):
+        self.clock = ReplayClock(start_timestamp=100)
+        self.service = prepare_replay_service(self.clock)
+        self.runner = AsyncAnalyserRunner(self.service, idle_read_wait=0.001)
+        self.worker = {
+            'stream_key': 'worker-1', 'service_type': 'ObjectDetection',
+            'throughput': 10, 'accuracy': 0.9, 'energy_consumption': 5,
+        }
+
+    def tearDown(self):
+        self.runner.shutdown()
+
+    def write_cmd_event(self, event_type, event_data):
+        stream = self.service.stream_factory.create(event_type)
+        stream.write_events(self.service.default_event_serializer(event_data))
+
+    def run_until_processed(self, number_of_events, timeout=5):
+        async def run_and_stop():
+            run_task = asyncio.ensure_future(self.runner.run_forever())
+            deadline = time.monotonic() + timeout
+            while self.runner.processed_events < number_of_events and time.monotonic() < deadline:
+                await asyncio.sleep(0.005)
+            self.runner.stop()
+            await asyncio.wait_for(run_task, timeout=timeout)
+
+        loop = asyncio.new_event_loop()
+        try:
+            loop.run_until_complete(run_and_stop())
+        finally:
+            loop.close()
+
+    def test_run_forever_analyses_and_publishes_change_request(self):
+        self.write_cmd_event(LISTEN_EVENT_TYPE_SERVICE_WORKER_ANNOUNCED, {'id': 'e1', 'worker': self.worker})
+        self.write_cmd_event(LISTEN_EVENT_TYPE_SERVICE_WORKERS_STREAM_MONITORED, {
+            'id': 'e2',
+            'service_workers': {
+                'ObjectDetection': {
+                    'workers': {'worker-1': dict(self.worker, queue_size=90)},
+                    'total_number_workers': 1
+                }
+            }
+        })
+
+        self.run_until_processed(2)
+
+        self.assertEqual(self.runner.processed_events, 2)
+        self.assertIsInstance(self.service.publish_buffer, AsyncPublishQueue)
+        self.assertEqual(self.service.publish_buffer.published_events, 1)
+        published_events = collect_published_events(self.service)[PUB_EVENT_TYPE_SERVICE_WORKER_OVERLOADED_PLAN_REQUESTED]
+        self.assertEqual(len(published_events), 1)
+        self.assertEqual(published_events[0]['change']['cause']['id'], 'e2')
+
+    def test_run_forever_stops_without_events(self):
+        self.run_until_processed(0)
+
+        self.assertEqual(self.runner.processed_batches, 0)
+        self.assertEqual(len(self.service.publish_buffer), 0)
+
+    @patch('adaptation_analyser.async_runner.AsyncAnalyserRunner.run')
+    def test_service_run_uses_async_runner_when_enabled(self, mocked_runner_run):
+        self.service.async_runner = True
+        self.service.run()
+
+        mocked_runner_run.assert_called_once()
@@ -0,0 +1,134 @@
+from unittest import TestCase
+
+from adaptation_analyser.best_worker_index import (
+    DEFAULT_QOS_POLICIES,
+    BestWorkerIndex,
+    QoSPolicyIndex,
+    parse_qos_policies,
+)
+from adaptation_analyser.worker_state import WorkerState
+
+
+class TestBestWorkerIndex(TestCase):
+
+    def setUp(self):
+        self.max_index = BestWorkerIndex(worker_policy_attr='throughput', worker_sort_sign=-1)
+        self.min_index = BestWorkerIndex(worker_policy_attr='energy_consumption', worker_sort_sign=1)
+
+    def test_best_worker_is_none_for_empty_index(self):
+        self.assertIsNone(self.max_index.best_worker())
+
+    def test_best_worker_returns_highest_value_for_max_index(self):
+        self.max_index.update_worker('w1', {'stream_key': 'w1', 'throughput': 10})
+        self.max_index.update_worker('w2', {'stream_key': 'w2', 'throughput': 30})
+        self.max_index.update_worker('w3', {'stream_key': 'w3', 'throughput': 20})
+
+        self.assertEqual(self.max_index.best_worker()['stream_key'], 'w2')
+
+    def test_best_worker_returns_lowest_value_for_min_index(self):
+        self.min_index.update_worker('w1', {'stream_key': 'w1', 'energy_consumption': 10})
+        self.min_index.update_worker('w2', {'stream_key': 'w2', 'energy_consumption': 5})
+
+        self.assertEqual(self.min_index.best_worker()['stream_key'], 'w2')
+
+    def test_best_worker_is_demoted_when_it_gets_worse(self):
+        self.max_index.update_worker('w1', {'stream_key': 'w1', 'throughput': 10})
+        self.max_index.update_worker('w2', {'stream_key': 'w2', 'throughput': 30})
+        self.max_index.update_worker('w2', {'stream_key': 'w2', 'throughput': 5})
+
+        best_worker = self.max_index.best_worker()
+        self.assertEqual(best_worker['stream_key'], 'w1')
+
+    def test_best_worker_is_replaced_when_removed(self):
+        self.max_index.update_worker('w1', {'stream_key': 'w1', 'throughput': 10})
+        self.max_index.update_worker('w2', {'stream_key': 'w2', 'throughput': 30})
+        self.max_index.remove_worker('w2')
+
+        self.assertEqual(self.max_index.best_worker()['stream_key'], 'w1')
+        self.assertEqual(len(self.max_index), 1)
+
+    def test_worker_without_policy_attr_is_removed(self):
+        self.max_index.update_worker('w1', {'stream_key': 'w1', 'throughput': 10})
+        self.max_index.update_worker('w1', {'stream_key': 'w1'})
+
+        self.assertIsNone(self.max_index.best_worker())
+
+    def test_ties_are_won_by_first_seen_worker(self):
+        self.max_index.update_worker('w1', {'stream_key': 'w1', 'throughput': 10})
+        self.max_index.update_worker('w2', {'stream_key': 'w2', 'throughput': 10})
+        self.max_index.update_worker('w1', {'stream_key': 'w1', 'throughput': 10})
+
+        self.assertEqual(self.max_index.best_worker()['stream_key'], 'w1')
+
+    def test_heap_is_compacted_after_many_updates(self):
+        for i in range(100):
+            self.max_index.update_worker('w1', {'stream_key': 'w1', 'throughput': i})
+
+        self.assertLessEqual(len(self.max_index.heap), 2 * len(self.max_index) + 16)
+        self.assertEqual(self.max_index.best_worker()['throughput'], 99)
+
+
+class TestParseQoSPolicies(TestCase):
+
+    def test_parses_attribute_and_direction(self):
+        query_qos_policies = parse_qos_policies(['latency=min:throughput:max', 'cost=min: cost :min'])
+
+        self.assertDictEqual(query_qos_policies, {
+            'latency=min': {'worker_policy_attr': 'throughput', 'worker_sort_sign': -1},
+            'cost=min': {'worker_policy_attr': 'cost', 'worker_sort_sign': 1},
+        })
+
+    def test_default_policies(self):
+        query_qos_policies = parse_qos_policies(DEFAULT_QOS_POLICIES)
+
+        self.assertEqual(query_qos_policies['energy_consumption=min']['worker_sort_sign'], 1)
+        self.assertEqual(query_qos_policies['accuracy=max']['worker_sort_sign'], -1)
+
+    def test_invalid_policy(self):
+        with self.assertRaises(ValueError):
+            parse_qos_policies(['latency=min:throughput'])
+        with self.assertRaises(ValueError):
+            parse_qos_policies(['latency=min:throughput:highest'])
+
+
+class TestQoSPolicyIndex(TestCase):
+
+    def setUp(self):
+        self.index = QoSPolicyIndex(parse_qos_policies([
+            'latency=min:throughput:max', 'throughput=max:throughput:max', 'cost=min:cost:min',
+        ]))
+
+    def test_policies_on_same_attribute_share_a_view(self):
+        self.assertEqual(len(self.index.views), 2)
+        self.assertIs(self.index.policy_views['latency=min'], self.index.policy_views['throughput=max'])
+
+        changed_best_workers = self.index.update_worker('w1', {'stream_key': 'w1', 'throughput': 10})
+
+        self.assertListEqual(sorted(changed_best_workers), ['latency=min', 'throughput=max'])
+
+    def test_best_workers_per_policy(self):
+        self.index.update_worker('w1', {'stream_key': 'w1', 'throughput': 10, 'cost': 3})
+        self.index.update_worker('w2', {'stream_key': 'w2', 'throughput': 20, 'cost': 5})
+
+        best_workers = self.index.best_workers()
+        self.assertEqual(best_workers['latency=min']['stream_key'], 'w2')
+        self.assertEqual(best_workers['throughput=max']['stream_key'], 'w2')
+        self.assertEqual(best_workers['cost=min']['stream_key'], 'w1')
+        self.assertSetEqual(self.index.best_worker_keys, {'w1', 'w2'})
+
+    def test_attributes_missing_from_worker_state_are_read_from_announced_worker(self):
+        worker = {'stream_key': 'w1', 'service_type': 'ServiceA', 'throughput': '10', 'cost': '3'}
+        worker_state = WorkerState.from_dict(worker)
+
+        self.index.update_worker('w1', worker, worker_state)
+
+        self.assertIs(self.index.best_worker('cost=min'), worker_state)
+        self.assertIs(self.index.best_worker('latency=min'), worker_state)
+
+    def test_remove_worker(self):
+        self.index.update_worker('w1', {'stream_key': 'w1', 'throughput': 10, 'cost': 3})
+
+        self.index.remove_worker('w1')
+
+        self.assertIsNone(self.index.best_worker('cost=min'))
+        self.assertSetEqual(self.index.best_worker_keys, set())
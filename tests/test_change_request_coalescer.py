@@ -0,0 +1,106 @@
+from unittest import TestCase
+
+from adaptation_analyser.change_request_coalescer import ChangeRequestCoalescer
+from adaptation_analyser.replay import ReplayClock, prepare_replay_service
+from adaptation_analyser.service import CHANGE_TYPES_PRIORITY
+
+
+class TestChangeRequestCoalescer(TestCase):
+
+    def setUp(self):
+        self.coalescer = ChangeRequestCoalescer(window=2, change_types_priority=CHANGE_TYPES_PRIORITY)
+
+    def test_is_due_after_window_since_first_trigger(self):
+        self.assertFalse(self.coalescer.is_due(0))
+
+        self.coalescer.add('ServiceWorkerBestIdlePlanRequested', {'ObjectDetection': ['worker-1']}, 10)
+
+        self.assertFalse(self.coalescer.is_due(11))
+        self.assertTrue(self.coalescer.is_due(12))
+
+    def test_pop_causes_merges_workers_with_most_urgent_cause_first(self):
+        self.coalescer.add('ServiceWorkerBestIdlePlanRequested', {'ObjectDetection': ['worker-1']}, 10)
+        self.coalescer.add('ServiceWorkerOverloadedPlanRequested', {'ColorDetection': ['worker-2']}, 11)
+        self.coalescer.add('ServiceWorkerOverloadedPlanRequested', {'ColorDetection': ['worker-2', 'worker-3']}, 12)
+
+        change_type, causes = self.coalescer.pop_causes()
+
+        self.assertEqual(change_type, 'ServiceWorkerOverloadedPlanRequested')
+        self.assertListEqual(causes, [
+            {'type': 'ServiceWorkerOverloadedPlanRequested', 'workers': {'ColorDetection': ['worker-2', 'worker-3']}},
+            {'type': 'ServiceWorkerBestIdlePlanRequested', 'workers': {'ObjectDetection': ['worker-1']}},
+        ])
+        self.assertEqual(len(self.coalescer), 0)
+        self.assertFalse(self.coalescer.is_due(20))
+        self.assertEqual(self.coalescer.coalesced_requests, 1)
+
+
+class TestAdaptationAnalyserCoalescedChangeRequests(TestCase):
+
+    def setUp(self):
+        self.clock = ReplayClock(start_timestamp=100)
+
+    def prepare_service(self, **service_kwargs):
+        service = prepare_replay_service(self.clock, coalesce_change_requests=True, **service_kwargs)
+        for stream_key, throughput in [('worker-3', 20), ('worker-4', 5)]:
+            service.process_service_worker_announced({'worker': {
+                'stream_key': stream_key, 'service_type': 'ColorDetection', 'throughput': throughput,
+                'accuracy': 0.9, 'energy_consumption': 10,
+            }})
+        return service
+
+    def monitor(self, service, object_detection_queue_size):
+        self.clock.advance(1)
+        return service.analyse_service_workers_stream_monitored({
+            'id': f'monitoring-{self.clock.timestamp()}',
+            'service_workers': {
+                'ObjectDetection': {
+                    'workers': {'worker-1': {
+                        'stream_key': 'worker-1', 'service_type': 'ObjectDetection',
+                        'throughput': 10, 'queue_size': object_detection_queue_size}},
+                    'total_number_workers': 1
+                },
+                'ColorDetection': {
+                    'workers': {
+                        'worker-3': {'stream_key': 'worker-3', 'throughput': 20, 'queue_size': 0},
+                        'worker-4': {'stream_key': 'worker-4', 'throughput': 5, 'queue_size': 5},
+                    },
+                    'total_number_workers': 2
+                },
+            }
+        })
+
+    def test_overloaded_and_best_idle_are_sent_in_a_single_request(self):
+        service = self.prepare_service()
+
+        result = self.monitor(service, 80)
+
+        self.assertEqual(result['change']['type'], 'ServiceWorkerOverloadedPlanRequested')
+        self.assertListEqual(result['change']['causes'], [
+            {'type': 'ServiceWorkerOverloadedPlanRequested', 'workers': {'ObjectDetection': ['worker-1']}},
+            {'type': 'ServiceWorkerBestIdlePlanRequested', 'workers': {'ColorDetection': ['worker-3']}},
+        ])
+
+    def test_triggers_within_window_are_held_until_due(self):
+        service = self.prepare_service(coalesce_window=2)
+
+        self.assertIsNone(self.monitor(service, 10))
+        self.assertIsNone(self.monitor(service, 80))
+
+        result = self.monitor(service, 90)
+        self.assertListEqual(
+            [cause['type'] for cause in result['change']['causes']],
+            ['ServiceWorkerOverloadedPlanRequested', 'ServiceWorkerBestIdlePlanRequested']
+        )
+
+    def test_throttle_only_counts_the_sent_request(self):
+        service = self.prepare_service(
+            coalesce_window=2, change_request_min_interval=0,
+            change_request_bucket_size=2, change_request_bucket_refill_rate=0)
+
+        self.assertIsNone(self.monitor(service, 80))
+        self.assertIsNone(self.monitor(service, 90))
+        self.assertIsNotNone(self.monitor(service, 90))
+
+        self.assertEqual(service.change_request_throttle.allowed, 1)
+        self.assertEqual(service.change_request_throttle.suppressed, 0)
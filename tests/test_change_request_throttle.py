@@ -0,0 +1,108 @@
+from unittest import TestCase
+
+from prometheus_client import REGISTRY
+
+from adaptation_analyser.change_request_throttle import ChangeRequestThrottle, TokenBucket
+from adaptation_analyser.replay import ReplayClock, prepare_replay_service
+
+
+class TestTokenBucket(TestCase):
+
+    def test_refills_up_to_size(self):
+        bucket = TokenBucket(size=2, refill_rate=0.5, timestamp=0)
+        bucket.consume()
+        bucket.consume()
+        self.assertFalse(bucket.has_token(1))
+
+        self.assertTrue(bucket.has_token(2))
+        self.assertTrue(bucket.has_token(100))
+        self.assertEqual(bucket.tokens, 2)
+
+
+class TestChangeRequestThrottle(TestCase):
+
+    def setUp(self):
+        self.throttle = ChangeRequestThrottle(bucket_size=1, refill_rate=0.1)
+
+    def test_suppresses_when_all_service_types_are_out_of_tokens(self):
+        self.assertTrue(self.throttle.allow('Overloaded', ['ObjectDetection'], 0))
+        self.assertFalse(self.throttle.allow('Overloaded', ['ObjectDetection'], 1))
+        self.assertTrue(self.throttle.allow('Overloaded', ['ObjectDetection'], 10))
+
+        self.assertEqual(self.throttle.allowed, 2)
+        self.assertEqual(self.throttle.suppressed, 1)
+
+    def test_buckets_are_per_change_type_and_service_type(self):
+        self.assertTrue(self.throttle.allow('Overloaded', ['ObjectDetection'], 0))
+
+        self.assertTrue(self.throttle.allow('BestIdle', ['ObjectDetection'], 0))
+        self.assertTrue(self.throttle.allow('Overloaded', ['ColorDetection'], 0))
+        self.assertTrue(self.throttle.allow('Overloaded', ['ObjectDetection', 'GraphDetection'], 0))
+        self.assertFalse(self.throttle.allow('Overloaded', ['ObjectDetection', 'GraphDetection'], 0))
+
+
+class TestAdaptationAnalyserChangeRequestThrottling(TestCase):
+
+    def setUp(self):
+        self.clock = ReplayClock(start_timestamp=100)
+        self.worker = {'stream_key': 'worker-1', 'service_type': 'ObjectDetection', 'throughput': 10}
+
+    def monitor_queue_size(self, service, queue_size, advance=1):
+        self.clock.advance(advance)
+        return service.analyse_service_workers_stream_monitored({
+            'id': f'monitoring-{queue_size}',
+            'service_workers': {
+                'ObjectDetection': {
+                    'workers': {'worker-1': dict(self.worker, queue_size=queue_size)},
+                    'total_number_workers': 1
+                }
+            }
+        })
+
+    def test_overloaded_worker_recovers_only_below_exit_percentage(self):
+        service = prepare_replay_service(self.clock, overloaded_exit_percentage=0.5)
+
+        self.assertIsNotNone(self.monitor_queue_size(service, 80))
+        self.monitor_queue_size(service, 60)
+        self.assertListEqual(service.overloaded_workers, ['worker-1'])
+
+        self.monitor_queue_size(service, 40)
+        self.assertListEqual(service.overloaded_workers, [])
+
+    def test_overloaded_enter_percentage_is_configurable(self):
+        service = prepare_replay_service(
+            self.clock, overloaded_enter_percentage=0.9, overloaded_exit_percentage=0.5)
+
+        self.assertIsNone(self.monitor_queue_size(service, 80))
+        self.assertIsNotNone(self.monitor_queue_size(service, 90))
+        self.monitor_queue_size(service, 60)
+        self.assertListEqual(service.overloaded_workers, ['worker-1'])
+
+    def test_overloaded_exit_percentage_above_enter_percentage_is_invalid(self):
+        with self.assertRaises(ValueError):
+            prepare_replay_service(self.clock, overloaded_enter_percentage=0.6, overloaded_exit_percentage=0.7)
+
+    def test_min_interval_is_configurable(self):
+        service = prepare_replay_service(self.clock, change_request_min_interval=10)
+        service.process_scheduling_plan_executed({'plan': {'change_request': {
+            'type': 'ServiceWorkerOverloadedPlanRequested', 'timestamp': self.clock.timestamp()}}})
+
+        self.assertIsNone(self.monitor_queue_size(service, 80, advance=5))
+        self.assertIsNotNone(self.monitor_queue_size(service, 90, advance=5))
+
+    def test_token_bucket_suppresses_repeated_overloaded_requests(self):
+        service = prepare_replay_service(
+            self.clock, change_request_min_interval=0, change_request_bucket_size=1,
+            change_request_bucket_refill_rate=0.1)
+        change_type = 'ServiceWorkerOverloadedPlanRequested'
+        before = REGISTRY.get_sample_value(
+            'adaptation_analyser_change_requests_suppressed_total', {'change_type': change_type}) or 0
+
+        self.assertIsNotNone(self.monitor_queue_size(service, 80))
+        self.assertIsNone(self.monitor_queue_size(service, 90))
+        self.assertIsNotNone(self.monitor_queue_size(service, 100, advance=10))
+
+        after = REGISTRY.get_sample_value(
+            'adaptation_analyser_change_requests_suppressed_total', {'change_type': change_type})
+        self.assertEqual(after - before, 1)
+        self.assertEqual(service.change_request_throttle.suppressed, 1)
@@ -0,0 +1,118 @@
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from adaptation_analyser.uncertainty.fis_cache import FISCache
+from adaptation_analyser.uncertainty.ua_analysis import UAServiceAnalysis
+
+
+class TestFISCache(TestCase):
+
+    def setUp(self):
+        self.fis_cache = FISCache(max_entries=2, max_bytes=100)
+
+    def test_get_returns_none_and_counts_miss_for_unknown_key(self):
+        self.assertIsNone(self.fis_cache.get('a'))
+        self.assertEqual(self.fis_cache.misses, 1)
+
+    def test_put_evicts_least_recently_used_entry_when_over_max_entries(self):
+        self.fis_cache.put('a', 'A', 10)
+        self.fis_cache.put('b', 'B', 10)
+        self.fis_cache.get('a')
+        self.fis_cache.put('c', 'C', 10)
+
+        self.assertIn('a', self.fis_cache)
+        self.assertNotIn('b', self.fis_cache)
+        self.assertIn('c', self.fis_cache)
+        self.assertEqual(self.fis_cache.evictions, 1)
+        self.assertEqual(self.fis_cache.total_bytes, 20)
+
+    def test_put_evicts_entries_when_over_max_bytes(self):
+        self.fis_cache.put('a', 'A', 60)
+        self.fis_cache.put('b', 'B', 60)
+
+        self.assertNotIn('a', self.fis_cache)
+        self.assertIn('b', self.fis_cache)
+        self.assertEqual(self.fis_cache.total_bytes, 60)
+
+    def test_put_keeps_newest_entry_even_if_over_max_bytes(self):
+        self.fis_cache.put('a', 'A', 500)
+
+        self.assertIn('a', self.fis_cache)
+        self.assertEqual(len(self.fis_cache), 1)
+
+
+class TestUAServiceAnalysisWithFISCache(TestCase):
+
+    def setUp(self):
+        self.parent_service = MagicMock()
+        self.parent_service.adaptation_delta = 10
+        self.fis_cache = FISCache()
+
+    def initialize_ua_analysis(self, service_type, normalized_universe_size=101, fis_cache=None):
+        return UAServiceAnalysis(
+            self.parent_service, service_type, normalized_universe_size=normalized_universe_size,
+            fis_cache=fis_cache if fis_cache is not None else self.fis_cache, fis_snapshot_store=None)
+
+    def test_service_types_with_different_capacities_share_normalized_fis(self):
+        ua_analysis_a = self.initialize_ua_analysis('ServiceA')
+        ua_analysis_b = self.initialize_ua_analysis('ServiceB')
+
+        ua_analysis_a.setup_from_workers({'worker1': {'throughput': 81}})
+        ua_analysis_b.setup_from_workers({'worker2': {'throughput': 1.5}})
+
+        self.assertEqual(ua_analysis_a.sw_max_cap, 810)
+        self.assertEqual(ua_analysis_b.sw_max_cap, 15)
+        self.assertEqual(ua_analysis_b.service_universe_scale, 1 / 15)
+        self.assertIs(ua_analysis_a.fis, ua_analysis_b.fis)
+        self.assertEqual(self.fis_cache.hits, 1)
+        self.assertEqual(len(self.fis_cache), 1)
+
+    def test_throughput_increase_does_not_rebuild_normalized_fis(self):
+        ua_analysis = self.initialize_ua_analysis('ServiceA')
+        ua_analysis.setup_from_workers({'worker1': {'throughput': 81}})
+        fis = ua_analysis.fis
+
+        ua_analysis.setup_from_workers({'worker1': {'throughput': 150}})
+
+        self.assertEqual(ua_analysis.sw_max_cap, 1500)
+        self.assertEqual(ua_analysis.service_universe_scale, 1 / 1500)
+        self.assertIs(ua_analysis.fis, fis)
+        self.assertEqual(self.fis_cache.misses, 1)
+
+    def test_raw_universe_builds_fis_per_capacity(self):
+        ua_analysis = self.initialize_ua_analysis('ServiceA', normalized_universe_size=0)
+        ua_analysis.setup_from_workers({'worker1': {'throughput': 81}})
+        fis = ua_analysis.fis
+
+        ua_analysis.setup_from_workers({'worker1': {'throughput': 81.5}})
+
+        self.assertEqual(ua_analysis.fis_max_cap, 815)
+        self.assertIsNot(ua_analysis.fis, fis)
+        self.assertEqual(len(self.fis_cache), 2)
+
+    def test_shared_normalized_fis_matches_fis_built_for_the_capacity(self):
+        self.initialize_ua_analysis('ServiceA').setup_from_workers({'worker1': {'throughput': 100}})
+
+        for throughput, usage_inputs in [(1.5, [(15, 15), (1, 15), (7, 10)]), (12, [(60, 120), (30, 50)])]:
+            ua_analysis = self.initialize_ua_analysis('ServiceB')
+            ua_analysis.setup_from_workers({'worker1': {'throughput': throughput}})
+            raw_ua_analysis = self.initialize_ua_analysis(
+                'ServiceB', normalized_universe_size=0, fis_cache=FISCache())
+            raw_ua_analysis.setup_from_workers({'worker1': {'throughput': throughput}})
+
+            self.assertIs(ua_analysis.fis, self.fis_cache.get(ua_analysis.get_fis_cache_key())['fis'])
+            for queue_size, max_capacity in usage_inputs:
+                self.assertAlmostEqual(
+                    ua_analysis.simulate_worker_usage(queue_size, max_capacity),
+                    raw_ua_analysis.simulate_worker_usage(queue_size, max_capacity), places=6)
+                self.assertAlmostEqual(
+                    ua_analysis.calculate_worker_usage(queue_size, max_capacity),
+                    raw_ua_analysis.calculate_worker_usage(queue_size, max_capacity), delta=0.5)
+
+    def test_calculate_worker_usage_clips_inputs_to_service_type_max_cap(self):
+        ua_analysis = self.initialize_ua_analysis('ServiceA')
+        ua_analysis.setup_from_workers({'worker1': {'throughput': 85.5}})
+
+        usage = ua_analysis.calculate_worker_usage(queue_size=900, max_capacity=900)
+        clipped_usage = ua_analysis.calculate_worker_usage(queue_size=855, max_capacity=855)
+        self.assertEqual(usage, clipped_usage)
@@ -0,0 +1,101 @@
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+import numpy as np
+
+from adaptation_analyser.conf import MF_LABELS
+from adaptation_analyser.uncertainty.fis_cache import FISCache
+from adaptation_analyser.uncertainty.fis_snapshot import FISSnapshotStore
+from adaptation_analyser.uncertainty.ua_analysis import UAServiceAnalysis
+
+
+class TestFISSnapshotStore(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.snapshot_store = FISSnapshotStore(self.tmp_dir.name)
+        self.state = {
+            'service_universe': np.arange(0, 11),
+            'service_universe_scale': 1,
+            'usage_table': None,
+            'usage_mfs': {label: np.full(3, i, dtype=np.float64) for i, label in enumerate(MF_LABELS)},
+        }
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_load_returns_none_for_missing_snapshot(self):
+        self.assertIsNone(self.snapshot_store.load(('a', 1), MF_LABELS))
+        self.assertEqual(self.snapshot_store.misses, 1)
+
+    def test_saved_snapshot_is_loaded_memory_mapped(self):
+        self.assertTrue(self.snapshot_store.save(('a', 1), self.state, MF_LABELS))
+
+        state = self.snapshot_store.load(('a', 1), MF_LABELS)
+
+        self.assertIsInstance(state['service_universe'], np.memmap)
+        np.testing.assert_array_equal(state['service_universe'], self.state['service_universe'])
+        self.assertEqual(state['service_universe_scale'], 1)
+        self.assertIsNone(state['usage_table'])
+        self.assertListEqual(list(state['usage_mfs'].keys()), MF_LABELS)
+        np.testing.assert_array_equal(state['usage_mfs']['medium'], self.state['usage_mfs']['medium'])
+
+    def test_save_keeps_existing_snapshot(self):
+        self.snapshot_store.save(('a', 1), self.state, MF_LABELS)
+
+        self.assertFalse(self.snapshot_store.save(('a', 1), self.state, MF_LABELS))
+        self.assertEqual(self.snapshot_store.saves, 1)
+        self.assertListEqual(os.listdir(self.tmp_dir.name), ['a-1'])
+
+
+class TestUAServiceAnalysisWithFISSnapshot(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.snapshot_store = FISSnapshotStore(self.tmp_dir.name)
+        self.parent_service = MagicMock()
+        self.parent_service.adaptation_delta = 10
+        self.workers = {'worker1': {'throughput': 81}}
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def initialize_ua_analysis(self):
+        # a fresh in-memory cache per analysis, as after a restart
+        return UAServiceAnalysis(
+            self.parent_service, 'ServiceA', fis_cache=FISCache(), fis_snapshot_store=self.snapshot_store)
+
+    def test_restarted_analysis_loads_snapshot_instead_of_building_fis(self):
+        built_ua_analysis = self.initialize_ua_analysis()
+        built_ua_analysis.setup_from_workers(self.workers)
+
+        ua_analysis = self.initialize_ua_analysis()
+        ua_analysis.setup_from_workers(self.workers)
+
+        self.assertEqual(self.snapshot_store.saves, 1)
+        self.assertEqual(self.snapshot_store.hits, 1)
+        self.assertIsNone(ua_analysis.fis)
+        self.assertIsInstance(ua_analysis.usage_table, np.memmap)
+        self.assertEqual(
+            ua_analysis.calculate_worker_usage(300, 500), built_ua_analysis.calculate_worker_usage(300, 500))
+
+    def test_simulation_is_rebuilt_when_needed_after_loading_snapshot(self):
+        self.initialize_ua_analysis().setup_from_workers(self.workers)
+        ua_analysis = self.initialize_ua_analysis()
+        ua_analysis.setup_from_workers(self.workers)
+
+        usage = ua_analysis.simulate_worker_usage(300, 500)
+
+        self.assertIsNotNone(ua_analysis.sim)
+        self.assertAlmostEqual(usage, ua_analysis.infer_workers_usage(300, 500), places=1)
+
+    def test_snapshot_key_depends_on_adaptation_delta(self):
+        self.initialize_ua_analysis().setup_from_workers(self.workers)
+        self.parent_service.adaptation_delta = 5
+
+        self.initialize_ua_analysis().setup_from_workers({'worker1': {'throughput': 162}})
+
+        self.assertEqual(self.snapshot_store.hits, 0)
+        self.assertEqual(self.snapshot_store.saves, 2)
@@ -0,0 +1,150 @@
+from unittest import TestCase
+
+from adaptation_analyser.load_shedding_index import LoadSheddingDataflowIndex, filter_dataflow_choices_with_load_shedding
+from adaptation_analyser.replay import ReplayClock, prepare_replay_service
+
+
+DATAFLOW_CHOICES = [
+    [0.5, 'choice-1', [['worker-1'], ['worker-2']]],
+    [0.2, 'choice-2', [['worker-3'], ['worker-2']]],
+    [0.0, 'choice-3', [['worker-4']]],
+]
+
+
+def build_plan(strategy_name='single_best_load_shedding', dataflow_choices=DATAFLOW_CHOICES):
+    return {
+        'change_request': {'type': 'ServiceWorkerOverloadedPlanRequested'},
+        'execution_plan': {'strategy': {'name': strategy_name, 'dataflows': dataflow_choices}},
+    }
+
+
+class TestLoadSheddingDataflowIndex(TestCase):
+
+    def setUp(self):
+        self.index = LoadSheddingDataflowIndex.from_plan(build_plan())
+
+    def test_filter_dataflow_choices_with_load_shedding(self):
+        self.assertListEqual(filter_dataflow_choices_with_load_shedding(DATAFLOW_CHOICES), DATAFLOW_CHOICES[:2])
+
+    def test_indexes_load_shedding_dataflows_by_worker(self):
+        self.assertEqual(len(self.index), 2)
+        self.assertListEqual(self.index.worker_dataflows['worker-2'], [0, 1])
+        self.assertNotIn('worker-4', self.index.worker_dataflows)
+
+    def test_load_shedding_without_overloaded_workers_is_unnecessary(self):
+        self.index.update_overloaded_workers({})
+
+        self.assertTrue(self.index.has_unnecessary_load_shedding())
+
+    def test_dataflow_without_overloaded_workers_is_unnecessary(self):
+        self.index.update_overloaded_workers({'worker-1': True})
+        self.assertTrue(self.index.has_unnecessary_load_shedding())
+        self.assertListEqual(self.index.get_unnecessary_dataflows(), [['worker-3', 'worker-2']])
+
+        self.index.update_overloaded_workers({'worker-2': True})
+        self.assertFalse(self.index.has_unnecessary_load_shedding())
+
+        self.index.update_overloaded_workers({'worker-1': False, 'worker-2': False, 'worker-3': True})
+        self.assertTrue(self.index.has_unnecessary_load_shedding())
+        self.assertListEqual(self.index.get_unnecessary_dataflows(), [['worker-1', 'worker-2']])
+
+    def test_repeated_verdicts_do_not_change_counts(self):
+        self.index.update_overloaded_workers({'worker-2': True})
+        self.index.update_overloaded_workers({'worker-2': True, 'worker-4': False})
+
+        self.assertListEqual(self.index.overloaded_counts, [1, 1])
+        self.index.update_overloaded_workers({'worker-2': False})
+        self.assertSetEqual(self.index.overloaded_workers, set())
+        self.assertTrue(self.index.has_unnecessary_load_shedding())
+
+    def test_not_load_shedding_strategy(self):
+        index = LoadSheddingDataflowIndex.from_plan(build_plan(strategy_name='single_best'))
+        index.update_overloaded_workers({})
+
+        self.assertFalse(index.has_unnecessary_load_shedding())
+        self.assertFalse(LoadSheddingDataflowIndex.from_plan(None).has_unnecessary_load_shedding())
+
+
+class TestAdaptationAnalyserUnnecessaryLoadShedding(TestCase):
+
+    def setUp(self):
+        self.clock = ReplayClock(start_timestamp=100)
+        self.service = prepare_replay_service(self.clock)
+
+    def monitor(self, queue_sizes):
+        self.clock.advance(1)
+        return self.service.analyse_service_workers_stream_monitored({
+            'id': f'monitoring-{self.clock.timestamp()}',
+            'service_workers': {
+                'ObjectDetection': {
+                    'workers': {
+                        stream_key: {'stream_key': stream_key, 'throughput': 10, 'queue_size': queue_size}
+                        for stream_key, queue_size in queue_sizes.items()
+                    },
+                    'total_number_workers': len(queue_sizes)
+                }
+            }
+        })
+
+    def test_requests_plan_when_overload_is_gone_from_shedding_dataflow(self):
+        plan = build_plan()
+        plan['change_request']['timestamp'] = self.clock.timestamp()
+        self.service.process_scheduling_plan_executed({'plan': plan})
+        self.assertIs(self.service.current_plan, plan)
+
+        # the overloaded analysis is skipped right after an overloaded plan, the verdicts are still updated
+        self.assertIsNone(self.monitor({'worker-1': 5, 'worker-2': 90, 'worker-3': 5}))
+
+        result = self.monitor({'worker-1': 5, 'worker-2': 5, 'worker-3': 5})
+        self.assertEqual(result['change']['type'], 'UnnecessaryLoadSheddingPlanRequested')
+
+    def test_disabled(self):
+        self.service.unnecessary_load_shedding_analysis = False
+        self.service.process_scheduling_plan_executed({'plan': build_plan()})
+
+        self.assertIsNone(self.monitor({'worker-1': 5}))
+
+    def test_new_plan_index_starts_from_current_overloaded_workers(self):
+        self.monitor({'worker-1': 5, 'worker-2': 90, 'worker-3': 5})
+        plan = build_plan()
+        plan['change_request']['timestamp'] = self.clock.timestamp()
+        self.service.process_scheduling_plan_executed({'plan': plan})
+
+        self.assertSetEqual(self.service.load_shedding_index.overloaded_workers, {'worker-2'})
+        self.assertIsNone(self.monitor({'worker-1': 5, 'worker-2': 90, 'worker-3': 5}))
+
+        result = self.monitor({'worker-1': 5, 'worker-2': 5, 'worker-3': 5})
+        self.assertEqual(result['change']['type'], 'UnnecessaryLoadSheddingPlanRequested')
+
+    def prepare_recovered_load_shedding(self, **service_kwargs):
+        self.service = prepare_replay_service(self.clock, change_request_min_interval=0, **service_kwargs)
+        plan = build_plan()
+        plan['change_request']['timestamp'] = self.clock.timestamp()
+        self.service.process_scheduling_plan_executed({'plan': plan})
+        self.monitor({'worker-1': 5, 'worker-2': 90, 'worker-3': 5})
+
+    def test_request_affects_workers_of_unnecessary_dataflows(self):
+        self.prepare_recovered_load_shedding(change_request_bucket_size=1, change_request_bucket_refill_rate=0)
+
+        self.assertIsNotNone(self.monitor({'worker-1': 5, 'worker-2': 5, 'worker-3': 5}))
+        self.assertDictEqual(
+            self.service.get_change_request_affected_workers('UnnecessaryLoadSheddingPlanRequested'),
+            {'ObjectDetection': ['worker-1', 'worker-2', 'worker-3']}
+        )
+        self.assertIsNone(self.monitor({'worker-1': 5, 'worker-2': 5, 'worker-3': 4}))
+        self.assertEqual(self.service.change_request_throttle.suppressed, 1)
+
+    def test_coalesced_request_is_throttled_by_its_workers_service_types(self):
+        self.prepare_recovered_load_shedding(
+            coalesce_change_requests=True, change_request_bucket_size=5, change_request_bucket_refill_rate=0)
+        allowed_before = self.service.change_request_throttle.allowed
+
+        result = self.monitor({'worker-1': 5, 'worker-2': 5, 'worker-3': 5})
+
+        self.assertEqual(result['change']['type'], 'UnnecessaryLoadSheddingPlanRequested')
+        self.assertListEqual(result['change']['causes'], [{
+            'type': 'UnnecessaryLoadSheddingPlanRequested',
+            'workers': {'ObjectDetection': ['worker-1', 'worker-2', 'worker-3']},
+        }])
+        self.assertEqual(self.service.change_request_throttle.allowed, allowed_before + 1)
+        self.assertEqual(self.service.change_request_throttle.suppressed, 0)
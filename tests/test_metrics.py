@@ -0,0 +1,62 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from prometheus_client import CollectorRegistry, Counter, Histogram
+
+from adaptation_analyser.metrics import dump_metrics_to_file, summarize_counter, summarize_histogram
+
+
+class TestMetrics(TestCase):
+
+    def setUp(self):
+        self.registry = CollectorRegistry()
+        self.histogram = Histogram(
+            'test_latency_seconds', 'test latency', ['handler'], buckets=(.001, .01, .1, float('inf')),
+            registry=self.registry
+        )
+        self.counter = Counter('test_triggers_total', 'test triggers', ['analysis'], registry=self.registry)
+
+    def test_summarize_histogram_per_label(self):
+        for _ in range(99):
+            self.histogram.labels(handler='a').observe(0.0005)
+        self.histogram.labels(handler='a').observe(0.05)
+        self.histogram.labels(handler='b').observe(0.005)
+
+        summary = summarize_histogram(self.histogram)
+
+        self.assertEqual(summary['a']['count'], 100)
+        self.assertAlmostEqual(summary['a']['mean_ms'], (99 * 0.5 + 50) / 100, places=3)
+        self.assertEqual(summary['a']['p50_ms<='], 1.0)
+        self.assertEqual(summary['a']['p99_ms<='], 1.0)
+        self.assertEqual(summary['b']['count'], 1)
+        self.assertEqual(summary['b']['p50_ms<='], 10.0)
+
+    def test_summarize_histogram_skips_labels_without_observations(self):
+        self.histogram.labels(handler='a')
+
+        self.assertDictEqual(summarize_histogram(self.histogram), {})
+
+    def test_summarize_histogram_uses_inf_on_last_bucket(self):
+        self.histogram.labels(handler='a').observe(1.0)
+
+        summary = summarize_histogram(self.histogram)
+
+        self.assertEqual(summary['a']['p99_ms<='], float('inf'))
+
+    def test_summarize_counter(self):
+        self.counter.labels(analysis='x').inc()
+        self.counter.labels(analysis='x').inc()
+        self.counter.labels(analysis='y').inc()
+
+        self.assertDictEqual(summarize_counter(self.counter), {'x': 2, 'y': 1})
+
+    def test_dump_metrics_to_file(self):
+        self.counter.labels(analysis='x').inc()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'metrics.prom')
+            dump_metrics_to_file(path, registry=self.registry)
+            with open(path) as metrics_file:
+                content = metrics_file.read()
+
+        self.assertIn('test_triggers_total{analysis="x"} 1.0', content)
@@ -0,0 +1,76 @@
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from adaptation_analyser.publish_buffer import PipelinedPublishBuffer
+
+
+class TestPipelinedPublishBuffer(TestCase):
+
+    def setUp(self):
+        self.now = 0
+        self.publish_buffer = PipelinedPublishBuffer(max_size=3, max_latency=0.1, clock=lambda: self.now)
+        self.stream_a = MagicMock(spec=['key', 'write_events'])
+        self.stream_a.key = 'a'
+        self.stream_b = MagicMock(spec=['key', 'write_events'])
+        self.stream_b.key = 'b'
+
+    def test_add_doesnt_write_before_thresholds(self):
+        self.publish_buffer.add(self.stream_a, {'event': '1'})
+
+        self.assertEqual(len(self.publish_buffer), 1)
+        self.assertFalse(self.stream_a.write_events.called)
+
+    def test_add_flushes_when_max_size_is_reached(self):
+        self.publish_buffer.add(self.stream_a, {'event': '1'})
+        self.publish_buffer.add(self.stream_b, {'event': '2'})
+        self.publish_buffer.add(self.stream_a, {'event': '3'})
+
+        self.assertEqual(len(self.publish_buffer), 0)
+        self.assertListEqual(
+            [c[0][0] for c in self.stream_a.write_events.call_args_list], [{'event': '1'}, {'event': '3'}])
+        self.stream_b.write_events.assert_called_once_with({'event': '2'})
+
+    def test_flush_if_due_flushes_only_after_max_latency(self):
+        self.publish_buffer.add(self.stream_a, {'event': '1'})
+        self.now = 0.05
+        self.publish_buffer.flush_if_due()
+        self.assertEqual(len(self.publish_buffer), 1)
+
+        self.now = 0.1
+        self.publish_buffer.flush_if_due()
+        self.assertEqual(len(self.publish_buffer), 0)
+        self.stream_a.write_events.assert_called_once_with({'event': '1'})
+
+    def test_flush_uses_a_single_redis_pipeline_in_publishing_order(self):
+        redis_db = MagicMock()
+        pipeline = redis_db.pipeline.return_value
+        stream_a = MagicMock(redis_db=redis_db, key='a', default_write_kwargs={'maxlen': 10, 'approximate': False})
+        stream_b = MagicMock(redis_db=redis_db, key='b', default_write_kwargs={})
+
+        self.publish_buffer.add(stream_a, {'event': '1'})
+        self.publish_buffer.add(stream_b, {'event': '2'})
+        self.publish_buffer.flush()
+
+        redis_db.pipeline.assert_called_once_with(transaction=False)
+        self.assertListEqual(pipeline.xadd.call_args_list, [
+            (('a', {'event': '1'}), {'maxlen': 10, 'approximate': False}),
+            (('b', {'event': '2'}), {}),
+        ])
+        pipeline.execute.assert_called_once_with()
+        self.assertFalse(stream_a.write_events.called)
+
+    def test_flush_keeps_events_when_write_fails(self):
+        self.publish_buffer.logger = MagicMock()
+        self.stream_a.write_events.side_effect = [ConnectionError('redis is down'), None]
+        self.publish_buffer.add(self.stream_a, {'event': '1'})
+
+        self.assertEqual(self.publish_buffer.flush(), 0)
+        self.assertEqual(len(self.publish_buffer), 1)
+        self.assertEqual(self.publish_buffer.failed_flushes, 1)
+        self.assertTrue(self.publish_buffer.logger.exception.called)
+        self.now = 0.1
+        self.assertTrue(self.publish_buffer.is_flush_due())
+
+        self.assertEqual(self.publish_buffer.flush(), 1)
+        self.assertEqual(len(self.publish_buffer), 0)
+        self.assertEqual(self.stream_a.write_events.call_count, 2)
@@ -0,0 +1,98 @@
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from adaptation_analyser.in_memory_streams import InMemoryStreamFactory
+from adaptation_analyser.replay import (
+    ReplayClock,
+    load_trace,
+    percentile,
+    prepare_replay_service,
+    replay_trace,
+)
+
+
+class TestInMemoryStreamFactory(TestCase):
+
+    def setUp(self):
+        self.stream_factory = InMemoryStreamFactory()
+
+    def test_streams_with_same_key_share_entries_but_not_read_cursor(self):
+        writer = self.stream_factory.create('some-key', stype='streamOnly')
+        reader_a = self.stream_factory.create('some-key', stype='streamOnly')
+        reader_b = self.stream_factory.create('some-key', stype='streamOnly')
+        writer.write_events({'event': '1'}, {'event': '2'})
+
+        self.assertEqual(len(list(reader_a.read_events(count=2))), 2)
+        self.assertEqual(len(list(reader_a.read_events(count=2))), 0)
+        self.assertEqual(len(list(reader_b.read_events(count=1))), 1)
+
+    def test_many_key_consumer_group_reads_from_all_keys_with_increasing_ids(self):
+        consumer_group = self.stream_factory.create(['a', 'b'], stype='manyKeyConsumerOnly', cg_id='cg')
+        self.stream_factory.create('b').write_events({'event': 'b1'})
+        self.stream_factory.create('a').write_events({'event': 'a1'})
+
+        stream_event_list = consumer_group.read_stream_events_list(count=10)
+        self.assertListEqual([s for s, _ in stream_event_list], [b'a', b'b'])
+        self.assertListEqual(
+            [event_list[0][0] for _, event_list in stream_event_list], [b'2-0', b'1-0'])
+
+
+class TestReplay(TestCase):
+
+    def setUp(self):
+        self.clock = ReplayClock()
+        self.service = prepare_replay_service(self.clock)
+        self.worker = {
+            'stream_key': 'worker-1', 'service_type': 'ObjectDetection',
+            'throughput': 10, 'accuracy': 0.9, 'energy_consumption': 5,
+        }
+        self.overloaded_monitoring = {
+            'service_workers': {
+                'ObjectDetection': {
+                    'workers': {'worker-1': dict(self.worker, queue_size=90)},
+                    'total_number_workers': 1
+                }
+            }
+        }
+        self.trace = [
+            {'event_type': 'ServiceWorkerAnnounced', 'timestamp': 100, 'event_data': {'id': 'e1', 'worker': self.worker}},
+            {'event_type': 'QueryCreated', 'timestamp': 101, 'event_data': {'id': 'e2'}},
+            {'event_type': 'ServiceWorkersStreamMonitored', 'timestamp': 102,
+             'event_data': dict(self.overloaded_monitoring, id='e3')},
+            {'event_type': 'SchedulingPlanExecuted', 'timestamp': 103, 'event_data': {
+                'id': 'e4', 'plan': {'change_request': {'type': 'ServiceWorkerOverloadedPlanRequested', 'timestamp': 102}}
+            }},
+            {'event_type': 'ServiceWorkersStreamMonitored', 'timestamp': 104,
+             'event_data': dict(self.overloaded_monitoring, id='e5')},
+            {'event_type': 'ServiceWorkersStreamMonitored', 'timestamp': 106,
+             'event_data': dict(self.overloaded_monitoring, id='e6')},
+        ]
+
+    def test_percentile_uses_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertIsNone(percentile([], 50))
+
+    def test_load_trace_reads_one_event_per_line(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            trace_path = os.path.join(tmp_dir, 'trace.jsonl')
+            with open(trace_path, 'w') as trace_file:
+                for trace_event in self.trace:
+                    trace_file.write(json.dumps(trace_event) + '\n')
+                trace_file.write('\n')
+            self.assertListEqual(load_trace(trace_path), self.trace)
+
+    def test_replay_trace_reports_latencies_and_published_events(self):
+        report = replay_trace(self.service, self.trace, self.clock)
+
+        self.assertEqual(report['events'], 6)
+        self.assertEqual(report['per_event_type']['ServiceWorkersStreamMonitored']['count'], 3)
+        self.assertIn('p99_ms', report['per_event_type']['QueryCreated'])
+        self.assertEqual(report['published']['NewQuerySchedulingPlanRequested'], 1)
+        # the overload at ts 104 is inside the 3 secs window of the plan executed for ts 102
+        self.assertEqual(report['published']['ServiceWorkerOverloadedPlanRequested'], 2)
+        overload_requests = report['published_events']['ServiceWorkerOverloadedPlanRequested']
+        self.assertListEqual([e['change']['timestamp'] for e in overload_requests], [102, 106])
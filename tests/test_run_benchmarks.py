@@ -0,0 +1,32 @@
+from unittest import TestCase
+
+from benchmarks.cases import bench_update_best_worker_by_service_by_qos_policy, get_benchmark_cases
+from benchmarks.run_benchmarks import compare_with_baseline, time_call
+
+
+class TestRunBenchmarks(TestCase):
+
+    def test_compare_with_baseline_flags_only_slowdowns_over_tolerance(self):
+        results = {'a': 1.4, 'b': 1.6, 'c': 0.5, 'new': 1.0}
+        baseline_results = {'a': 1.0, 'b': 1.0, 'c': 1.0}
+
+        comparison = compare_with_baseline(results, baseline_results, tolerance=0.5)
+
+        self.assertFalse(comparison['a']['regression'])
+        self.assertTrue(comparison['b']['regression'])
+        self.assertFalse(comparison['c']['regression'])
+        self.assertFalse(comparison['new']['regression'])
+        self.assertIsNone(comparison['new']['ratio'])
+
+    def test_benchmark_cases_cover_scaled_workers_and_capacities(self):
+        names = get_benchmark_cases().keys()
+
+        self.assertIn('build_fis[capacity=10000]', names)
+        self.assertIn('is_service_worker_overloaded_fuzzy[capacity=100]', names)
+        self.assertIn('verify_service_worker_best_idle[workers=1000]', names)
+
+    def test_time_call_returns_seconds_per_call(self):
+        with bench_update_best_worker_by_service_by_qos_policy(number_of_workers=10) as func:
+            seconds = time_call(func, min_run_time=0.01, repeat=1)
+
+        self.assertGreater(seconds, 0)
@@ -0,0 +1,70 @@
+from unittest import TestCase
+
+from adaptation_analyser.service_aggregates import ServiceTypeAggregates
+
+
+class TestServiceTypeAggregates(TestCase):
+
+    def setUp(self):
+        self.aggregates = ServiceTypeAggregates()
+        self.worker_states = {}
+        self.workers = {
+            'w1': {'stream_key': 'w1', 'queue_size': 0, 'throughput': 10},
+            'w2': {'stream_key': 'w2', 'queue_size': 5, 'throughput': 2.5},
+        }
+
+    def evaluate_workers(self, workers, best_worker_keys=()):
+        return self.aggregates.evaluate_workers(
+            self.worker_states, workers, 'ServiceA', adaptation_delta=10, best_worker_keys=best_worker_keys)
+
+    def test_evaluate_workers_sets_idle_workers_and_total_capacity(self):
+        evaluation = self.evaluate_workers(self.workers)
+
+        self.assertEqual(self.aggregates.idle_count, 1)
+        self.assertTrue(self.aggregates.is_idle('w1'))
+        self.assertFalse(self.aggregates.is_idle('w2'))
+        self.assertEqual(self.aggregates.total_capacity, 125)
+        self.assertListEqual(list(evaluation.worker_states.keys()), ['w1', 'w2'])
+        self.assertIs(evaluation.worker_states['w1'], self.worker_states['w1'])
+
+    def test_evaluate_workers_applies_changed_stats(self):
+        self.evaluate_workers(self.workers)
+        self.workers['w1']['queue_size'] = 3
+        self.workers['w2']['throughput'] = 5
+
+        self.evaluate_workers(self.workers)
+
+        self.assertEqual(self.aggregates.idle_count, 0)
+        self.assertEqual(self.aggregates.total_capacity, 150)
+
+    def test_evaluate_workers_removes_missing_workers(self):
+        self.evaluate_workers(self.workers)
+
+        self.evaluate_workers({'w2': self.workers['w2']})
+
+        self.assertEqual(len(self.aggregates), 1)
+        self.assertEqual(self.aggregates.idle_count, 0)
+        self.assertEqual(self.aggregates.total_capacity, 25)
+
+    def test_zero_capacity_worker_is_counted(self):
+        self.evaluate_workers({'w3': {'stream_key': 'w3', 'queue_size': 0, 'throughput': 0}})
+
+        self.assertEqual(len(self.aggregates), 1)
+        self.assertEqual(self.aggregates.total_capacity, 0)
+
+    def test_evaluate_workers_finds_idle_best_workers(self):
+        evaluation = self.evaluate_workers(self.workers, best_worker_keys={'w1', 'w2'})
+
+        self.assertListEqual(evaluation.best_idle_workers, ['w1'])
+
+    def test_overload_changed_workers_until_their_inputs_are_kept(self):
+        evaluation = self.evaluate_workers(self.workers)
+        self.assertListEqual(list(evaluation.overload_changed_workers), ['w1', 'w2'])
+
+        # not evaluated yet, still changed on the next event
+        evaluation = self.evaluate_workers(self.workers)
+        self.aggregates.overloaded_verdicts.set_workers_inputs(evaluation.overload_changed_workers)
+        self.workers['w2']['queue_size'] = 6
+
+        evaluation = self.evaluate_workers(self.workers)
+        self.assertListEqual(list(evaluation.overload_changed_workers), ['w2'])
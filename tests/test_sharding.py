@@ -0,0 +1,218 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from opentracing import Tracer
+
+from adaptation_analyser.conf import (
+    LISTEN_EVENT_TYPE_SCHEDULING_PLAN_EXECUTED,
+    LISTEN_EVENT_TYPE_SERVICE_WORKER_ANNOUNCED,
+    LISTEN_EVENT_TYPE_SERVICE_WORKERS_STREAM_MONITORED,
+    PUB_EVENT_LIST,
+    SERVICE_CMD_KEY_LIST,
+    SERVICE_STREAM_KEY,
+)
+from adaptation_analyser.in_memory_streams import InMemoryStreamFactory
+from adaptation_analyser.replay import collect_published_events
+from adaptation_analyser.sharding import (
+    ConsistentHashRing,
+    ShardedAdaptationAnalyser,
+    build_shard_analyser,
+    get_shard_change,
+    merge_shard_changes,
+)
+
+
+class TestConsistentHashRing(TestCase):
+
+    def test_get_node_is_stable_for_same_key(self):
+        ring = ConsistentHashRing(range(4))
+
+        self.assertEqual(ring.get_node('ObjectDetection'), ring.get_node('ObjectDetection'))
+
+    def test_all_nodes_get_keys(self):
+        ring = ConsistentHashRing(range(4))
+
+        nodes = {ring.get_node(f'service-{i}') for i in range(200)}
+
+        self.assertSetEqual(nodes, {0, 1, 2, 3})
+
+    def test_adding_node_only_moves_keys_to_the_new_node(self):
+        ring = ConsistentHashRing(range(4))
+        keys = [f'service-{i}' for i in range(200)]
+        nodes_before = {key: ring.get_node(key) for key in keys}
+
+        ring.add_node(4)
+
+        moved_keys = [key for key in keys if ring.get_node(key) != nodes_before[key]]
+        self.assertTrue(all(ring.get_node(key) == 4 for key in moved_keys))
+        self.assertLess(len(moved_keys), len(keys) / 2)
+
+    def test_removing_node_moves_back_its_keys(self):
+        ring = ConsistentHashRing(range(4))
+        nodes_before = {f'service-{i}': ring.get_node(f'service-{i}') for i in range(50)}
+
+        ring.add_node(4)
+        ring.remove_node(4)
+
+        self.assertDictEqual({key: ring.get_node(key) for key in nodes_before}, nodes_before)
+
+
+class TestShardAnalyser(TestCase):
+
+    def test_build_shard_analyser_uses_router_analysis_settings(self):
+        service = build_shard_analyser(
+            'ERROR', qos_policies=['cost=min:cost:min'], change_request_min_interval=10,
+            change_request_bucket_size=2, worker_history_size=5)
+
+        self.assertListEqual(list(service.query_qos_policies.keys()), ['cost=min'])
+        self.assertEqual(service.min_seconds_to_ask_same_change_request_type, 10)
+        self.assertEqual(service.change_request_throttle.bucket_size, 2)
+        self.assertEqual(service.worker_history_size, 5)
+        self.assertFalse(service.unnecessary_load_shedding_analysis)
+
+    def test_get_shard_change_has_the_affected_workers(self):
+        service = build_shard_analyser('ERROR')
+        service.overloaded_workers_per_type = {'ObjectDetection': ['worker-1']}
+        change_request = {'change': {'type': 'ServiceWorkerOverloadedPlanRequested', 'cause': {'id': 1}}}
+
+        self.assertDictEqual(get_shard_change(service, change_request), {
+            'type': 'ServiceWorkerOverloadedPlanRequested',
+            'causes': [{'type': 'ServiceWorkerOverloadedPlanRequested', 'workers': {'ObjectDetection': ['worker-1']}}],
+        })
+
+    def test_merge_shard_changes_merges_causes_by_type(self):
+        changes = [
+            {'type': 'ServiceWorkerBestIdlePlanRequested', 'causes': [
+                {'type': 'ServiceWorkerBestIdlePlanRequested', 'workers': {'ColorDetection': ['worker-3']}}]},
+            {'type': 'ServiceWorkerOverloadedPlanRequested', 'causes': [
+                {'type': 'ServiceWorkerOverloadedPlanRequested', 'workers': {'ObjectDetection': ['worker-1']}},
+                {'type': 'ServiceWorkerBestIdlePlanRequested', 'workers': {'ObjectDetection': ['worker-2']}}]},
+        ]
+
+        change_type, causes = merge_shard_changes(changes)
+
+        self.assertEqual(change_type, 'ServiceWorkerOverloadedPlanRequested')
+        self.assertListEqual(causes, [
+            {'type': 'ServiceWorkerOverloadedPlanRequested', 'workers': {'ObjectDetection': ['worker-1']}},
+            {'type': 'ServiceWorkerBestIdlePlanRequested', 'workers': {
+                'ColorDetection': ['worker-3'], 'ObjectDetection': ['worker-2']}},
+        ])
+
+
+class TestShardedAdaptationAnalyserRouting(TestCase):
+
+    @patch.object(ShardedAdaptationAnalyser, 'start_shards')
+    def test_shards_get_the_analysis_settings(self, mocked_start_shards):
+        service = ShardedAdaptationAnalyser(
+            number_of_shards=2,
+            service_stream_key=SERVICE_STREAM_KEY,
+            service_cmd_key_list=SERVICE_CMD_KEY_LIST,
+            pub_event_list=PUB_EVENT_LIST,
+            service_details=None,
+            stream_factory=InMemoryStreamFactory(),
+            logging_level='ERROR',
+            tracer_configs={'reporting_host': None, 'reporting_port': None},
+            qos_policies=['cost=min:cost:min'],
+            overloaded_exit_percentage=0.5,
+            ua_executor_workers=2,
+            cmd_batch_size=10,
+        )
+
+        mocked_start_shards.assert_called_once_with('ERROR', {
+            'qos_policies': ['cost=min:cost:min'], 'overloaded_exit_percentage': 0.5, 'ua_executor_workers': 2,
+        })
+        self.assertIsNone(service.fuzzy_usage_executor)
+
+
+class TestShardedAdaptationAnalyser(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.service = ShardedAdaptationAnalyser(
+            number_of_shards=2,
+            shard_timeout=30,
+            service_stream_key=SERVICE_STREAM_KEY,
+            service_cmd_key_list=SERVICE_CMD_KEY_LIST,
+            pub_event_list=PUB_EVENT_LIST,
+            service_details=None,
+            stream_factory=InMemoryStreamFactory(),
+            logging_level='ERROR',
+            tracer_configs={'reporting_host': None, 'reporting_port': None},
+        )
+        cls.service.tracer = Tracer()
+        cls.service_types = cls.find_service_types_in_different_shards()
+        for service_type in cls.service_types:
+            cls.service.process_event_type(
+                LISTEN_EVENT_TYPE_SERVICE_WORKER_ANNOUNCED,
+                {'id': 'announce', 'worker': cls.build_worker(service_type, queue_size=0)},
+                None
+            )
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.service.stop_shards()
+
+    @classmethod
+    def find_service_types_in_different_shards(cls):
+        service_types = {}
+        for i in range(100):
+            service_type = f'Service{i}'
+            service_types.setdefault(cls.service.get_service_type_shard(service_type), service_type)
+        return [service_types[0], service_types[1]]
+
+    @classmethod
+    def build_worker(cls, service_type, queue_size):
+        return {
+            'stream_key': f'{service_type}-worker', 'service_type': service_type, 'queue_size': queue_size,
+            'throughput': 10, 'accuracy': 0.9, 'energy_consumption': 10,
+        }
+
+    def build_monitoring_event(self, event_id, queue_sizes):
+        return {
+            'id': event_id,
+            'service_workers': {
+                service_type: {
+                    'workers': {f'{service_type}-worker': self.build_worker(service_type, queue_size)},
+                    'total_number_workers': 1,
+                }
+                for service_type, queue_size in zip(self.service_types, queue_sizes)
+            }
+        }
+
+    def get_published(self, event_type):
+        return collect_published_events(self.service)[event_type]
+
+    def test_slice_service_workers_by_shard_keeps_event_fields(self):
+        event_data = self.build_monitoring_event('slice', queue_sizes=(0, 0))
+
+        event_data_by_shard = self.service.slice_service_workers_by_shard(event_data)
+
+        self.assertEqual(len(event_data_by_shard), 2)
+        for shard_id, shard_event_data in event_data_by_shard.items():
+            self.assertEqual(shard_event_data['id'], 'slice')
+            service_type = self.service_types[shard_id]
+            self.assertListEqual(list(shard_event_data['service_workers'].keys()), [service_type])
+
+    def test_overload_in_one_shard_publishes_single_request_with_full_cause(self):
+        published_before = len(self.get_published('ServiceWorkerOverloadedPlanRequested'))
+        event_data = self.build_monitoring_event('overload', queue_sizes=(0, 500))
+
+        self.service.process_event_type(LISTEN_EVENT_TYPE_SERVICE_WORKERS_STREAM_MONITORED, event_data, None)
+
+        published = self.get_published('ServiceWorkerOverloadedPlanRequested')
+        self.assertEqual(len(published), published_before + 1)
+        self.assertDictEqual(published[-1]['change']['cause'], event_data)
+        overloaded_service_type = self.service_types[1]
+        self.assertListEqual(published[-1]['change']['causes'], [{
+            'type': 'ServiceWorkerOverloadedPlanRequested',
+            'workers': {overloaded_service_type: [f'{overloaded_service_type}-worker']},
+        }])
+
+        # plans executed are broadcasted, so every shard skips the similar request for a while
+        self.service.process_event_type(
+            LISTEN_EVENT_TYPE_SCHEDULING_PLAN_EXECUTED,
+            {'id': 'executed', 'plan': {'change_request': published[-1]['change']}},
+            None
+        )
+        self.service.process_event_type(LISTEN_EVENT_TYPE_SERVICE_WORKERS_STREAM_MONITORED, event_data, None)
+        self.assertEqual(len(self.get_published('ServiceWorkerOverloadedPlanRequested')), published_before + 1)
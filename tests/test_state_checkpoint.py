@@ -0,0 +1,133 @@
+import gzip
+import json
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from adaptation_analyser.conf import (
+    LISTEN_EVENT_TYPE_SCHEDULING_PLAN_EXECUTED,
+    LISTEN_EVENT_TYPE_SERVICE_WORKER_ANNOUNCED,
+    LISTEN_EVENT_TYPE_SERVICE_WORKERS_STREAM_MONITORED,
+)
+from adaptation_analyser.replay import ReplayClock, prepare_replay_service
+from adaptation_analyser.state_checkpoint import StateCheckpointer
+
+
+class TestStateCheckpointer(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'state.json.gz')
+        self.now = 0
+        self.checkpointer = StateCheckpointer(
+            path=self.path, interval=5, max_age=60, logger=MagicMock(), clock=lambda: self.now)
+        self.state = {'a': {'x': 1}, 'b': [1, 2]}
+        self.get_section = MagicMock(side_effect=lambda section: self.state[section])
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def read_checkpoint(self):
+        with gzip.open(self.path, 'rt', encoding='utf-8') as checkpoint_file:
+            return json.load(checkpoint_file)
+
+    def test_checkpoint_if_due_skips_clean_state(self):
+        self.assertFalse(self.checkpointer.checkpoint_if_due(self.get_section, timestamp=100))
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_checkpoint_if_due_writes_dirty_sections(self):
+        self.checkpointer.mark_dirty('a', 'b')
+
+        self.assertTrue(self.checkpointer.checkpoint_if_due(self.get_section, timestamp=100))
+
+        self.assertDictEqual(self.read_checkpoint(), {'saved_at': 100, 'sections': self.state})
+
+    def test_checkpoint_if_due_waits_for_interval(self):
+        self.checkpointer.mark_dirty('a')
+        self.checkpointer.checkpoint_if_due(self.get_section, timestamp=100)
+        self.checkpointer.mark_dirty('a')
+
+        self.now = 4
+        self.assertFalse(self.checkpointer.checkpoint_if_due(self.get_section, timestamp=104))
+        self.now = 5
+        self.assertTrue(self.checkpointer.checkpoint_if_due(self.get_section, timestamp=105))
+
+    def test_checkpoint_only_serializes_changed_sections(self):
+        self.checkpointer.mark_dirty('a', 'b')
+        self.checkpointer.checkpoint_if_due(self.get_section, timestamp=100)
+        self.get_section.reset_mock()
+        self.state['a'] = {'x': 2}
+        self.checkpointer.mark_dirty('a')
+
+        self.now = 5
+        self.checkpointer.checkpoint_if_due(self.get_section, timestamp=105)
+
+        self.get_section.assert_called_once_with('a')
+        self.assertDictEqual(self.read_checkpoint()['sections'], {'a': {'x': 2}, 'b': [1, 2]})
+
+    def test_load_ignores_stale_checkpoint(self):
+        self.checkpointer.mark_dirty('a')
+        self.checkpointer.checkpoint_if_due(self.get_section, timestamp=100)
+
+        self.assertDictEqual(self.checkpointer.load(timestamp=160), {'a': {'x': 1}})
+        self.assertIsNone(self.checkpointer.load(timestamp=161))
+
+    def test_load_returns_none_without_checkpoint_file(self):
+        self.assertIsNone(self.checkpointer.load(timestamp=100))
+
+
+class TestAdaptationAnalyserStateCheckpoint(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'state.json.gz')
+        self.clock = ReplayClock(start_timestamp=1000)
+        self.worker = {
+            'stream_key': 'w1', 'service_type': 'OD', 'throughput': 10, 'accuracy': 0.9, 'energy_consumption': 5
+        }
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def prepare_service(self):
+        return prepare_replay_service(
+            self.clock, state_checkpoint_file=self.path, state_checkpoint_interval=0, state_checkpoint_max_age=60)
+
+    def run_events_and_checkpoint(self, service):
+        service.process_event_type(LISTEN_EVENT_TYPE_SERVICE_WORKER_ANNOUNCED, {'id': 1, 'worker': self.worker}, None)
+        service.process_event_type(
+            LISTEN_EVENT_TYPE_SCHEDULING_PLAN_EXECUTED,
+            {'id': 2, 'plan': {'change_request': {'type': 'SomeChange', 'timestamp': 999}}},
+            None
+        )
+        service.process_event_type(
+            LISTEN_EVENT_TYPE_SERVICE_WORKERS_STREAM_MONITORED,
+            {'id': 3, 'service_workers': {'OD': {
+                'workers': {'w1': dict(self.worker, queue_size=0)}, 'total_number_workers': 1}}},
+            None
+        )
+        service.checkpoint_state_if_due()
+
+    def test_restarted_service_restores_checkpointed_state(self):
+        service = self.prepare_service()
+        self.run_events_and_checkpoint(service)
+
+        restarted_service = self.prepare_service()
+
+        self.assertDictEqual(restarted_service.current_service_workers, service.current_service_workers)
+        self.assertDictEqual(
+            restarted_service.best_workers_by_service_by_qos_policy, service.best_workers_by_service_by_qos_policy)
+        self.assertDictEqual(
+            restarted_service.last_adaptation_executed_per_type, service.last_adaptation_executed_per_type)
+        self.assertDictEqual(
+            restarted_service.last_service_workers_monitoring, service.last_service_workers_monitoring)
+
+    def test_restarted_service_ignores_stale_checkpoint(self):
+        self.run_events_and_checkpoint(self.prepare_service())
+        self.clock.advance(61)
+
+        restarted_service = self.prepare_service()
+
+        self.assertDictEqual(restarted_service.current_service_workers, {})
+        self.assertIsNone(restarted_service.last_service_workers_monitoring)
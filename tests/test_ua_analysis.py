@@ -263,4 +263,83 @@ class TestUAServiceAnalysis(TestCase):
         usage = self.ua_analysis.calculate_worker_usage(queue_size=queue_size, max_capacity=max_capacity)
         crisp_usage_ref = queue_size / max_capacity * 100
         # print(crisp_usage_ref, usage)
-        self.assertGreaterEqual(usage, 85)
\ No newline at end of file
+        self.assertGreaterEqual(usage, 85)
+
+    def test_setup_from_workers_builds_usage_table_with_configured_resolution(self):
+        self.ua_analysis.usage_table_resolution = 9
+        self.ua_analysis.setup_from_workers(self.workers_set_b)
+
+        self.assertEqual(self.ua_analysis.usage_table.shape, (9, 9))
+        self.assertEqual(self.ua_analysis.usage_table_step, 125)
+
+    def test_setup_from_workers_doesnt_build_usage_table_when_resolution_is_disabled(self):
+        self.ua_analysis.usage_table_resolution = 0
+        self.ua_analysis.setup_from_workers(self.workers_set_b)
+
+        self.assertIsNone(self.ua_analysis.usage_table)
+        usage = self.ua_analysis.calculate_worker_usage(queue_size=325, max_capacity=500)
+        self.assertEqual(usage, self.ua_analysis.simulate_worker_usage(queue_size=325, max_capacity=500))
+
+    def test_lookup_worker_usage_matches_simulation_on_grid_points(self):
+        self.ua_analysis.usage_table_resolution = 9
+        self.ua_analysis.setup_from_workers(self.workers_set_b)
+
+        for queue_size, max_capacity in [(0, 125), (250, 500), (875, 1000), (1000, 1000)]:
+            usage = self.ua_analysis.lookup_worker_usage(queue_size, max_capacity)
+            sim_usage = self.ua_analysis.simulate_worker_usage(queue_size, max_capacity)
+            self.assertAlmostEqual(usage, sim_usage, places=6)
+
+    def test_calculate_worker_usage_has_bounded_error_against_simulation(self):
+        self.ua_analysis.setup_from_workers(self.workers_set_b)
+        max_error = 5
+
+        for queue_size in range(0, 1001, 37):
+            for max_capacity in range(1, 1001, 41):
+                usage = self.ua_analysis.calculate_worker_usage(queue_size, max_capacity)
+                sim_usage = self.ua_analysis.simulate_worker_usage(queue_size, max_capacity)
+                self.assertLessEqual(abs(usage - sim_usage), max_error)
+
+    def test_infer_workers_usage_matches_simulation_for_many_workers(self):
+        self.ua_analysis.setup_from_workers(self.workers_set_b)
+        queue_sizes = [5, 25, 65, 190, 150, 325, 485, 500, 240, 520, 750, 800, 350, 675, 850, 1000]
+        max_capacities = [100, 100, 100, 100, 500, 500, 500, 500, 800, 800, 800, 800, 1000, 1000, 1000, 1000]
+
+        usages = self.ua_analysis.infer_workers_usage(queue_sizes, max_capacities)
+
+        self.assertEqual(usages.shape, (len(queue_sizes),))
+        for usage, queue_size, max_capacity in zip(usages, queue_sizes, max_capacities):
+            sim_usage = self.ua_analysis.simulate_worker_usage(queue_size, max_capacity)
+            self.assertAlmostEqual(usage, sim_usage, delta=0.05)
+
+    def test_calculate_workers_usage_uses_inference_when_table_is_disabled(self):
+        self.ua_analysis.usage_table_resolution = 0
+        self.ua_analysis.setup_from_workers(self.workers_set_b)
+        queue_sizes = [25, 325, 1000]
+        max_capacities = [100, 500, 1000]
+
+        usages = self.ua_analysis.calculate_workers_usage(queue_sizes, max_capacities)
+        expected = self.ua_analysis.infer_workers_usage(queue_sizes, max_capacities)
+        self.assertListEqual(list(usages), list(expected))
+
+    def test_setup_from_workers_uses_fixed_size_universe_when_normalized_universe_is_enabled(self):
+        self.ua_analysis.normalized_universe_size = 101
+        self.ua_analysis.setup_from_workers({'worker1': {'throughput': 50000, 'queue_size': 0}})
+
+        self.assertEqual(self.ua_analysis.sw_max_cap, 500000)
+        self.assertEqual(self.ua_analysis.service_universe.size, 101)
+        self.assertEqual(self.ua_analysis.service_universe[-1], 1)
+        self.assertEqual(self.ua_analysis.service_universe_scale, 1 / 500000)
+
+    def test_calculate_worker_usage_with_normalized_universe_matches_raw_universe(self):
+        self.ua_analysis.setup_from_workers(self.workers_set_b)
+        normalized_ua_analysis = UAServiceAnalysis(
+            self.parent_service, self.service_type, normalized_universe_size=1001)
+        normalized_ua_analysis.setup_from_workers(self.workers_set_b)
+
+        for queue_size, max_capacity in [(25, 100), (325, 500), (750, 800), (1000, 1000)]:
+            usage = normalized_ua_analysis.simulate_worker_usage(queue_size, max_capacity)
+            raw_usage = self.ua_analysis.simulate_worker_usage(queue_size, max_capacity)
+            self.assertAlmostEqual(usage, raw_usage, places=6)
+            usage = normalized_ua_analysis.calculate_worker_usage(queue_size, max_capacity)
+            raw_usage = self.ua_analysis.calculate_worker_usage(queue_size, max_capacity)
+            self.assertAlmostEqual(usage, raw_usage, places=6)
@@ -0,0 +1,80 @@
+from concurrent.futures import Future
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+
+import numpy as np
+
+from adaptation_analyser.uncertainty.ua_analysis import UAServiceAnalysis
+from adaptation_analyser.uncertainty.usage_executor import (
+    WARM_UA_ANALYSIS_PER_TYPE,
+    FuzzyUsageExecutor,
+    calculate_service_type_workers_usage,
+)
+
+
+class TestCalculateServiceTypeWorkersUsage(TestCase):
+
+    def setUp(self):
+        WARM_UA_ANALYSIS_PER_TYPE.clear()
+
+    def test_usage_matches_service_analysis(self):
+        parent_service = MagicMock(adaptation_delta=10)
+        ua_analysis = UAServiceAnalysis(parent_service, 'ServiceA')
+        ua_analysis.setup_from_workers({'worker1': {'throughput': 85.5}})
+        queue_sizes = np.array([100, 500, 855])
+        max_capacities = np.array([855, 500, 100])
+
+        usage = calculate_service_type_workers_usage('ServiceA', 10, 85.5, queue_sizes, max_capacities)
+
+        np.testing.assert_array_equal(usage, ua_analysis.calculate_workers_usage(queue_sizes, max_capacities))
+
+    def test_keeps_warm_analysis_per_service_type(self):
+        calculate_service_type_workers_usage('ServiceA', 10, 85.5, np.array([1]), np.array([1]))
+        ua_analysis = WARM_UA_ANALYSIS_PER_TYPE['ServiceA']
+
+        calculate_service_type_workers_usage('ServiceA', 10, 90, np.array([1]), np.array([1]))
+
+        self.assertIs(WARM_UA_ANALYSIS_PER_TYPE['ServiceA'], ua_analysis)
+        self.assertEqual(ua_analysis.sw_max_cap, 900)
+
+
+class TestFuzzyUsageExecutor(TestCase):
+
+    def setUp(self):
+        self.executor = FuzzyUsageExecutor(max_workers=1, timeout=0.01, logger=MagicMock())
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    def test_gather_returns_only_finished_results(self):
+        done_future = Future()
+        done_future.set_result(np.array([10.0]))
+        failed_future = Future()
+        failed_future.set_exception(ValueError('some error'))
+        pending_future = Future()
+
+        results = self.executor.gather([done_future, failed_future, pending_future])
+
+        self.assertListEqual(list(results.keys()), [done_future])
+        self.assertEqual(self.executor.failures, 1)
+        self.assertEqual(self.executor.timeouts, 1)
+        self.assertTrue(pending_future.cancelled())
+
+    def test_submit_runs_usage_calculation_in_process_pool(self):
+        self.executor.timeout = 60
+        future = self.executor.submit('ServiceA', 10, 85.5, np.array([100.0, 855.0]), np.array([855.0, 100.0]))
+
+        results = self.executor.gather([future])
+
+        expected = calculate_service_type_workers_usage(
+            'ServiceA', 10, 85.5, np.array([100.0, 855.0]), np.array([855.0, 100.0]))
+        np.testing.assert_array_almost_equal(results[future], expected)
+
+    @patch('adaptation_analyser.uncertainty.usage_executor.concurrent.futures.ProcessPoolExecutor')
+    @patch('adaptation_analyser.uncertainty.usage_executor.sys')
+    def test_build_executor_without_mp_context_before_python_3_7(self, mocked_sys, mocked_pool_executor):
+        mocked_sys.version_info = (3, 6, 15)
+
+        self.executor.build_executor(2)
+
+        mocked_pool_executor.assert_called_once_with(max_workers=2)
@@ -0,0 +1,159 @@
+from unittest import TestCase
+from unittest.mock import patch
+
+from adaptation_analyser.replay import ReplayClock, prepare_replay_service
+from adaptation_analyser.worker_history import WorkerHistory, WorkerSampleRing
+from adaptation_analyser.worker_state import WorkerState
+
+
+class TestWorkerSampleRing(TestCase):
+
+    def setUp(self):
+        self.ring = WorkerSampleRing(capacity=3)
+
+    def test_append_overwrites_oldest_sample_when_full(self):
+        for timestamp, queue_size in enumerate([10, 20, 30, 40]):
+            self.ring.append(timestamp, queue_size, 10)
+
+        self.assertEqual(len(self.ring), 3)
+        self.assertEqual(self.ring.latest_queue_size(), 40)
+        self.assertEqual(self.ring.latest_timestamp(), 3)
+        self.assertListEqual(sorted(self.ring.queue_sizes), [20, 30, 40])
+
+    def test_get_queue_size_trend_is_least_squares_slope(self):
+        for timestamp, queue_size in [(0, 10), (1, 30), (2, 50)]:
+            self.ring.append(timestamp, queue_size, 10)
+
+        self.assertAlmostEqual(self.ring.get_queue_size_trend(), 20)
+
+    def test_get_queue_size_trend_needs_two_distinct_timestamps(self):
+        self.ring.append(0, 10, 10)
+        self.assertIsNone(self.ring.get_queue_size_trend())
+
+    def test_forecast_seconds_to_reach(self):
+        for timestamp, queue_size in [(0, 10), (1, 30), (2, 50)]:
+            self.ring.append(timestamp, queue_size, 10)
+
+        self.assertAlmostEqual(self.ring.forecast_seconds_to_reach(70), 1)
+        self.assertEqual(self.ring.forecast_seconds_to_reach(40), 0)
+
+    def test_forecast_seconds_to_reach_is_none_without_growing_queue(self):
+        for timestamp, queue_size in [(0, 50), (1, 30), (2, 10)]:
+            self.ring.append(timestamp, queue_size, 10)
+
+        self.assertIsNone(self.ring.forecast_seconds_to_reach(70))
+
+
+class TestWorkerHistory(TestCase):
+
+    def setUp(self):
+        self.worker_history = WorkerHistory(capacity=4, min_samples=3)
+
+    def add_queue_sizes(self, queue_sizes):
+        for timestamp, queue_size in enumerate(queue_sizes):
+            worker_state = WorkerState('worker-1', 'ObjectDetection', queue_size=queue_size, throughput=10)
+            self.worker_history.add_samples({'worker-1': worker_state}, timestamp)
+
+    def test_forecast_seconds_to_overload_needs_min_samples(self):
+        self.add_queue_sizes([10, 30])
+        self.assertIsNone(self.worker_history.forecast_seconds_to_overload('worker-1', 10, 0.7))
+
+        self.add_queue_sizes([10, 30, 50])
+        self.assertAlmostEqual(self.worker_history.forecast_seconds_to_overload('worker-1', 10, 0.7), 1)
+
+    def test_add_samples_skips_repeated_timestamp(self):
+        self.worker_history.add_samples({'worker-1': WorkerState('worker-1', 'ObjectDetection', 10, 10)}, 0)
+        self.worker_history.add_samples({'worker-1': WorkerState('worker-1', 'ObjectDetection', 20, 10)}, 0)
+
+        self.assertEqual(len(self.worker_history.rings['worker-1']), 1)
+
+    def test_add_samples_skips_samples_closer_than_min_sample_interval(self):
+        worker_history = WorkerHistory(capacity=4, min_sample_interval=0.5)
+        for timestamp in [0, 0.2, 0.5, 1]:
+            worker_state = WorkerState('worker-1', 'ObjectDetection', queue_size=timestamp * 10, throughput=10)
+            worker_history.add_samples({'worker-1': worker_state}, timestamp)
+
+        self.assertListEqual(sorted(worker_history.rings['worker-1'].timestamps[:2]), [0, 1])
+        self.assertEqual(len(worker_history.rings['worker-1']), 2)
+
+    def test_add_samples_returns_workers_with_a_different_sample(self):
+        workers = {
+            'worker-1': WorkerState('worker-1', 'ObjectDetection', queue_size=10, throughput=10),
+            'worker-2': WorkerState('worker-2', 'ObjectDetection', queue_size=10, throughput=10),
+        }
+        self.assertListEqual(self.worker_history.add_samples(workers, 0), ['worker-1', 'worker-2'])
+
+        workers['worker-2'].queue_size = 20
+        self.assertListEqual(self.worker_history.add_samples(workers, 1), ['worker-2'])
+        self.assertEqual(len(self.worker_history.rings['worker-1']), 2)
+
+    def test_remove_missing_workers(self):
+        self.add_queue_sizes([10])
+        self.worker_history.remove_missing_workers({})
+
+        self.assertEqual(len(self.worker_history), 0)
+
+
+class TestAdaptationAnalyserPredictiveOverload(TestCase):
+
+    def setUp(self):
+        self.clock = ReplayClock(start_timestamp=100)
+        self.service = prepare_replay_service(self.clock, worker_history_size=8, predictive_overload_default_lead=2)
+        self.worker = {'stream_key': 'worker-1', 'service_type': 'ObjectDetection', 'throughput': 10}
+
+    def monitor_queue_sizes(self, queue_sizes):
+        result = None
+        for queue_size in queue_sizes:
+            self.clock.advance(1)
+            result = self.service.analyse_service_workers_stream_monitored({
+                'id': f'monitoring-{queue_size}',
+                'service_workers': {
+                    'ObjectDetection': {
+                        'workers': {'worker-1': dict(self.worker, queue_size=queue_size)},
+                        'total_number_workers': 1
+                    }
+                }
+            })
+        return result
+
+    def test_growing_queue_requests_overloaded_plan_before_crossing_threshold(self):
+        self.assertIsNone(self.monitor_queue_sizes([10, 30]))
+
+        result = self.monitor_queue_sizes([50])
+
+        self.assertEqual(result['change']['type'], 'ServiceWorkerOverloadedPlanRequested')
+        self.assertListEqual(self.service.overloaded_workers, ['worker-1'])
+
+    def test_lead_time_follows_measured_plan_execution_time(self):
+        self.service.process_scheduling_plan_executed({'plan': {'change_request': {
+            'type': 'ServiceWorkerOverloadedPlanRequested', 'timestamp': self.clock.timestamp() - 0.5}}})
+        # the recent plan execution blocks new overloaded requests for a few seconds
+        self.clock.advance(self.service.min_seconds_to_ask_same_change_request_type)
+
+        self.assertEqual(self.service.get_predictive_overload_lead_time(), 0.5)
+        self.assertIsNone(self.monitor_queue_sizes([10, 30, 50]))
+
+    def test_samples_closer_than_min_sample_interval_dont_predict_overload(self):
+        self.service.worker_history_min_sample_interval = 5
+
+        self.assertIsNone(self.monitor_queue_sizes([10, 30, 50]))
+        self.assertEqual(len(self.service.worker_history_per_type['ObjectDetection'].rings['worker-1']), 1)
+
+    def test_only_workers_with_changed_samples_are_forecasted(self):
+        self.monitor_queue_sizes([10, 20])
+        worker_history = self.service.worker_history_per_type['ObjectDetection']
+
+        with patch.object(
+                worker_history, 'forecast_seconds_to_overload',
+                wraps=worker_history.forecast_seconds_to_overload) as mocked_forecast:
+            self.monitor_queue_sizes([20])
+            self.assertFalse(mocked_forecast.called)
+            self.monitor_queue_sizes([50])
+            self.assertEqual(mocked_forecast.call_count, 1)
+        self.assertDictEqual(worker_history.predicted_workers, {'worker-1': True})
+
+    def test_disabled_without_worker_history(self):
+        self.service.worker_history_size = 0
+
+        self.assertIsNone(self.monitor_queue_sizes([10, 30, 50]))
+        self.assertDictEqual(self.service.worker_history_per_type, {})
@@ -0,0 +1,62 @@
+from unittest import TestCase
+
+from adaptation_analyser.worker_state import WorkerState, update_worker_states
+
+
+class TestWorkerState(TestCase):
+
+    def setUp(self):
+        self.announced_worker = {
+            'stream_key': 'worker-1', 'service_type': 'ObjectDetection',
+            'throughput': '10', 'accuracy': 0.9, 'energy_consumption': 5,
+        }
+
+    def test_from_dict_parses_numeric_fields(self):
+        worker_state = WorkerState.from_dict(self.announced_worker)
+
+        self.assertEqual(worker_state.stream_key, 'worker-1')
+        self.assertEqual(worker_state.queue_size, 0)
+        self.assertEqual(worker_state.throughput, 10.0)
+        self.assertEqual(worker_state.energy_consumption, 5.0)
+
+    def test_update_from_dict_keeps_fields_missing_from_monitoring(self):
+        worker_state = WorkerState.from_dict(self.announced_worker)
+
+        worker_state.update_from_dict({'queue_size': '7', 'throughput': 12})
+
+        self.assertEqual(worker_state.queue_size, 7)
+        self.assertEqual(worker_state.throughput, 12.0)
+        self.assertEqual(worker_state.accuracy, 0.9)
+
+    def test_dict_like_access(self):
+        worker_state = WorkerState.from_dict({'stream_key': 'worker-1', 'throughput': 10})
+
+        self.assertEqual(worker_state['stream_key'], 'worker-1')
+        self.assertIsNone(worker_state.get('accuracy'))
+        self.assertEqual(worker_state.get('accuracy', 1), 1)
+        with self.assertRaises(KeyError):
+            worker_state['unknown']
+
+    def test_throughput_is_none_until_announced_or_monitored(self):
+        worker_state = WorkerState.from_dict({'stream_key': 'worker-1', 'accuracy': 0.9})
+
+        self.assertIsNone(worker_state.get('throughput'))
+        worker_state.update_monitored_fields({'queue_size': 1})
+        self.assertEqual(worker_state.throughput, 0.0)
+
+    def test_has_no_instance_dict(self):
+        self.assertFalse(hasattr(WorkerState.from_dict(self.announced_worker), '__dict__'))
+
+
+class TestUpdateWorkerStates(TestCase):
+
+    def test_updates_known_states_in_place(self):
+        worker_states = {}
+        first_states = update_worker_states(worker_states, {'worker-1': {'queue_size': 1}}, 'ObjectDetection')
+
+        second_states = update_worker_states(worker_states, {'worker-1': {'queue_size': 2}}, 'ObjectDetection')
+
+        self.assertIs(first_states['worker-1'], second_states['worker-1'])
+        self.assertEqual(worker_states['worker-1'].queue_size, 2)
+        self.assertEqual(worker_states['worker-1'].stream_key, 'worker-1')
+        self.assertEqual(worker_states['worker-1'].service_type, 'ObjectDetection')
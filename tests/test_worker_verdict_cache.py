@@ -0,0 +1,74 @@
+from unittest import TestCase
+
+from adaptation_analyser.worker_state import WorkerState
+from adaptation_analyser.worker_verdict_cache import WorkerVerdictCache
+
+
+class TestWorkerVerdictCache(TestCase):
+
+    def setUp(self):
+        self.verdict_cache = WorkerVerdictCache(input_fields=('queue_size', 'throughput'))
+        self.workers = {
+            'w1': WorkerState('w1', 'ServiceA', queue_size=0, throughput=10),
+            'w2': WorkerState('w2', 'ServiceA', queue_size=5, throughput=10),
+        }
+
+    def test_get_changed_workers_returns_all_workers_first_time(self):
+        changed_workers = self.verdict_cache.get_changed_workers(self.workers)
+        self.assertListEqual(list(changed_workers.keys()), ['w1', 'w2'])
+
+    def test_get_changed_workers_returns_only_workers_with_different_inputs(self):
+        self.verdict_cache.get_changed_workers(self.workers)
+        workers = {
+            'w1': WorkerState('w1', 'ServiceA', queue_size=0, throughput=10, accuracy=0.5),
+            'w2': WorkerState('w2', 'ServiceA', queue_size=6, throughput=10),
+        }
+        changed_workers = self.verdict_cache.get_changed_workers(workers)
+        self.assertListEqual(list(changed_workers.keys()), ['w2'])
+
+    def test_get_changed_workers_drops_missing_workers_and_their_verdicts(self):
+        self.verdict_cache.get_changed_workers(self.workers)
+        self.verdict_cache.set_verdicts(['w1', 'w2'], ['w1', 'w2'])
+
+        changed_workers = self.verdict_cache.get_changed_workers({'w2': self.workers['w2']})
+        self.assertDictEqual(changed_workers, {})
+        self.assertListEqual(self.verdict_cache.get_positive_workers(), ['w2'])
+        self.assertEqual(len(self.verdict_cache), 1)
+
+    def test_set_verdicts_only_updates_changed_workers(self):
+        self.verdict_cache.set_verdicts(['w1', 'w2'], ['w1'])
+        self.verdict_cache.set_verdicts(['w2'], ['w2'])
+
+        self.assertListEqual(self.verdict_cache.get_positive_workers(), ['w1', 'w2'])
+        self.verdict_cache.set_verdicts(['w1'], [])
+        self.assertListEqual(self.verdict_cache.get_positive_workers(), ['w2'])
+
+    def test_forget_workers_keeps_verdicts_but_reevaluates_workers(self):
+        self.verdict_cache.get_changed_workers(self.workers)
+        self.verdict_cache.set_verdicts(['w1', 'w2'], ['w2'])
+
+        self.verdict_cache.forget_workers(['w2'])
+
+        self.assertListEqual(self.verdict_cache.get_positive_workers(), ['w2'])
+        self.assertListEqual(list(self.verdict_cache.get_changed_workers(self.workers).keys()), ['w2'])
+
+    def test_get_changed_workers_drops_verdict_of_forgotten_missing_worker(self):
+        self.verdict_cache.get_changed_workers(self.workers)
+        self.verdict_cache.set_verdicts(['w1', 'w2'], ['w2'])
+        self.verdict_cache.forget_workers(['w2'])
+
+        self.verdict_cache.get_changed_workers({'w1': self.workers['w1']})
+
+        self.assertListEqual(self.verdict_cache.get_positive_workers(), [])
+
+    def test_pop_positive_changes_has_the_latest_verdict_changes(self):
+        self.verdict_cache.get_changed_workers(self.workers)
+        self.verdict_cache.set_verdicts(['w1', 'w2'], ['w2'])
+        self.assertDictEqual(self.verdict_cache.pop_positive_changes(), {'w2': True})
+
+        self.verdict_cache.set_verdicts(['w1', 'w2'], ['w1'])
+        self.assertDictEqual(self.verdict_cache.pop_positive_changes(), {'w1': True, 'w2': False})
+        self.assertDictEqual(self.verdict_cache.pop_positive_changes(), {})
+
+        self.verdict_cache.get_changed_workers({'w2': self.workers['w2']})
+        self.assertDictEqual(self.verdict_cache.pop_positive_changes(), {'w1': False})